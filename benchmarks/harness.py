@@ -0,0 +1,135 @@
+import json
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+
+def measure(function, items=1, repeat=20, warmup=1, memory=True):
+    """
+    Summary:
+    Times repeated calls of a function and measures its peak memory.
+    inputs:
+    function (callable): benchmark body, called without arguments.
+    items (int): units of work done by one call (tickers, grid points, ...), used for the throughput.
+    repeat (int): number of timed calls.
+    warmup (int): untimed calls made first (imports, caches).
+    memory (bool): make one extra call under tracemalloc to measure the peak of python allocations
+                   (numpy arrays included), kept out of the timings since tracing slows calls down.
+    returns:
+    (dict) = {'items', 'repeat', 'mean', 'min', 'p50', 'p90', 'p99': seconds per call,
+              'throughput': items per second at the median, 'peak_memory': bytes or None}
+    """
+    for _ in range(warmup):
+        function()
+
+    timings = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings[i] = time.perf_counter() - start
+
+    peak_memory = None
+    if memory:
+        tracemalloc.start()
+        try:
+            function()
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    p50, p90, p99 = np.percentile(timings, [50, 90, 99])
+    return {'items': items,
+            'repeat': repeat,
+            'mean': float(timings.mean()),
+            'min': float(timings.min()),
+            'p50': float(p50),
+            'p90': float(p90),
+            'p99': float(p99),
+            'throughput': items/float(p50) if p50 > 0 else float('inf'),
+            'peak_memory': peak_memory}
+
+def environment():
+    """
+    Summary:
+    Machine and library versions saved with a baseline (timings only compare on the same setup).
+    """
+    return {'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'system': platform.system()}
+
+def save_baseline(results, path):
+    """
+    Summary:
+    Saves benchmark results as a json baseline.
+    """
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=1)
+
+def load_baseline(path):
+    """
+    Summary:
+    Loads the results of a baseline written by save_baseline().
+    """
+    with open(path) as f:
+        return json.load(f)['results']
+
+def compare(results, baseline, tolerance=0.25, memory_tolerance=0.25):
+    """
+    Summary:
+    Finds the benchmarks that got slower (median latency) or use more memory (peak) than a baseline.
+    inputs:
+    results (dict): {benchmark: measure() output}.
+    baseline (dict): baseline results, e.g. load_baseline(path).
+    tolerance (float): allowed relative increase of the median latency.
+    memory_tolerance (float): allowed relative increase of the peak memory.
+    returns:
+    (list) = [(benchmark, metric, baseline value, new value)] of every regression.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]
+        if result['p50'] > old['p50']*(1 + tolerance):
+            regressions.append((name, 'p50', old['p50'], result['p50']))
+        if result.get('peak_memory') is not None and old.get('peak_memory') is not None:
+            if result['peak_memory'] > old['peak_memory']*(1 + memory_tolerance):
+                regressions.append((name, 'peak_memory', old['peak_memory'], result['peak_memory']))
+    return regressions
+
+def _seconds(value):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if value >= scale:
+            return f"{value/scale:.3g} {unit}"
+    return f"{value/1e-9:.3g} ns"
+
+def _bytes(value):
+    if value is None:
+        return '-'
+    for unit, scale in (('GB', 1024**3), ('MB', 1024**2), ('kB', 1024)):
+        if value >= scale:
+            return f"{value/scale:.3g} {unit}"
+    return f"{value} B"
+
+def format_results(results, baseline=None):
+    """
+    Summary:
+    Text table of benchmark results, with the median change against a baseline if given.
+    """
+    header = f"{'benchmark':<28}{'items':>8}{'p50':>11}{'p90':>11}{'p99':>11}{'items/s':>12}{'peak mem':>11}"
+    if baseline is not None:
+        header += f"{'vs base':>9}"
+    lines = [header, '-'*len(header)]
+
+    for name, r in results.items():
+        line = (f"{name:<28}{r['items']:>8}{_seconds(r['p50']):>11}{_seconds(r['p90']):>11}{_seconds(r['p99']):>11}"
+                f"{r['throughput']:>12.4g}{_bytes(r['peak_memory']):>11}")
+        if baseline is not None:
+            change = f"{100*(r['p50']/baseline[name]['p50'] - 1):+.0f}%" if name in baseline else 'new'
+            line += f"{change:>9}"
+        lines.append(line)
+
+    return '\n'.join(lines)
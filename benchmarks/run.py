@@ -0,0 +1,200 @@
+import argparse
+import atexit
+import functools
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from benchmarks.harness import measure, save_baseline, load_baseline, compare, format_results
+from data.bulk_loader import BulkLoader
+from data.statement_store import FIELDS, StatementStore, read_field
+from data.synthetic_statements import SYNTHETIC_MARKET_DATA, synthetic_statements, synthetic_universe
+from tools.f_score import f_scores_from_store
+from tools.fundamentals_class import Fundamentals
+from tools.reverse_dcf import implied_growth_screen
+from tools.universe import value_universe
+
+#dcf() inputs used by every benchmark
+EARNINGS_GROWTH_RATE = 0.05
+CAP_EX_GROWTH_RATE = 0.05
+PERPETUAL_GROWTH_RATE = 0.02
+FORECASTING_PERIOD = 4
+BETA = 1.1
+
+SENSITIVITY_GRID_SIZES = (100, 500, 2000)
+BATCH_SIZES = (10, 1000, 10000)
+QUICK_BATCH_SIZES = (10, 100, 1000)
+
+def _company(statements, ticker='SYN0'):
+    return Fundamentals(**statements,
+                        company_ticker = ticker,
+                        forecasting_period = FORECASTING_PERIOD,
+                        api_key = '',
+                        market_data = SYNTHETIC_MARKET_DATA,
+                        beta = BETA,
+                        quiet = True)
+
+def single_company_benchmarks(quick=False):
+    """
+    Summary:
+    Latency of the valuation steps of one company.
+    returns:
+    (list) = [(name, setup, items, repeat)], setup() returns the function to time
+    """
+    statements = synthetic_statements('SYN0')
+    payload = {name: json.dumps(statement) for name, statement in statements.items()}
+    repeat = 20 if quick else 200
+
+    def parse():
+        #json text -> every field the valuation reads
+        parsed = {name: json.loads(text) for name, text in payload.items()}
+        company = _company(parsed)
+        for field, (key, _) in FIELDS.items():
+            read_field(getattr(company, key), field)
+
+    def dcf():
+        _company(statements).dcf(EARNINGS_GROWTH_RATE, CAP_EX_GROWTH_RATE, PERPETUAL_GROWTH_RATE)
+
+    company = _company(statements)
+    company.dcf(EARNINGS_GROWTH_RATE, CAP_EX_GROWTH_RATE, PERPETUAL_GROWTH_RATE)
+    growth_rates = iter(PERPETUAL_GROWTH_RATE*(1 + 1e-9*i) for i in range(10**9))
+
+    def what_if():
+        #a new perpetual growth rate every call: only the terminal value and equity stages are recomputed
+        company.what_if(perpetual_growth_rate = next(growth_rates))
+
+    benchmarks = [('parse_statements', parse, 1, repeat),
+                  ('dcf', dcf, 1, repeat),
+                  ('what_if_perpetual_growth', what_if, 1, repeat),
+                  ('f_score', company.f_score, 1, repeat)]
+
+    for size in SENSITIVITY_GRID_SIZES[:2] if quick else SENSITIVITY_GRID_SIZES:
+        def sensitivity(size=size):
+            company.sensitivity(confidence_intervals = [0.9, 0.8], bound = 0.4, plot = False, grid_size = size)
+        benchmarks.append((f'sensitivity_{size}x{size}', sensitivity, size**2, max(3, repeat*100//size**2 + 3)))
+
+    #one company is cheap to build, nothing is left to prepare
+    return [(name, lambda function=function: function, items, repeat) for name, function, items, repeat in benchmarks]
+
+#inputs of the batch benchmarks, built on first use and only kept for one size at a time (the benchmarks
+#of a size run one after the other)
+@functools.lru_cache(maxsize=1)
+def _universe(n):
+    return synthetic_universe(n)
+
+@functools.lru_cache(maxsize=1)
+def _store(n):
+    return StatementStore.from_statements(_universe(n))
+
+@functools.lru_cache(maxsize=1)
+def _dump(n):
+    #whole-market income statement dump, one record per ticker and period
+    directory = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, directory, True)
+    path = os.path.join(directory, f'income_{n}.json')
+    with open(path, 'w') as f:
+        json.dump([dict(record, symbol = ticker) for ticker, statements in _universe(n).items() for record in statements['income_statement']], f)
+    return path
+
+def batch_benchmarks(quick=False):
+    """
+    Summary:
+    Throughput of batch runs: building the columnar store, streaming a statement dump into typed arrays,
+    vectorized f-scores, market-implied growth and full valuations in a process pool. The synthetic
+    universes are only built by the setup of a benchmark that runs.
+    returns:
+    (list) = [(name, setup, items, repeat)], setup() returns the function to time
+    """
+    benchmarks = []
+    for n in QUICK_BATCH_SIZES if quick else BATCH_SIZES:
+        repeat = 3 if n >= 1000 else 10
+
+        def build_store(n=n):
+            universe = _universe(n)
+            return lambda: StatementStore.from_statements(universe)
+
+        def bulk_load(n=n):
+            dump = _dump(n)
+            return lambda: BulkLoader(n_periods = 5).load(dump, 'inc')
+
+        def f_score_batch(n=n):
+            store = _store(n)
+            return lambda: f_scores_from_store(store)
+
+        def implied_growth_batch(n=n):
+            store = _store(n)
+            return lambda: implied_growth_screen(store, SYNTHETIC_MARKET_DATA, BETA)
+
+        def value_batch(n=n):
+            #a tools.universe run: sharding, one pool of workers (started in every call) and the results columns
+            universe = _universe(n)
+            tickers = list(universe)
+            betas = {ticker: BETA for ticker in tickers}
+            return lambda: value_universe(tickers, '', EARNINGS_GROWTH_RATE, CAP_EX_GROWTH_RATE, PERPETUAL_GROWTH_RATE,
+                                          forecasting_period = FORECASTING_PERIOD, statements = universe,
+                                          market_data = SYNTHETIC_MARKET_DATA, progress = False, betas = betas)
+
+        benchmarks += [(f'store_build_{n}', build_store, n, repeat),
+                       (f'bulk_load_{n}', bulk_load, 5*n, repeat),
+                       (f'f_score_batch_{n}', f_score_batch, n, repeat),
+                       (f'implied_growth_batch_{n}', implied_growth_batch, n, repeat),
+                       (f'value_batch_{n}', value_batch, n, 1 if n >= 1000 else 3)]
+
+    return benchmarks
+
+def run(quick=False, pattern=None, memory=True, progress=True):
+    """
+    Summary:
+    Runs the benchmark suite on synthetic statements (no api key or network needed).
+    inputs:
+    quick (bool): smaller grids/batches and fewer repeats.
+    pattern (str): only run benchmarks whose name contains pattern.
+    memory (bool): measure the peak memory of each benchmark.
+    returns:
+    (dict) = {benchmark: measure() output}
+    """
+    results = {}
+    for group in (single_company_benchmarks, batch_benchmarks):
+        for name, setup, items, repeat in group(quick):
+            if pattern is not None and pattern not in name:
+                continue
+            if progress:
+                sys.stderr.write(f"running {name}...\n")
+            #inputs are prepared outside of the timings
+            function = setup()
+            results[name] = measure(function, items = items, repeat = repeat, warmup = 0 if repeat == 1 else 1, memory = memory)
+    return results
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description='Benchmark the valuation hot paths on synthetic statements.')
+    parser.add_argument('--quick', action='store_true', help='smaller grids and batches, fewer repeats')
+    parser.add_argument('-k', dest='pattern', help='only run benchmarks whose name contains this string')
+    parser.add_argument('--no-memory', action='store_true', help='skip peak memory measurements')
+    parser.add_argument('--save', help='save the results as a json baseline')
+    parser.add_argument('--compare', help='json baseline to compare against, exits with status 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slowdown of the median (default 0.25)')
+    args = parser.parse_args(argv)
+
+    results = run(quick = args.quick, pattern = args.pattern, memory = not args.no_memory)
+    baseline = load_baseline(args.compare) if args.compare else None
+
+    print(format_results(results, baseline))
+
+    if args.save:
+        save_baseline(results, args.save)
+        print(f"\nBaseline saved to {args.save}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, tolerance = args.tolerance)
+        for name, metric, old, new in regressions:
+            print(f"REGRESSION {name} {metric}: {old:.4g} -> {new:.4g}")
+        if regressions:
+            return 1
+        print(f"\nNo regressions against {args.compare}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
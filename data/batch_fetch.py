@@ -0,0 +1,204 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from data.get_statements import BASE_URL
+from data.request_scheduler import BATCH, get_scheduler
+
+#statements needed by Fundamentals: {argument name: (statement_name, frequency)}
+FUNDAMENTALS_STATEMENTS = {'income_statement': ('income-statement', 'annual'),
+                           'balance_sheet_statement': ('balance-sheet-statement', 'annual'),
+                           'balance_sheet_statement_quarterly': ('balance-sheet-statement', 'quarter'),
+                           'cash_flow_statement': ('cash-flow-statement', 'annual'),
+                           'enterprise_value': ('enterprise-value', 'annual'),
+                           'financial_ratios': ('financial-ratios', 'annual')
+                          }
+
+#responses worth retrying: rate limited or server side failures
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class BatchFetcher:
+
+    def __init__(self, api_key, max_workers=8, retries=3, backoff=0.5, timeout=10, cache=None, base_url=BASE_URL, scheduler=None, priority=BATCH):
+        """
+        Summary:
+        Fetches many statements concurrently over a pooled keep-alive session.
+        inputs:
+        api_key (str): 'financialmodelingprep' secret api key.
+        max_workers (int): maximum number of requests in flight (also the size of the connection pool).
+        retries (int): number of retries for failed requests (connection errors, 429 and 5xx responses).
+        backoff (float): base delay in seconds, doubled after each retry (with jitter).
+        timeout (float): timeout in seconds of each request.
+        cache (StatementCache): optional cache, only missing/expired statements are requested.
+        base_url (str): root of the api (e.g. a local stub server for testing).
+        scheduler (RequestScheduler): rate limit, daily budget and dedup of the requests. Defaults to the shared
+                                      scheduler when fetching from 'financialmodelingprep', other servers are not scheduled.
+        priority (int): request_scheduler.BATCH or request_scheduler.INTERACTIVE.
+        """
+
+        self._api_key = api_key
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = cache
+        self.base_url = base_url.rstrip('/')
+        self.priority = priority
+        if scheduler is None and self.base_url == BASE_URL:
+            scheduler = get_scheduler()
+        self.scheduler = scheduler
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        #statistics of the last fetch
+        self.requests_sent = 0
+        self.retried = 0
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def _get_json(self, url):
+        """
+        Summary:
+        GET a url and decode the json response, retrying with exponential backoff.
+        """
+        for attempt in range(self.retries + 1):
+            with self._lock:
+                self.requests_sent += 1
+            try:
+                if self.scheduler is not None:
+                    response = self.scheduler.call(url, lambda: self.session.get(url, timeout=self.timeout), self.priority)
+                else:
+                    response = self.session.get(url, timeout=self.timeout)
+                if response.status_code not in RETRY_STATUS:
+                    response.raise_for_status()
+                    return response.json()
+                error = requests.HTTPError(f"{response.status_code} response from {url.split('?')[0]}", response=response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+
+            if attempt == self.retries:
+                raise error
+
+            with self._lock:
+                self.retried += 1
+            time.sleep(self.backoff * (2**attempt) * (1 + random.random()))
+
+    def fetch_statement(self, company_ticker, statement_name, frequency='annual', limit=None):
+        """
+        Summary:
+        Fetch one statement (from the cache when possible).
+        inputs:
+        limit (int): only request the limit latest periods (never cached, see data/quarterly.py).
+        returns:
+        statement (json)
+        """
+        if limit is not None:
+            return self._get_json(f'{self.base_url}/{statement_name}/{company_ticker}?period={frequency}&limit={int(limit)}&apikey={self._api_key}')
+
+        if self.cache is not None:
+            statement = self.cache.get(company_ticker, statement_name, frequency)
+            if statement is not None:
+                return statement
+
+        statement = self._get_json(f'{self.base_url}/{statement_name}/{company_ticker}?period={frequency}&apikey={self._api_key}')
+
+        if (self.cache is not None) and not (isinstance(statement, dict) and 'Error Message' in statement):
+            self.cache.put(company_ticker, statement_name, frequency, statement)
+
+        return statement
+
+    def fetch(self, tickers, statements=FUNDAMENTALS_STATEMENTS):
+        """
+        Summary:
+        Fetch every statement for every ticker concurrently.
+        inputs:
+        tickers (list): company tickers.
+        statements (dict): {key: (statement_name, frequency)}, defaults to the statements Fundamentals needs.
+        returns:
+        (dict) = {ticker: {key: statement (json)}}
+        Tickers for which any statement failed are left out and their exception is stored in self.errors.
+        Use fetch_with_errors() when the fetcher is shared by several threads.
+        """
+        results, self.errors = self.fetch_with_errors(tickers, statements)
+        return results
+
+    def fetch_with_errors(self, tickers, statements=FUNDAMENTALS_STATEMENTS):
+        """
+        Summary:
+        Same as fetch() but returns the errors instead of storing them, safe to call from several threads.
+        returns:
+        (tuple) = ({ticker: {key: statement (json)}}, {ticker: exception})
+        """
+        results = {ticker: {} for ticker in tickers}
+        errors = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {(ticker, key): pool.submit(self.fetch_statement, ticker, statement_name, frequency)
+                       for ticker in tickers
+                       for key, (statement_name, frequency) in statements.items()}
+
+            for (ticker, key), future in futures.items():
+                try:
+                    results[ticker][key] = future.result()
+                except Exception as e:
+                    errors.setdefault(ticker, e)
+
+        for ticker in errors:
+            results.pop(ticker, None)
+
+        return results, errors
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def fetch_statements(tickers, api_key, statements=FUNDAMENTALS_STATEMENTS, **kwargs):
+    """
+    Summary:
+    Fetch the statements of a list of tickers concurrently (see BatchFetcher).
+    returns:
+    (dict) = {ticker: {key: statement (json)}}, ready to use as Fundamentals(**results[ticker], ...)
+    """
+    with BatchFetcher(api_key, **kwargs) as fetcher:
+        results = fetcher.fetch(tickers, statements)
+        if fetcher.errors:
+            error = next(iter(fetcher.errors.values()))
+            raise RuntimeError(f"Failed to fetch statements for {sorted(fetcher.errors)}") from error
+
+    return results
+
+def fetch_betas(tickers, api_key, fetcher=None, **kwargs):
+    """
+    Summary:
+    Fetch the beta of a list of tickers from their company profiles concurrently (see BatchFetcher, kwargs are
+    passed to it). The calls go through the scheduler of this process, so they count against its daily budget.
+    inputs:
+    fetcher (BatchFetcher): fetcher to use (e.g. one shared by several threads), a new one is opened if None.
+    returns:
+    (tuple) = ({ticker: beta}, {ticker: exception}) for the tickers whose profile had no beta or failed.
+    """
+    if fetcher is None:
+        with BatchFetcher(api_key, **kwargs) as fetcher:
+            return fetch_betas(tickers, api_key, fetcher)
+
+    results, errors = fetcher.fetch_with_errors(tickers, {'profile': ('company/profile', 'annual')})
+
+    betas = {}
+    for ticker, result in results.items():
+        try:
+            betas[ticker] = float(result['profile']['profile']['beta'])
+        except (KeyError, TypeError, ValueError) as e:
+            errors[ticker] = e
+    return betas, errors
@@ -0,0 +1,305 @@
+import argparse
+import csv
+import gzip
+import json
+import time
+
+import numpy as np
+
+from data.statement_store import FIELDS, StatementStore
+
+def _open(path):
+    #text mode ('.gz' dumps are decompressed on the fly), newline='' as required by the csv module
+    return gzip.open(path, 'rt', newline='') if path.endswith('.gz') else open(path, newline='')
+
+#longest text a truncated json token can leave after the position of its error (e.g. '-Infinit', '\\u12')
+_TRUNCATED_TOKEN = 16
+
+def _truncated(error, buffer):
+    #a record cut by the end of the buffer fails at that end, in a string running up to it, or in a token just before it
+    return error.msg.startswith('Unterminated string') or len(buffer) - error.pos <= _TRUNCATED_TOKEN
+
+def iter_json_records(file, chunk_size=1024**2):
+    """
+    Summary:
+    Streams the records (objects) of a json array, or of json lines, one at a time: the file is read in
+    chunks and decoded with raw_decode, so only one chunk and one record are held in memory. A malformed
+    record raises ValueError with its character offset as soon as it is read.
+    inputs:
+    file (file object): text file.
+    chunk_size (int): characters read at a time (more while a single record is longer than a chunk).
+    yields:
+    (dict) = one record
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    #characters of the file before the buffer
+    offset = 0
+    eof = False
+
+    while True:
+        #skip whitespace and the array punctuation between records
+        while position < len(buffer) and buffer[position] in ' \t\r\n[],':
+            position += 1
+
+        if position < len(buffer):
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as e:
+                if eof or not _truncated(e, buffer):
+                    raise ValueError(f"Malformed json record at character {offset + e.pos}: {e.msg}") from None
+                record = None
+            if record is not None:
+                position = end
+                yield record
+                continue
+
+        if eof:
+            return
+        #a record longer than a chunk doubles the read, so buffering it stays linear in its length
+        chunk = file.read(max(chunk_size, len(buffer) - position))
+        eof = not chunk
+        offset += position
+        buffer = buffer[position:] + chunk
+        position = 0
+
+class BulkLoader:
+
+    def __init__(self, n_periods=10, fields=None, dtype='float64', capacity=1024, chunk_size=1024**2, batch_size=65536):
+        """
+        Summary:
+        Loads whole-market statement dumps ('financialmodelingprep' field layout, one record per ticker and
+        period, as json arrays, json lines or csv, optionally gzipped) straight into the typed (ticker, period)
+        arrays of a StatementStore. Files are streamed record by record and only the fields the valuation uses
+        are parsed, so memory depends on the number of tickers and periods kept (and the batch size), never on
+        the size of the file. Records of a (ticker, date) already loaded replace it.
+        inputs:
+        n_periods (int): latest periods kept per ticker (older records are skipped).
+        fields (list): fields to load (see data.statement_store.FIELDS), defaults to every field.
+        dtype (str): dtype of the field arrays.
+        capacity (int): tickers preallocated, doubled whenever it is reached.
+        chunk_size (int): characters read at a time from json files.
+        batch_size (int): records parsed before they are written into the arrays in one vectorized step.
+        """
+        self.n_periods = n_periods
+        self.fields = list(FIELDS) if fields is None else list(fields)
+        self.dtype = dtype
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+
+        self.tickers = []
+        self._rows = {}
+        self._capacity = capacity
+        self._arrays = {field: np.full((capacity, n_periods), np.nan, dtype=dtype) for field in self.fields}
+        self._dates = {}
+
+        #statistics of every file loaded
+        self.stats = []
+
+    def _row(self, ticker):
+        row = self._rows.get(ticker)
+        if row is None:
+            row = self._rows[ticker] = len(self.tickers)
+            self.tickers.append(ticker)
+            if row == self._capacity:
+                self._grow()
+        return row
+
+    def _grow(self):
+        capacity = 2*self._capacity
+        for arrays, fill in ((self._arrays, np.nan), (self._dates, '')):
+            for name, array in arrays.items():
+                grown = np.full((capacity, self.n_periods), fill, dtype=array.dtype)
+                grown[:self._capacity] = array
+                arrays[name] = grown
+        self._capacity = capacity
+
+    def _flush(self, key, fields, tickers, dates, values):
+        """
+        Summary:
+        Writes a batch of records into the arrays at once: the periods already stored for the tickers of the
+        batch and the new records are sorted by (ticker, date), duplicates of a (ticker, date) keep the last
+        record and the n_periods latest dates of every ticker are scattered back, newest first.
+        returns:
+        (int) = number of records of the batch that were kept.
+        """
+        known = np.array([bool(ticker) and bool(date) for ticker, date in zip(tickers, dates)], dtype=bool)
+        if not known.any():
+            return 0
+        rows = np.array([self._row(ticker) for ticker, ok in zip(tickers, known) if ok], dtype='int64')
+        new_dates = np.array(dates, dtype='U10')[known]
+        new_values = np.array(values, dtype='float64').reshape(len(tickers), len(fields))[known]
+
+        #periods already stored for the rows of the batch
+        touched = np.unique(rows)
+        old_dates = self._dates[key][touched]
+        stored = old_dates != ''
+        old_rows = np.broadcast_to(touched[:, None], old_dates.shape)[stored]
+        old_values = np.stack([self._arrays[field][touched] for field in fields], axis=-1)[stored]
+
+        all_rows = np.concatenate([old_rows, rows])
+        all_dates = np.concatenate([old_dates[stored], new_dates])
+        all_values = np.concatenate([old_values, new_values])
+        is_new = np.arange(len(all_rows)) >= len(old_rows)
+
+        #sort by row, date and arrival, keep the last entry of every (row, date)
+        order = np.lexsort((np.arange(len(all_rows)), all_dates, all_rows))
+        all_rows, all_dates = all_rows[order], all_dates[order]
+        last = np.ones(len(order), dtype=bool)
+        last[:-1] = (all_rows[1:] != all_rows[:-1]) | (all_dates[1:] != all_dates[:-1])
+        order, all_rows, all_dates = order[last], all_rows[last], all_dates[last]
+
+        #dates are ascending within a row: the newest is period 0
+        _, first, counts = np.unique(all_rows, return_index=True, return_counts=True)
+        period = np.repeat(first + counts - 1, counts) - np.arange(len(all_rows))
+        kept = period < self.n_periods
+
+        self._dates[key][touched] = ''
+        self._dates[key][all_rows[kept], period[kept]] = all_dates[kept]
+        for i, field in enumerate(fields):
+            self._arrays[field][touched] = np.nan
+            self._arrays[field][all_rows[kept], period[kept]] = all_values[order[kept], i]
+
+        return int(np.count_nonzero(is_new[order[kept]]))
+
+    def _start(self, key):
+        if key not in self._dates:
+            self._dates[key] = np.full((self._capacity, self.n_periods), '', dtype='U10')
+        return [field for field in self.fields if FIELDS[field][0] == key]
+
+    def _finish(self, path, key, records, loaded, start):
+        seconds = time.perf_counter() - start
+        stats = {'path': path,
+                 'key': key,
+                 'records': records,
+                 'loaded': loaded,
+                 'skipped': records - loaded,
+                 'seconds': seconds,
+                 'records_per_second': records/seconds if seconds > 0 else float('inf')}
+        self.stats.append(stats)
+        return stats
+
+    def load_json(self, path, key):
+        """
+        Summary:
+        Streams a json array (or json lines) of records into the arrays of one statement.
+        inputs:
+        path (str): file, '.gz' files are decompressed on the fly.
+        key (str): statement of the records, one of data.statement_store.STATEMENTS (e.g. 'inc').
+        returns:
+        (dict) = {'path', 'key', 'records', 'loaded', 'skipped', 'seconds', 'records_per_second'}, where skipped
+                 records have no symbol/date or were not kept (older than the n_periods kept, or followed by another
+                 record of the same ticker and date in the same batch).
+        """
+        fields = self._start(key)
+        paths = [FIELDS[field][1] for field in fields]
+        start = time.perf_counter()
+        records = loaded = 0
+
+        tickers, dates, values = [], [], []
+        with _open(path) as f:
+            for record in iter_json_records(f, self.chunk_size):
+                records += 1
+                tickers.append(str(record.get('symbol', '')))
+                dates.append(str(record.get('date', ''))[:10])
+                for names in paths:
+                    value = record
+                    try:
+                        for name in names:
+                            value = value[name]
+                        values.append(float(value))
+                    except (KeyError, TypeError, ValueError):
+                        values.append(np.nan)
+
+                if len(tickers) == self.batch_size:
+                    loaded += self._flush(key, fields, tickers, dates, values)
+                    tickers, dates, values = [], [], []
+        loaded += self._flush(key, fields, tickers, dates, values)
+
+        return self._finish(path, key, records, loaded, start)
+
+    def load_csv(self, path, key):
+        """
+        Summary:
+        Streams a csv file (header row with 'symbol', 'date' and the 'financialmodelingprep' field names,
+        nested ratio fields as e.g. 'profitabilityIndicatorRatios.effectiveTaxRate' or their last name) into the
+        arrays of one statement. Only the columns of the loaded fields are converted.
+        inputs and returns: as in load_json().
+        """
+        fields = self._start(key)
+        start = time.perf_counter()
+        records = loaded = 0
+
+        with _open(path) as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            column = {name: i for i, name in enumerate(header)}
+
+            indices = []
+            for field in fields:
+                names = FIELDS[field][1]
+                index = column.get('.'.join(names), column.get(names[-1]))
+                indices.append(index)
+            symbol, date = column['symbol'], column['date']
+
+            tickers, dates, values = [], [], []
+            for line in reader:
+                records += 1
+                tickers.append(line[symbol])
+                dates.append(line[date][:10])
+                for index in indices:
+                    try:
+                        values.append(float(line[index]))
+                    except (TypeError, ValueError, IndexError):
+                        values.append(np.nan)
+
+                if len(tickers) == self.batch_size:
+                    loaded += self._flush(key, fields, tickers, dates, values)
+                    tickers, dates, values = [], [], []
+            loaded += self._flush(key, fields, tickers, dates, values)
+
+        return self._finish(path, key, records, loaded, start)
+
+    def load(self, path, key):
+        """
+        Summary:
+        Loads a '.csv' or '.json' file (optionally '.gz'), see load_json() and load_csv().
+        """
+        if path.replace('.gz', '').endswith('.csv'):
+            return self.load_csv(path, key)
+        return self.load_json(path, key)
+
+    def store(self):
+        """
+        Summary:
+        StatementStore of the loaded tickers and statements (the field arrays of statements that were not
+        loaded are left out). The arrays are views of the loader's arrays.
+        """
+        n = len(self.tickers)
+        keys = set(self._dates)
+        fields = {field: array[:n] for field, array in self._arrays.items() if FIELDS[field][0] in keys}
+        dates = {key: array[:n] for key, array in self._dates.items()}
+        return StatementStore(self.tickers, fields, dates)
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description='Load statement dumps into a StatementStore directory.')
+    parser.add_argument('files', nargs='+', help="key=path pairs, e.g. inc=income.json.gz bs=balance.csv (keys: data.statement_store.STATEMENTS)")
+    parser.add_argument('--output', required=True, help='StatementStore directory')
+    parser.add_argument('--n-periods', type=int, default=10)
+    parser.add_argument('--dtype', default='float64')
+    args = parser.parse_args(argv)
+
+    loader = BulkLoader(n_periods = args.n_periods, dtype = args.dtype)
+    for item in args.files:
+        key, path = item.split('=', 1)
+        stats = loader.load(path, key)
+        print(f"{path}: {stats['records']} records ({stats['skipped']} skipped) in {stats['seconds']:.2f}s, {stats['records_per_second']:,.0f} records/s")
+
+    store = loader.store()
+    store.save(args.output)
+    print(f"{len(store.tickers)} tickers written to {args.output}")
+
+if __name__ == '__main__':
+    main()
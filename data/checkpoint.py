@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+
+from data.result_store import params_hash
+
+def input_hash(statements, context):
+    """
+    Summary:
+    Content hash of everything a valuation reads: the statements of a ticker and the run context (market
+    data, growth parameters, beta, ...). Key order does not matter, any changed value changes the hash.
+    inputs:
+    statements (dict): {Fundamentals argument: json}, e.g. one entry of fetch_statements().
+    context (dict): json-serializable inputs of the valuation other than the statements.
+    returns:
+    (str) = hex digest
+    """
+    return params_hash({'statements': statements, 'context': context})
+
+class Checkpoint:
+
+    def __init__(self, path):
+        """
+        Summary:
+        Durable record of the last valuation of every ticker and the hash of its inputs, kept in a json lines
+        file (one {'ticker', 'hash', 'row'} line per valuation, the last line of a ticker wins). Lines are
+        appended and synced to disk as results come in, so an interrupted run loses at most the batch being
+        written, and the next run skips every ticker whose inputs still have the recorded hash: it both
+        resumes a crashed run and only re-values the tickers whose inputs changed since the last one.
+        inputs:
+        path (str): json lines file (created if missing).
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.lines = 0
+
+        end = 0
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                for line in f:
+                    #a partial last line is what an interrupted write left behind
+                    if not line.endswith(b'\n'):
+                        break
+                    entry = json.loads(line)
+                    self._entries[entry['ticker']] = entry
+                    self.lines += 1
+                    end += len(line)
+            if end != os.path.getsize(path):
+                os.truncate(path, end)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, ticker):
+        return ticker in self._entries
+
+    def get(self, ticker, hash=None):
+        """
+        Summary:
+        Last recorded row of a ticker, None if there is none or if it was computed from inputs with another hash.
+        """
+        entry = self._entries.get(ticker)
+        if entry is None or (hash is not None and entry['hash'] != hash):
+            return None
+        return entry['row']
+
+    def add(self, entries):
+        """
+        Summary:
+        Appends valuations and syncs the file to disk before returning.
+        inputs:
+        entries (list): [(ticker, hash, row)], row a json-serializable dict.
+        """
+        #numpy scalars are written as python numbers, the entries kept in memory are the ones read back later
+        lines = [json.dumps({'ticker': ticker, 'hash': hash, 'row': row}, default=lambda value: value.item()) + '\n'
+                 for ticker, hash, row in entries]
+
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(''.join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+            for line in lines:
+                entry = json.loads(line)
+                self._entries[entry['ticker']] = entry
+            self.lines += len(lines)
+
+    def compact(self):
+        """
+        Summary:
+        Rewrites the file with only the last line of every ticker (atomically, via a temporary file).
+        """
+        with self._lock:
+            tmp = f'{self.path}.tmp'
+            with open(tmp, 'w') as f:
+                for entry in self._entries.values():
+                    f.write(json.dumps(entry) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self.lines = len(self._entries)
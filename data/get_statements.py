@@ -1,28 +1,49 @@
-def get_statement(company_ticker, statement_name, api_key, frequency='annual', df = False):
+import pandas as pd
+
+from data.request_scheduler import INTERACTIVE, get_scheduler
+
+BASE_URL = 'https://financialmodelingprep.com/api/v3'
+STATEMENT_NAMES = ['income-statement','balance-sheet-statement','cash-flow-statement', 'enterprise-value', 'financial-ratios']
+
+def get_statement(company_ticker, statement_name, api_key, frequency='annual', df = False, cache = None, scheduler = None, priority = INTERACTIVE):
     """
     Get a financial statement to use for fundamental calculations
-    
+
     inputs:
     company_ticker (str) -- e.g. 'AAPL' for Apple inc.
     statement_name (str) -- one of: 'income-statement','balance-sheet-statement','cash-flow-statement','enterprise-value'
     period (str) -- 'annual' or 'quarter'
     forecast_period (int) -- Number of years you wish to forecast
     api_key (str) -- api key to access financialmodelingprep account
-    
+    cache (StatementCache) -- optional on-disk cache, statements are only requested when missing or expired.
+    scheduler (RequestScheduler) -- rate limit, daily budget and dedup of the api calls, defaults to the shared one.
+    priority (int) -- request_scheduler.INTERACTIVE or request_scheduler.BATCH.
+
     returns:
     Pandas DataFrame object
     """
-    if statement_name in ['income-statement','balance-sheet-statement','cash-flow-statement', 'enterprise-value', 'financial-ratios']:
-        
-        statement = requests.get(f'https://financialmodelingprep.com/api/v3/{statement_name}/{company_ticker}?period={frequency}&apikey={api_key}').json()
-        
+    if statement_name in STATEMENT_NAMES:
+
+        statement = None
+        if cache is not None:
+            statement = cache.get(company_ticker, statement_name, frequency)
+
+        if statement is None:
+            if scheduler is None:
+                scheduler = get_scheduler()
+            statement = scheduler.get_json(f'{BASE_URL}/{statement_name}/{company_ticker}?period={frequency}&apikey={api_key}', priority)
+
+            #never cache the error messages returned by the api (e.g. exceeded quota)
+            if (cache is not None) and not (isinstance(statement, dict) and 'Error Message' in statement):
+                cache.put(company_ticker, statement_name, frequency, statement)
+
         if df:
             statement = pd.DataFrame.from_dict(statement[0], orient='index')
             statement = statement.iloc[5:-2]
             statement.columns = ['Year 0']
             statement['Year 0'] = statement['Year 0'].astype('float64')
-        
+
         else:
             pass
-    
+
     return statement
@@ -0,0 +1,110 @@
+import datetime
+import json
+
+#market data already loaded during this run: {as-of date: MarketData}
+_loaded = {}
+
+class MarketData:
+
+    def __init__(self, risk_free_rate, index_return, as_of):
+        """
+        Summary:
+        Market inputs shared by every company valued in a run.
+        inputs:
+        risk_free_rate (float): US 1-Year treasury bond yield (e.g. 0.015 for 1.5%).
+        index_return (float): trailing one-year return of the index (S&P 500).
+        as_of (str): date of the market data, 'YYYY-MM-DD'.
+        """
+        self.risk_free_rate = float(risk_free_rate)
+        self.index_return = float(index_return)
+        self.as_of = str(as_of)
+
+    def __repr__(self):
+        return f"MarketData(risk_free_rate={self.risk_free_rate}, index_return={self.index_return}, as_of='{self.as_of}')"
+
+    def __eq__(self, other):
+        return isinstance(other, MarketData) and self.to_dict() == other.to_dict()
+
+    def __hash__(self):
+        #hashable by value so valuation pipelines can key memoized stages on it (see tools/pipeline.py)
+        return hash((self.risk_free_rate, self.index_return, self.as_of))
+
+    def to_dict(self):
+        return {'risk_free_rate': self.risk_free_rate,
+                'index_return': self.index_return,
+                'as_of': self.as_of}
+
+    def to_file(self, path):
+        """
+        Summary:
+        Saves the market data as json so later runs can be replayed without FRED.
+        """
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Summary:
+        Loads market data saved with to_file().
+        """
+        with open(path) as f:
+            return cls(**json.load(f))
+
+def fetch_market_data(as_of=None):
+    """
+    Summary:
+    Downloads the risk-free-rate (TB1YR) and S&P 500 series from FRED.
+    inputs:
+    as_of (str/datetime): last date of the series, defaults to today.
+    returns:
+    MarketData
+    """
+    #imported here so valuations that reuse loaded market data never pay for pandas_datareader
+    import pandas_datareader.data as web
+
+    end = datetime.datetime.today() if as_of is None else _to_datetime(as_of)
+    #two years of history cover the 252 trading days needed for the index return
+    start = end - datetime.timedelta(days=730)
+
+    Treasury = web.DataReader(['TB1YR'], 'fred', start, end)
+    Treasury.dropna(inplace = True)
+    risk_free_rate = float(Treasury['TB1YR'].iloc[-1])/100
+
+    SP500 = web.DataReader(['sp500'], 'fred', start, end)
+    SP500.dropna(inplace = True)
+    index_return = (SP500['sp500'].iloc[-1]/SP500['sp500'].iloc[-252]) - 1
+
+    return MarketData(risk_free_rate, index_return, end.strftime('%Y-%m-%d'))
+
+def get_market_data(as_of=None, path=None):
+    """
+    Summary:
+    Returns the market data for a date, loading it at most once per run.
+    inputs:
+    as_of (str/datetime): date of the market data, defaults to today.
+    path (str): optional json file written by MarketData.to_file(), used instead of FRED.
+    returns:
+    MarketData
+    """
+    if path is not None:
+        market_data = MarketData.from_file(path)
+        _loaded.setdefault(market_data.as_of, market_data)
+        return market_data
+
+    key = (datetime.datetime.today() if as_of is None else _to_datetime(as_of)).strftime('%Y-%m-%d')
+    if key not in _loaded:
+        _loaded[key] = fetch_market_data(key)
+
+    return _loaded[key]
+
+def _to_datetime(as_of):
+    """
+    Summary:
+    Converts a 'YYYY-MM-DD' string (or datetime) to a datetime.
+    """
+    if isinstance(as_of, datetime.datetime):
+        return as_of
+    if isinstance(as_of, datetime.date):
+        return datetime.datetime(as_of.year, as_of.month, as_of.day)
+    return datetime.datetime.strptime(str(as_of)[:10], '%Y-%m-%d')
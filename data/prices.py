@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from data.batch_fetch import BatchFetcher
+
+#index the betas are measured against (S&P 500)
+INDEX_SYMBOL = '^GSPC'
+
+def load_prices(path):
+    """
+    Summary:
+    Loads daily closing prices from a local csv file, either wide (a 'date' column and one column per symbol)
+    or long ('date', 'symbol', 'close' columns).
+    returns:
+    (DataFrame) = closing prices, one column per symbol, indexed by date (oldest first).
+    """
+    prices = pd.read_csv(path)
+    if {'date', 'symbol', 'close'} <= set(prices.columns):
+        prices = prices.pivot_table(index='date', columns='symbol', values='close', aggfunc='last')
+    else:
+        prices = prices.set_index('date')
+    prices.index = pd.to_datetime(prices.index)
+    prices.columns.name = None
+    return prices.sort_index().astype('float64')
+
+def save_prices(prices, path):
+    """
+    Summary:
+    Saves closing prices (as returned by load_prices() or fetch_prices()) to a wide csv file.
+    """
+    prices.rename_axis('date').to_csv(path)
+
+def fetch_prices(tickers, api_key, index=INDEX_SYMBOL, cache=None, **kwargs):
+    """
+    Summary:
+    Fetches the daily closing prices of tickers and the index from 'financialmodelingprep' in one batch
+    (see BatchFetcher, kwargs are passed to it). With a StatementCache, prices are only requested once a day.
+    returns:
+    (DataFrame) = closing prices, one column per symbol, indexed by date (oldest first). Symbols that
+                  failed are left out.
+    """
+    symbols = list(dict.fromkeys(list(tickers) + ([index] if index is not None else [])))
+    with BatchFetcher(api_key, cache=cache, **kwargs) as fetcher:
+        results = fetcher.fetch(symbols, {'prices': ('historical-price-full', 'daily')})
+
+    columns = {}
+    for symbol, result in results.items():
+        history = result['prices'].get('historical', []) if isinstance(result['prices'], dict) else []
+        if history:
+            columns[symbol] = pd.Series([float(day['close']) for day in history],
+                                        index=pd.to_datetime([day['date'] for day in history]))
+    prices = pd.DataFrame(columns)
+    return prices.sort_index().astype('float64') if len(prices) else prices
+
+def synthetic_prices(betas, n_days=756, seed=0, end='2020-12-31', index=INDEX_SYMBOL):
+    """
+    Summary:
+    Daily closing prices of fictitious companies with known betas and of the index (for tests and benchmarks).
+    inputs:
+    betas (dict): {ticker: beta}.
+    n_days (int): number of business days.
+    returns:
+    (DataFrame) = closing prices, one column per ticker plus the index.
+    """
+    rng = np.random.RandomState(seed)
+    dates = pd.bdate_range(end=end, periods=n_days)
+    market = rng.normal(0.0003, 0.01, n_days)
+    returns = market[:, None]*np.array(list(betas.values()), dtype='float64') + rng.normal(0, 0.01, (n_days, len(betas)))
+
+    prices = 100*np.cumprod(1 + np.column_stack([returns, market]), axis=0)
+    return pd.DataFrame(prices, index=dates, columns=list(betas) + [index])
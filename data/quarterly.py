@@ -0,0 +1,296 @@
+import datetime
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+#quarterly statements ingested, in the order their records are combined
+QUARTERLY_STATEMENTS = ['income-statement', 'balance-sheet-statement', 'cash-flow-statement']
+
+#flow fields summed over the trailing four quarters: {field (see data.statement_store.FIELDS): (statement, key)}
+TTM_FLOWS = {'inc.ebitda': ('income-statement', 'ebitda'),
+             'inc.depreciationAndAmortization': ('income-statement', 'depreciationAndAmortization'),
+             'inc.interestExpense': ('income-statement', 'interestExpense'),
+             'cf.depreciationAndAmortization': ('cash-flow-statement', 'depreciationAndAmortization'),
+             'cf.changeInWorkingCapital': ('cash-flow-statement', 'changeInWorkingCapital'),
+             'cf.capitalExpenditure': ('cash-flow-statement', 'capitalExpenditure'),
+             'cf.operatingCashFlow': ('cash-flow-statement', 'operatingCashFlow')
+            }
+
+#balance fields taken from the last quarter of each trailing year
+TTM_BALANCES = {'inc.weightedAverageShsOutDil': ('income-statement', 'weightedAverageShsOutDil'),
+                'bs.totalAssets': ('balance-sheet-statement', 'totalAssets'),
+                'bs.longTermDebt': ('balance-sheet-statement', 'longTermDebt'),
+                'bs.totalDebt': ('balance-sheet-statement', 'totalDebt'),
+                'bs.totalCurrentAssets': ('balance-sheet-statement', 'totalCurrentAssets'),
+                'bs.totalCurrentLiabilities': ('balance-sheet-statement', 'totalCurrentLiabilities'),
+                'bs.totalStockholdersEquity': ('balance-sheet-statement', 'totalStockholdersEquity'),
+                'bsq.totalDebt': ('balance-sheet-statement', 'totalDebt'),
+                'bsq.totalStockholdersEquity': ('balance-sheet-statement', 'totalStockholdersEquity'),
+                'ev.totalDebt': ('balance-sheet-statement', 'totalDebt'),
+                'ev.cash': ('balance-sheet-statement', 'cashAndCashEquivalents')
+               }
+
+def _value(record, key):
+    try:
+        return float(record[key])
+    except (KeyError, TypeError, ValueError):
+        return np.nan
+
+class TTMAccumulator:
+
+    def __init__(self, n_years=2, resync=256):
+        """
+        Summary:
+        Rolling trailing-twelve-month aggregates updated in O(1) as each quarter arrives: a ring buffer of the
+        last 4*n_years quarters and one running sum per trailing year (the quarter entering a window is added
+        and the one leaving it subtracted). Missing values are counted per window instead of poisoning the sums.
+        inputs:
+        n_years (int): trailing years kept (2 gives the current and the previous TTM, e.g. for the f-score).
+        resync (int): the sums are recomputed from the buffer every resync quarters to bound rounding drift.
+        """
+        self.n_years = n_years
+        self.resync = resync
+        self.flows = list(TTM_FLOWS)
+        self.balances = list(TTM_BALANCES)
+
+        size = 4*n_years
+        self._flows = np.zeros((size, len(self.flows)))
+        self._missing = np.zeros((size, len(self.flows)), dtype=bool)
+        self._balances = np.full((size, len(self.balances)), np.nan)
+        self._sums = np.zeros((n_years, len(self.flows)))
+        self._missing_counts = np.zeros((n_years, len(self.flows)), dtype='int64')
+        self._position = 0
+
+        self.count = 0
+        self.last_date = ''
+
+    def _age(self, age):
+        #buffer index of the quarter pushed `age` quarters before the latest one
+        return (self._position - 1 - age) % len(self._flows)
+
+    def push(self, date, flows, balances):
+        """
+        Summary:
+        Adds the next quarter. Quarters not newer than the last one are ignored.
+        inputs:
+        date (str): period end date, 'YYYY-MM-DD'.
+        flows (array): values of the fields in self.flows for the quarter.
+        balances (array): values of the fields in self.balances at the end of the quarter.
+        returns:
+        (bool) = True if the quarter was added.
+        """
+        if date <= self.last_date:
+            return False
+
+        flows = np.asarray(flows, dtype='float64')
+        missing = np.isnan(flows)
+        flows = np.where(missing, 0.0, flows)
+
+        #window k covers the quarters aged 4k to 4k+3: after this push the quarter aged 4k-1 enters it
+        #and the quarter aged 4k+3 leaves it
+        for k in range(self.n_years):
+            if k == 0:
+                entering, entering_missing = flows, missing
+            elif self.count >= 4*k:
+                entering, entering_missing = self._flows[self._age(4*k - 1)], self._missing[self._age(4*k - 1)]
+            else:
+                continue
+            self._sums[k] += entering
+            self._missing_counts[k] += entering_missing
+            if self.count >= 4*k + 4:
+                self._sums[k] -= self._flows[self._age(4*k + 3)]
+                self._missing_counts[k] -= self._missing[self._age(4*k + 3)]
+
+        self._flows[self._position] = flows
+        self._missing[self._position] = missing
+        self._balances[self._position] = balances
+        self._position = (self._position + 1) % len(self._flows)
+        self.count += 1
+        self.last_date = date
+
+        if self.count % self.resync == 0:
+            self._resync()
+        return True
+
+    def push_quarter(self, date, records):
+        """
+        Summary:
+        Adds a quarter from its statement records {statement_name: record} (see QUARTERLY_STATEMENTS).
+        """
+        return self.push(date,
+                         [_value(records[statement], key) for statement, key in TTM_FLOWS.values()],
+                         [_value(records[statement], key) for statement, key in TTM_BALANCES.values()])
+
+    def _resync(self):
+        for k in range(self.n_years):
+            ages = [self._age(age) for age in range(4*k, min(4*k + 4, self.count))]
+            self._sums[k] = self._flows[ages].sum(axis=0)
+            self._missing_counts[k] = self._missing[ages].sum(axis=0)
+
+    def values(self):
+        """
+        Summary:
+        Trailing-twelve-month figures, index 0 for the latest trailing year, 1 for the year before, ...
+        returns:
+        (dict) = {field: ndarray (n_years,)}, NaN where a year has fewer than four quarters or a missing value.
+        """
+        complete = self.count >= 4*np.arange(1, self.n_years + 1)
+        sums = np.where(complete[:, None] & (self._missing_counts == 0), self._sums, np.nan)
+
+        results = {field: sums[:, i] for i, field in enumerate(self.flows)}
+        for i, field in enumerate(self.balances):
+            results[field] = np.array([self._balances[self._age(4*k), i] if self.count > 4*k else np.nan
+                                       for k in range(self.n_years)])
+        return results
+
+class QuarterlyIngestor:
+
+    def __init__(self, path, fetcher, n_years=2, initial_quarters=None, keep_quarters=40):
+        """
+        Summary:
+        Incremental ingestion of the quarterly statements: only the quarters newer than the ones stored are
+        requested (with the api 'limit' parameter), they are merged into a json file per ticker and pushed
+        into a TTMAccumulator, so a daily refresh transfers a few kilobytes instead of whole histories.
+        inputs:
+        path (str): directory of the stored quarters (created if missing).
+        fetcher (BatchFetcher): fetcher used for the requests (retries, scheduler and api key).
+        n_years (int): trailing years of TTM figures (see TTMAccumulator).
+        initial_quarters (int): quarters requested for a ticker not stored yet, defaults to 4*n_years.
+        keep_quarters (int): quarters kept on disk per ticker.
+        """
+        self.path = path
+        self.fetcher = fetcher
+        self.n_years = n_years
+        self.initial_quarters = 4*n_years if initial_quarters is None else initial_quarters
+        self.keep_quarters = keep_quarters
+        os.makedirs(path, exist_ok=True)
+
+        self._accumulators = {}
+        self._statements = {}
+        self._lock = threading.Lock()
+
+        #statistics of the refreshes
+        self.requests_sent = 0
+        self.bytes_received = 0
+
+    def _file(self, ticker):
+        return os.path.join(self.path, f'{ticker.upper()}.quarterly.json')
+
+    def statements(self, ticker):
+        """
+        Summary:
+        Stored quarters of a ticker.
+        returns:
+        (dict) = {statement_name: list of quarters, newest first}
+        """
+        if ticker not in self._statements:
+            statements = {name: [] for name in QUARTERLY_STATEMENTS}
+            if os.path.exists(self._file(ticker)):
+                with open(self._file(ticker)) as f:
+                    statements.update(json.load(f))
+            self._statements[ticker] = statements
+        return self._statements[ticker]
+
+    def accumulator(self, ticker):
+        """
+        Summary:
+        TTMAccumulator of a ticker, rebuilt from the stored quarters on first use.
+        """
+        if ticker not in self._accumulators:
+            accumulator = TTMAccumulator(self.n_years)
+            self._push_new(self.statements(ticker), accumulator)
+            self._accumulators[ticker] = accumulator
+        return self._accumulators[ticker]
+
+    @staticmethod
+    def _push_new(statements, accumulator):
+        #quarters present in every statement and newer than the accumulator, oldest first
+        by_date = [{record['date'][:10]: record for record in statements[name]} for name in QUARTERLY_STATEMENTS]
+        dates = sorted(set.intersection(*[set(records) for records in by_date]))
+        added = 0
+        for date in dates:
+            if date > accumulator.last_date:
+                added += accumulator.push_quarter(date, {name: records[date] for name, records in zip(QUARTERLY_STATEMENTS, by_date)})
+        return added
+
+    def _fetch_newer(self, ticker, statement_name, stored, today):
+        """
+        Summary:
+        Requests the quarters of a statement newer than the stored ones: as many as the quarters elapsed since
+        the last stored date (at least one), doubling the request while every quarter returned is new.
+        """
+        if not stored:
+            limit = self.initial_quarters
+        else:
+            last = datetime.datetime.strptime(stored[0]['date'][:10], '%Y-%m-%d')
+            limit = max(1, ((today - last).days//91))
+
+        while True:
+            records = self.fetcher.fetch_statement(ticker, statement_name, 'quarter', limit=limit)
+            with self._lock:
+                self.requests_sent += 1
+                self.bytes_received += len(json.dumps(records))
+            if isinstance(records, dict) and 'Error Message' in records:
+                raise RuntimeError(f"{ticker} {statement_name}: {records['Error Message']}")
+
+            newer = [record for record in records if not stored or record['date'][:10] > stored[0]['date'][:10]]
+            if not stored or len(newer) < len(records) or len(records) < limit:
+                return newer
+            limit *= 2
+
+    def refresh(self, ticker, today=None):
+        """
+        Summary:
+        Fetches the new quarters of a ticker and updates its stored statements and TTM figures.
+        inputs:
+        today (datetime): date used to estimate the number of new quarters, defaults to today.
+        returns:
+        (int) = number of quarters added to the TTM figures.
+        """
+        today = datetime.datetime.now() if today is None else today
+        statements = self.statements(ticker)
+        accumulator = self.accumulator(ticker)
+
+        changed = False
+        for name in QUARTERLY_STATEMENTS:
+            newer = self._fetch_newer(ticker, name, statements[name], today)
+            if newer:
+                statements[name] = sorted(newer, key=lambda record: record['date'], reverse=True) + statements[name]
+                statements[name] = statements[name][:self.keep_quarters]
+                changed = True
+
+        if changed:
+            tmp = f'{self._file(ticker)}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(statements, f)
+            os.replace(tmp, self._file(ticker))
+
+        return self._push_new(statements, accumulator)
+
+    def refresh_all(self, tickers, today=None):
+        """
+        Summary:
+        Refreshes many tickers concurrently (fetcher.max_workers at a time).
+        returns:
+        (dict) = {ticker: quarters added or the exception raised}
+        """
+        def refresh(ticker):
+            try:
+                return self.refresh(ticker, today)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=self.fetcher.max_workers) as pool:
+            return dict(zip(tickers, pool.map(refresh, tickers)))
+
+    def ttm(self, ticker):
+        """
+        Summary:
+        Trailing-twelve-month figures of a ticker, e.g. Fundamentals(..., ttm=ingestor.ttm(ticker)).
+        returns:
+        (dict) = {field: ndarray (n_years,)} (see TTMAccumulator.values())
+        """
+        return self.accumulator(ticker).values()
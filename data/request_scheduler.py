@@ -0,0 +1,216 @@
+import datetime
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import requests
+
+#request priorities, lower is served first
+INTERACTIVE = 0
+BATCH = 1
+
+#calls per day of the free 'financialmodelingprep' tier
+FREE_TIER_BUDGET = 250
+
+class BudgetExceededError(RuntimeError):
+    pass
+
+def _today():
+    #the api quota is counted per UTC day
+    return datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d')
+
+class RequestScheduler:
+
+    def __init__(self, rate=5, burst=10, daily_budget=FREE_TIER_BUDGET, reserve=0, state_path=None, timeout=10):
+        """
+        Summary:
+        Sits in front of the api calls: identical requests in flight are sent once and their response shared,
+        requests are released at a token-bucket rate, a daily budget of calls is enforced and interactive
+        requests are always served before batch requests waiting at the same time.
+        inputs:
+        rate (float): sustained requests per second.
+        burst (int): requests that can be sent at once after an idle period (size of the token bucket).
+        daily_budget (int): calls allowed per UTC day, None for no limit.
+        reserve (int): calls of the daily budget only interactive requests may use.
+        state_path (str): optional json file where the calls used today are kept, so consecutive runs of the
+                          same day share the budget.
+        timeout (float): timeout in seconds of the requests sent by get_json().
+        """
+        self.rate = float(rate)
+        self.burst = burst
+        self.daily_budget = daily_budget
+        self.reserve = reserve
+        self.state_path = state_path
+        self.timeout = timeout
+        self.session = requests.Session()
+
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._in_flight = {}
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+        self.day = _today()
+        self.used = 0
+        if state_path is not None and os.path.exists(state_path):
+            with open(state_path) as f:
+                state = json.load(f)
+            if state.get('day') == self.day:
+                self.used = state['used']
+
+        #statistics
+        self.sent = 0
+        self.coalesced = 0
+
+    def remaining(self):
+        """
+        Summary:
+        Calls left in today's budget (None if there is no budget).
+        """
+        with self._cond:
+            self._roll_day()
+            return None if self.daily_budget is None else max(self.daily_budget - self.used, 0)
+
+    def status(self):
+        """
+        Summary:
+        Budget and activity of the scheduler.
+        returns:
+        (dict) = {'day', 'used', 'remaining', 'daily_budget', 'sent', 'coalesced', 'waiting', 'in_flight'}
+        """
+        remaining = self.remaining()
+        with self._cond:
+            return {'day': self.day,
+                    'used': self.used,
+                    'remaining': remaining,
+                    'daily_budget': self.daily_budget,
+                    'sent': self.sent,
+                    'coalesced': self.coalesced,
+                    'waiting': len(self._waiting),
+                    'in_flight': len(self._in_flight)}
+
+    def _roll_day(self):
+        today = _today()
+        if today != self.day:
+            self.day = today
+            self.used = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated)*self.rate)
+        self._updated = now
+
+    def _save_state(self):
+        tmp = f'{self.state_path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'day': self.day, 'used': self.used}, f)
+        os.replace(tmp, self.state_path)
+
+    def _acquire(self, priority):
+        """
+        Summary:
+        Blocks until the request may be sent: it is the highest priority waiter (first come first served
+        within a priority), a token is available and the budget allows it.
+        """
+        with self._cond:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    self._roll_day()
+                    if self.daily_budget is not None:
+                        limit = self.daily_budget - (self.reserve if priority > INTERACTIVE else 0)
+                        if self.used >= limit:
+                            raise BudgetExceededError(f"Daily api budget used: {self.used} of {self.daily_budget} calls ({self.reserve} reserved for interactive requests)")
+
+                    if self._waiting[0] != ticket:
+                        self._cond.wait()
+                        continue
+
+                    self._refill()
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        self.used += 1
+                        self.sent += 1
+                        if self.state_path is not None:
+                            self._save_state()
+                        return
+                    self._cond.wait((1 - self._tokens)/self.rate)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+    def call(self, key, function, priority=INTERACTIVE):
+        """
+        Summary:
+        Runs function() (one api call) under the scheduler. If a call with the same key is already in flight,
+        waits for it and returns its result instead of making another call.
+        inputs:
+        key (hashable): identity of the request, e.g. its url.
+        function (callable): makes the request and returns its result.
+        priority (int): INTERACTIVE or BATCH.
+        """
+        with self._cond:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            self._acquire(priority)
+            result = function()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._cond:
+                del self._in_flight[key]
+
+    def get_json(self, url, priority=INTERACTIVE):
+        """
+        Summary:
+        GET a url through the scheduler and decode the json response.
+        """
+        return self.call(url, lambda: self.session.get(url, timeout=self.timeout).json(), priority)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """
+    Summary:
+    Scheduler shared by every 'financialmodelingprep' call of the process, created on first use.
+    The daily budget defaults to the free tier and can be changed with the FMP_DAILY_BUDGET environment
+    variable ('none' for no limit), FMP_BUDGET_STATE sets a state file shared by runs (see RequestScheduler).
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            budget = os.environ.get('FMP_DAILY_BUDGET', str(FREE_TIER_BUDGET))
+            _scheduler = RequestScheduler(daily_budget = None if budget.lower() == 'none' else int(budget),
+                                          state_path = os.environ.get('FMP_BUDGET_STATE'))
+        return _scheduler
+
+def set_scheduler(scheduler):
+    """
+    Summary:
+    Replaces the shared scheduler, e.g. set_scheduler(RequestScheduler(rate=10, daily_budget=750)) on a paid tier.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
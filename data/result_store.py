@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+#metric columns of a new store (one float64 per metric and valuation)
+METRICS = ['wacc', 'cost_of_debt', 'capm', 'beta', 'enterprise_value', 'equity_value', 'share_price',
+           'npv_fcf_sum', 'debt', 'cash', 'number_of_shares']
+
+def params_hash(params):
+    """
+    Summary:
+    Stable hash of the valuation parameters (independent of the key order), used in the store keys.
+    """
+    text = json.dumps(params, sort_keys=True, default=lambda value: value.tolist() if hasattr(value, 'tolist') else str(value))
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+class ResultStore:
+
+    def __init__(self, path, metrics=None):
+        """
+        Summary:
+        Append-only local store of valuation results keyed by (ticker, as-of date, parameter hash).
+        The directory holds:
+        - index.jsonl: one json line per valuation (key, parameters, row, grid offsets), written last.
+        - metrics.f64: one row of raw float64 metrics per valuation, in the order of the index.
+        - grids.f64: raw float64 grids (e.g. sensitivity pivots) referenced by offset and shape.
+        Nothing is ever rewritten: storing a key again appends a new valuation that supersedes the old one.
+        Reads memory-map the files, so columns and grids are returned without copying them into memory.
+        A single process should write to a store at a time (threads of that process may share it).
+        inputs:
+        path (str): directory of the store (created if missing).
+        metrics (list): metric columns of a new store, defaults to METRICS. An existing store keeps its own.
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+
+        meta_file = os.path.join(path, 'meta.json')
+        if os.path.exists(meta_file):
+            with open(meta_file) as f:
+                self.metrics = json.load(f)['metrics']
+            if metrics is not None and list(metrics) != self.metrics:
+                raise ValueError(f"The store at {path} has the metrics {self.metrics}")
+        else:
+            self.metrics = list(METRICS if metrics is None else metrics)
+            with open(meta_file, 'w') as f:
+                json.dump({'metrics': self.metrics}, f)
+        self._column = {metric: i for i, metric in enumerate(self.metrics)}
+
+        self.records = []
+        self._latest = {}
+        self._recover()
+        for record in self.records:
+            self._latest[self._key(record)] = record['row']
+
+        self._metrics_map = None
+        self._grids_map = None
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    @staticmethod
+    def _key(record):
+        return (record['ticker'], record['as_of'], record['params_hash'])
+
+    def _recover(self):
+        """
+        Summary:
+        Reads the index and drops what an interrupted write may have left behind: a partial last line of
+        the index, and metric rows or grid bytes appended after the last complete index line.
+        """
+        index = self._file('index.jsonl')
+        end = 0
+        if os.path.exists(index):
+            with open(index, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    self.records.append(json.loads(line))
+                    end += len(line)
+            if end != os.path.getsize(index):
+                os.truncate(index, end)
+
+        row_bytes = 8*len(self.metrics)
+        grid_bytes = max([0] + [grid['offset'] + 8*int(np.prod(grid['shape'])) for record in self.records
+                                for grid in record['grids'].values()])
+        for name, size in (('metrics.f64', row_bytes*len(self.records)), ('grids.f64', grid_bytes)):
+            file = self._file(name)
+            if not os.path.exists(file):
+                open(file, 'wb').close()
+            elif os.path.getsize(file) != size:
+                os.truncate(file, size)
+
+    def add(self, ticker, as_of, params, metrics, grids=None):
+        """
+        Summary:
+        Appends one valuation.
+        inputs:
+        ticker (str): company ticker.
+        as_of (str): date of the valuation, 'YYYY-MM-DD'.
+        params (dict): json serializable inputs of the valuation (growth rates, market data, ...).
+        metrics (dict): {metric: value}, metrics left out are NaN.
+        grids (dict): {name: 2-d/n-d array or (array, {axis: values})}, e.g. the sensitivity pivot.
+        returns:
+        (dict) = the index record of the valuation.
+        """
+        unknown = set(metrics) - set(self.metrics)
+        if unknown:
+            raise ValueError(f"Unknown metrics: {sorted(unknown)}")
+        row = np.full(len(self.metrics), np.nan)
+        for metric, value in metrics.items():
+            row[self._column[metric]] = value
+
+        with self._lock:
+            record = {'ticker': str(ticker),
+                      'as_of': str(as_of),
+                      'params_hash': params_hash(params),
+                      'params': params,
+                      'row': len(self.records),
+                      'grids': {},
+                      'written': time.time()}
+
+            with open(self._file('grids.f64'), 'ab') as f:
+                offset = f.tell()
+                for name, grid in (grids or {}).items():
+                    array, axes = grid if isinstance(grid, tuple) else (grid, {})
+                    array = np.ascontiguousarray(array, dtype='float64')
+                    f.write(array.tobytes())
+                    record['grids'][name] = {'offset': offset,
+                                             'shape': list(array.shape),
+                                             'axes': {axis: np.asarray(values).tolist() for axis, values in axes.items()}}
+                    offset += array.nbytes
+                f.flush()
+                os.fsync(f.fileno())
+
+            with open(self._file('metrics.f64'), 'ab') as f:
+                f.write(row.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            #the index line commits the valuation, the data it points to is synced to disk first (a power loss
+            #cannot leave the index ahead of the data, see _recover())
+            with open(self._file('index.jsonl'), 'a') as f:
+                f.write(json.dumps(record) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+            self.records.append(record)
+            self._latest[self._key(record)] = record['row']
+        return record
+
+    def __len__(self):
+        return len(self.records)
+
+    def _metrics_array(self):
+        """
+        Summary:
+        (valuation, metric) memory map of every valuation appended so far (remapped when the store grew).
+        """
+        n = len(self.records)
+        if self._metrics_map is None or self._metrics_map.shape[0] != n:
+            if n == 0:
+                return np.empty((0, len(self.metrics)))
+            self._metrics_map = np.memmap(self._file('metrics.f64'), dtype='float64', mode='r', shape=(n, len(self.metrics)))
+        return self._metrics_map
+
+    def find(self, ticker=None, as_of=None, params=None, latest=True):
+        """
+        Summary:
+        Index records of the valuations matching every given filter, in the order they were stored.
+        inputs:
+        ticker (str), as_of (str): keep only this ticker / as-of date.
+        params (dict or str): keep only these parameters (or parameter hash).
+        latest (bool): skip valuations superseded by a later one with the same key.
+        """
+        wanted = params if params is None or isinstance(params, str) else params_hash(params)
+        return [record for record in self.records
+                if (ticker is None or record['ticker'] == ticker)
+                and (as_of is None or record['as_of'] == as_of)
+                and (wanted is None or record['params_hash'] == wanted)
+                and (not latest or self._latest[self._key(record)] == record['row'])]
+
+    def get(self, ticker, as_of, params):
+        """
+        Summary:
+        Latest valuation of a key.
+        returns:
+        (dict) = {'ticker', 'as_of', 'params', metric: value, ..., 'grids': {name: memmap}} or None if missing.
+        """
+        row = self._latest.get((ticker, str(as_of), params if isinstance(params, str) else params_hash(params)))
+        if row is None:
+            return None
+        record = self.records[row]
+        values = self._metrics_array()[row]
+        result = {'ticker': record['ticker'], 'as_of': record['as_of'], 'params': record['params']}
+        result.update({metric: float(values[i]) for i, metric in enumerate(self.metrics)})
+        result['grids'] = {name: self.grid(record, name) for name in record['grids']}
+        return result
+
+    def column(self, metric, records=None):
+        """
+        Summary:
+        Values of one metric. Without records, a zero-copy view over every stored valuation (aligned with
+        self.records), otherwise the values of the given records (e.g. the output of find()).
+        """
+        array = self._metrics_array()[:, self._column[metric]]
+        return array if records is None else np.asarray(array[[record['row'] for record in records]])
+
+    def grid(self, record, name):
+        """
+        Summary:
+        Memory-mapped (read-only, zero-copy) grid of a valuation.
+        """
+        grid = record['grids'][name]
+        return np.memmap(self._file('grids.f64'), dtype='float64', mode='r', offset=grid['offset'], shape=tuple(grid['shape']))
+
+    def frame(self, ticker=None, as_of=None, params=None, latest=True):
+        """
+        Summary:
+        Table of the matching valuations: one row per valuation with the key and every metric.
+        """
+        records = self.find(ticker, as_of, params, latest)
+        rows = np.asarray(self._metrics_array()[[record['row'] for record in records]]).reshape(len(records), len(self.metrics))
+        table = pd.DataFrame(rows, columns = self.metrics)
+        table.insert(0, 'params_hash', [record['params_hash'] for record in records])
+        table.insert(0, 'as_of', [record['as_of'] for record in records])
+        table.insert(0, 'ticker', [record['ticker'] for record in records])
+        return table
+
+    def history(self, ticker, metric, params):
+        """
+        Summary:
+        Latest value of a metric for every as-of date of one ticker and set of parameters.
+        returns:
+        (Series) indexed by as-of date, oldest first.
+        """
+        records = sorted(self.find(ticker = ticker, params = params), key = lambda record: record['as_of'])
+        return pd.Series(self.column(metric, records), index = pd.Index([record['as_of'] for record in records], name = 'as_of'), name = metric)
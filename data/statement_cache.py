@@ -0,0 +1,157 @@
+import json
+import os
+import time
+import zlib
+
+#time-to-live (seconds) of each statement before it is re-fetched
+DAY = 24*60*60
+DEFAULT_TTL = {'income-statement': 7*DAY,
+               'balance-sheet-statement': 7*DAY,
+               'cash-flow-statement': 7*DAY,
+               'financial-ratios': 7*DAY,
+               'enterprise-value': DAY
+              }
+
+class CacheMissError(LookupError):
+    """
+    Raised when an offline cache is asked for a statement it does not hold.
+    """
+
+class StatementCache:
+
+    def __init__(self, path, ttl=None, default_ttl=DAY, max_bytes=256*1024**2, offline=False, compression_level=6):
+        """
+        Summary:
+        On-disk cache of 'financialmodelingprep' statements keyed by (ticker, statement_name, frequency).
+        Each entry is stored as a zlib-compressed JSON file. The file modification time is used as the
+        last-access stamp, so the least-recently-used entries are evicted once the cache exceeds max_bytes.
+        inputs:
+        path (str): directory that holds the cache files (created if missing).
+        ttl (dict): {statement_name: seconds} overriding DEFAULT_TTL.
+        default_ttl (float): ttl in seconds for statements not found in ttl/DEFAULT_TTL.
+        max_bytes (int): maximum size of the cache on disk before LRU eviction.
+        offline (bool): if True, only serve from cache (ignoring ttl) and never touch the network.
+        compression_level (int): zlib compression level (0-9).
+        """
+
+        self.path = path
+        self.ttl = dict(DEFAULT_TTL)
+        if ttl is not None:
+            self.ttl.update(ttl)
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.compression_level = compression_level
+
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.path, exist_ok=True)
+        #size of every entry on disk, used to enforce max_bytes without re-scanning the directory
+        self._sizes = {}
+        for entry in os.scandir(self.path):
+            if entry.is_file() and entry.name.endswith('.json.z'):
+                self._sizes[entry.path] = entry.stat().st_size
+
+    def _file(self, company_ticker, statement_name, frequency):
+        """
+        Summary:
+        Path of the cache file for a (ticker, statement_name, frequency) key.
+        """
+        name = f"{company_ticker.upper()}__{statement_name.replace('/', '-')}__{frequency}.json.z"
+        return os.path.join(self.path, name)
+
+    def get(self, company_ticker, statement_name, frequency='annual'):
+        """
+        Summary:
+        Reads a statement from the cache.
+        returns:
+        statement (json) or None if the entry is missing or older than its ttl.
+        In offline mode a missing entry raises CacheMissError and stale entries are served.
+        """
+        file = self._file(company_ticker, statement_name, frequency)
+
+        try:
+            with open(file, 'rb') as f:
+                entry = json.loads(zlib.decompress(f.read()))
+        except (FileNotFoundError, zlib.error, ValueError):
+            self.misses += 1
+            if self.offline:
+                raise CacheMissError(f"{company_ticker} {statement_name} ({frequency}) is not cached")
+            return None
+
+        ttl = self.ttl.get(statement_name, self.default_ttl)
+        if (not self.offline) and (time.time() - entry['fetched'] > ttl):
+            self.misses += 1
+            return None
+
+        #mark the entry as recently used
+        os.utime(file)
+        self.hits += 1
+        return entry['data']
+
+    def put(self, company_ticker, statement_name, frequency, statement):
+        """
+        Summary:
+        Writes a statement to the cache and evicts least-recently-used entries if the cache is full.
+        """
+        file = self._file(company_ticker, statement_name, frequency)
+
+        payload = json.dumps({'fetched': time.time(), 'data': statement}, separators=(',', ':'))
+        blob = zlib.compress(payload.encode('utf-8'), self.compression_level)
+
+        #write atomically so a crash never leaves a truncated entry behind
+        tmp = file + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(blob)
+        os.replace(tmp, file)
+        self._sizes[file] = len(blob)
+
+        self._evict(keep=file)
+
+    def _evict(self, keep=None):
+        """
+        Summary:
+        Removes the least-recently-used entries until the cache fits in max_bytes.
+        """
+        total = sum(self._sizes.values())
+        if total <= self.max_bytes:
+            return
+
+        by_access = []
+        for file in self._sizes:
+            try:
+                by_access.append((os.stat(file).st_mtime, file))
+            except FileNotFoundError:
+                by_access.append((0, file))
+        by_access.sort()
+
+        for _, file in by_access:
+            if total <= self.max_bytes:
+                break
+            if file == keep:
+                continue
+            total -= self._sizes.pop(file)
+            try:
+                os.remove(file)
+            except FileNotFoundError:
+                pass
+
+    def size(self):
+        """
+        Summary:
+        Total size of the cache on disk in bytes.
+        """
+        return sum(self._sizes.values())
+
+    def clear(self):
+        """
+        Summary:
+        Deletes every entry in the cache.
+        """
+        for file in list(self._sizes):
+            try:
+                os.remove(file)
+            except FileNotFoundError:
+                pass
+        self._sizes = {}
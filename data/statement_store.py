@@ -0,0 +1,218 @@
+import json
+import os
+
+import numpy as np
+
+#statements read by Fundamentals: {key: (Fundamentals argument, list of periods inside the json)}
+STATEMENTS = {'inc': ('income_statement', None),
+              'bs': ('balance_sheet_statement', None),
+              'bsq': ('balance_sheet_statement_quarterly', None),
+              'cf': ('cash_flow_statement', None),
+              'ev': ('enterprise_value', 'enterpriseValues'),
+              'fr': ('financial_ratios', 'ratios')
+             }
+
+#fields used by the valuation: {field: (statement key, path inside a period)}
+FIELDS = {'inc.ebitda': ('inc', ('ebitda',)),
+          'inc.depreciationAndAmortization': ('inc', ('depreciationAndAmortization',)),
+          'inc.interestExpense': ('inc', ('interestExpense',)),
+          'inc.weightedAverageShsOutDil': ('inc', ('weightedAverageShsOutDil',)),
+          'bs.totalAssets': ('bs', ('totalAssets',)),
+          'bs.longTermDebt': ('bs', ('longTermDebt',)),
+          'bs.totalDebt': ('bs', ('totalDebt',)),
+          'bs.totalCurrentAssets': ('bs', ('totalCurrentAssets',)),
+          'bs.totalCurrentLiabilities': ('bs', ('totalCurrentLiabilities',)),
+          'bs.totalStockholdersEquity': ('bs', ('totalStockholdersEquity',)),
+          'bsq.totalDebt': ('bsq', ('totalDebt',)),
+          'bsq.totalStockholdersEquity': ('bsq', ('totalStockholdersEquity',)),
+          'cf.depreciationAndAmortization': ('cf', ('depreciationAndAmortization',)),
+          'cf.changeInWorkingCapital': ('cf', ('changeInWorkingCapital',)),
+          'cf.capitalExpenditure': ('cf', ('capitalExpenditure',)),
+          'cf.operatingCashFlow': ('cf', ('operatingCashFlow',)),
+          'ev.totalDebt': ('ev', ('+ Total Debt',)),
+          'ev.cash': ('ev', ('- Cash & Cash Equivalents',)),
+          'ev.numberOfShares': ('ev', ('Number of Shares',)),
+          'ev.stockPrice': ('ev', ('Stock Price',)),
+          'fr.effectiveTaxRate': ('fr', ('profitabilityIndicatorRatios', 'effectiveTaxRate')),
+          'fr.returnOnAssets': ('fr', ('profitabilityIndicatorRatios', 'returnOnAssets')),
+          'fr.operatingCashFlowPerShare': ('fr', ('cashFlowIndicatorRatios', 'operatingCashFlowPerShare')),
+          'fr.assetTurnover': ('fr', ('operatingPerformanceRatios', 'assetTurnover'))
+         }
+
+def periods(statement, key):
+    """
+    Summary:
+    List of period records (newest first) of a statement in the 'financialmodelingprep' json layout.
+    inputs:
+    statement (json): the statement.
+    key (str): statement key, one of STATEMENTS.
+    """
+    container = STATEMENTS[key][1]
+    if statement is None:
+        return []
+    return statement[container] if container is not None else statement
+
+def read_field(statement, field, period=0):
+    """
+    Summary:
+    Reads one field of one period from a statement in the json layout.
+    inputs:
+    statement (json): the statement holding the field (e.g. the income statement for 'inc.ebitda').
+    field (str): one of FIELDS.
+    period (int): 0 for the latest period, 1 for the one before, ...
+    returns:
+    (float)
+    """
+    key, path = FIELDS[field]
+    value = periods(statement, key)[period]
+    for name in path:
+        value = value[name]
+    return float(value)
+
+def read_history(statement, field, n_periods):
+    """
+    Summary:
+    Reads one field for the n_periods latest periods of a statement in the json layout.
+    returns:
+    (ndarray) = (n_periods,) values, newest first, NaN where a period or value is missing.
+    """
+    key, path = FIELDS[field]
+    values = np.full(n_periods, np.nan)
+    for period, value in enumerate(periods(statement, key)[:n_periods]):
+        try:
+            for name in path:
+                value = value[name]
+            values[period] = float(value)
+        except (KeyError, TypeError, ValueError):
+            pass
+    return values
+
+class StatementStore:
+
+    def __init__(self, tickers, fields, dates):
+        """
+        Summary:
+        Columnar store of the statement fields used by the valuation: one typed array of shape
+        (ticker, period) per field, where period 0 is the latest period. Missing values are NaN.
+        Use StatementStore.from_statements() to build one and save()/load() to memory-map it from disk.
+        inputs:
+        tickers (list): tickers, one per row.
+        fields (dict): {field: ndarray (ticker, period)}.
+        dates (dict): {statement key: ndarray (ticker, period) of 'YYYY-MM-DD' dates}.
+        """
+        self.tickers = np.asarray(tickers, dtype=str)
+        self.index = {ticker: row for row, ticker in enumerate(self.tickers.tolist())}
+        self.fields = fields
+        self.dates = dates
+
+    @property
+    def n_periods(self):
+        return next(iter(self.fields.values())).shape[1] if self.fields else 0
+
+    @classmethod
+    def from_statements(cls, statements, n_periods=None, fields=None, dtype='float64'):
+        """
+        Summary:
+        Builds a store from fetched statements.
+        inputs:
+        statements (dict): {ticker: {Fundamentals argument: json}}, e.g. the output of fetch_statements().
+        n_periods (int): number of periods to keep (defaults to the longest history).
+        fields (list): fields to keep (defaults to every field in FIELDS).
+        dtype (str): dtype of the field arrays (e.g. 'float32' to halve the memory).
+        """
+        fields = list(FIELDS) if fields is None else list(fields)
+        tickers = list(statements)
+
+        def history(ticker, key):
+            return periods(statements[ticker].get(STATEMENTS[key][0]), key)
+
+        if n_periods is None:
+            n_periods = max([len(history(ticker, key)) for ticker in tickers for key in STATEMENTS] + [0])
+
+        arrays = {field: np.full((len(tickers), n_periods), np.nan, dtype=dtype) for field in fields}
+        keys = {FIELDS[field][0] for field in fields}
+        dates = {key: np.full((len(tickers), n_periods), '', dtype='U10') for key in keys}
+
+        for row, ticker in enumerate(tickers):
+            for key in keys:
+                records = history(ticker, key)[:n_periods]
+                for period, record in enumerate(records):
+                    dates[key][row, period] = str(record.get('date', ''))[:10]
+
+                for field in fields:
+                    if FIELDS[field][0] != key:
+                        continue
+                    column = arrays[field][row]
+                    for period, record in enumerate(records):
+                        value = record
+                        try:
+                            for name in FIELDS[field][1]:
+                                value = value[name]
+                            column[period] = float(value)
+                        except (KeyError, TypeError, ValueError):
+                            pass
+
+        return cls(tickers, arrays, dates)
+
+    def value(self, field, ticker, period=0):
+        """
+        Summary:
+        Value of one field for one ticker and period. A missing value raises KeyError, as read_field() does
+        on the json statements (history() and column() return NaN for missing values instead).
+        """
+        value = float(self.fields[field][self.index[ticker], period])
+        if np.isnan(value):
+            raise KeyError(f"{field} of {ticker} is missing for period {period}")
+        return value
+
+    def history(self, field, ticker, n_periods=None):
+        """
+        Summary:
+        Values of one field for the n_periods latest periods of one ticker (NaN padded).
+        """
+        row = self.fields[field][self.index[ticker]]
+        n_periods = len(row) if n_periods is None else n_periods
+        values = np.full(n_periods, np.nan)
+        values[:min(n_periods, len(row))] = row[:n_periods]
+        return values
+
+    def column(self, field, period=None):
+        """
+        Summary:
+        Values of a field for every ticker, a (ticker,) slice for one period or the (ticker, period) array.
+        """
+        array = self.fields[field]
+        return array if period is None else array[:, period]
+
+    def nbytes(self):
+        return sum(array.nbytes for array in self.fields.values())
+
+    def save(self, path):
+        """
+        Summary:
+        Saves the store to a directory: one '.npy' file per field and an index.json file.
+        """
+        os.makedirs(path, exist_ok=True)
+        for field, array in self.fields.items():
+            np.save(os.path.join(path, f'{field}.npy'), array)
+        for key, array in self.dates.items():
+            np.save(os.path.join(path, f'dates.{key}.npy'), array)
+
+        with open(os.path.join(path, 'index.json'), 'w') as f:
+            json.dump({'tickers': self.tickers.tolist(),
+                       'fields': list(self.fields),
+                       'dates': list(self.dates)}, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Summary:
+        Loads a store saved with save(), memory-mapping the arrays by default.
+        """
+        with open(os.path.join(path, 'index.json')) as f:
+            index = json.load(f)
+
+        fields = {field: np.load(os.path.join(path, f'{field}.npy'), mmap_mode=mmap_mode) for field in index['fields']}
+        dates = {key: np.load(os.path.join(path, f'dates.{key}.npy')) for key in index['dates']}
+
+        return cls(index['tickers'], fields, dates)
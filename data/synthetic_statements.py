@@ -0,0 +1,195 @@
+import datetime
+
+import numpy as np
+
+from data.market_data import MarketData
+
+def _dates(n_periods, months, end):
+    """
+    Summary:
+    'YYYY-MM-DD' period end dates, newest first, spaced by a number of months.
+    """
+    dates = []
+    year, month = end.year, end.month
+    for _ in range(n_periods):
+        day = 31 if month in (1, 3, 5, 7, 8, 10, 12) else (28 if month == 2 else 30)
+        dates.append(f'{year}-{month:02d}-{day}')
+        month -= months
+        while month < 1:
+            month += 12
+            year -= 1
+    return dates
+
+def synthetic_statements(ticker, n_periods=5, seed=None, end='2020-12-31'):
+    """
+    Summary:
+    Generates statements of a fictitious company in the exact 'financialmodelingprep' json layouts
+    read by Fundamentals (lists of periods newest first, enterpriseValues/ratios containers, ratios as strings),
+    so valuations can be tested and benchmarked without an api key.
+    inputs:
+    ticker (str): ticker of the company.
+    n_periods (int): number of annual periods (quarterly balance sheets get 4*n_periods).
+    seed (int): seed for reproducible statements, defaults to a seed derived from the ticker.
+    end (str): date of the latest period, 'YYYY-MM-DD'.
+    returns:
+    (dict) = {Fundamentals argument: json}, e.g. Fundamentals(**synthetic_statements('AAA'), ...)
+    """
+    if seed is None:
+        seed = sum(ord(c)*31**i for i, c in enumerate(ticker)) % 2**32
+    rng = np.random.RandomState(seed)
+    end = datetime.datetime.strptime(end, '%Y-%m-%d')
+
+    #size of the company and its (slowly drifting) margins, newest period first
+    revenue = np.exp(rng.uniform(np.log(1e8), np.log(3e11)))*np.cumprod(1/(1 + rng.normal(0.06, 0.05, n_periods)))
+    ebitda_margin = np.clip(rng.normal(0.25, 0.08) + rng.normal(0, 0.02, n_periods), 0.02, 0.7)
+    ebitda = revenue*ebitda_margin
+    depreciation = revenue*rng.uniform(0.02, 0.08)
+    interest_expense = revenue*rng.uniform(0.002, 0.03)
+    shares = np.exp(rng.uniform(np.log(5e7), np.log(1e10)))*(1 + rng.normal(0, 0.01, n_periods))
+
+    total_assets = revenue*rng.uniform(0.8, 2.5)
+    equity = total_assets*rng.uniform(0.3, 0.7)
+    total_debt = total_assets*rng.uniform(0.05, 0.4)
+    long_term_debt = total_debt*rng.uniform(0.6, 0.95)
+    current_assets = total_assets*rng.uniform(0.2, 0.5)
+    current_liabilities = current_assets/rng.uniform(0.8, 2.5, n_periods)
+    cash = current_assets*rng.uniform(0.2, 0.6)
+
+    operating_cash_flow = ebitda*rng.uniform(0.6, 0.9, n_periods)
+    cap_ex = -revenue*rng.uniform(0.02, 0.08)
+    change_in_working_capital = revenue*rng.normal(0, 0.01, n_periods)
+
+    tax_rate = rng.uniform(0.1, 0.3, n_periods)
+    return_on_assets = (ebitda - depreciation - interest_expense)*(1 - tax_rate)/total_assets
+
+    annual = _dates(n_periods, 12, end)
+    quarterly = _dates(4*n_periods, 3, end)
+
+    income_statement = [{'date': annual[i],
+                         'symbol': ticker,
+                         'revenue': float(revenue[i]),
+                         'ebitda': float(ebitda[i]),
+                         'depreciationAndAmortization': float(depreciation[i]),
+                         'interestExpense': float(interest_expense[i]),
+                         'weightedAverageShsOutDil': float(shares[i])} for i in range(n_periods)]
+
+    balance_sheet = [{'date': annual[i],
+                      'symbol': ticker,
+                      'totalAssets': float(total_assets[i]),
+                      'longTermDebt': float(long_term_debt[i]),
+                      'totalDebt': float(total_debt[i]),
+                      'totalCurrentAssets': float(current_assets[i]),
+                      'totalCurrentLiabilities': float(current_liabilities[i]),
+                      'totalStockholdersEquity': float(equity[i]),
+                      'cashAndCashEquivalents': float(cash[i])} for i in range(n_periods)]
+
+    #quarterly balance sheets interpolate between the annual ones
+    years = np.arange(n_periods)
+    balance_sheet_quarterly = [{'date': quarterly[i],
+                                'symbol': ticker,
+                                'totalDebt': float(np.interp(i/4, years, total_debt)),
+                                'totalStockholdersEquity': float(np.interp(i/4, years, equity))}
+                               for i in range(4*n_periods)]
+
+    cash_flow_statement = [{'date': annual[i],
+                            'symbol': ticker,
+                            'depreciationAndAmortization': float(depreciation[i]),
+                            'changeInWorkingCapital': float(change_in_working_capital[i]),
+                            'capitalExpenditure': float(cap_ex[i]),
+                            'operatingCashFlow': float(operating_cash_flow[i])} for i in range(n_periods)]
+
+    enterprise_value = {'symbol': ticker,
+                        'enterpriseValues': [{'date': annual[i],
+                                              'Stock Price': float(rng.uniform(5, 500)),
+                                              'Number of Shares': float(shares[i]),
+                                              '+ Total Debt': float(total_debt[i]),
+                                              '- Cash & Cash Equivalents': float(cash[i])} for i in range(n_periods)]}
+
+    financial_ratios = {'symbol': ticker,
+                        'ratios': [{'date': annual[i],
+                                    'profitabilityIndicatorRatios': {'effectiveTaxRate': str(tax_rate[i]),
+                                                                     'returnOnAssets': str(return_on_assets[i])},
+                                    'cashFlowIndicatorRatios': {'operatingCashFlowPerShare': str(operating_cash_flow[i]/shares[i])},
+                                    'operatingPerformanceRatios': {'assetTurnover': str(revenue[i]/total_assets[i])}}
+                                   for i in range(n_periods)]}
+
+    return {'income_statement': income_statement,
+            'balance_sheet_statement': balance_sheet,
+            'balance_sheet_statement_quarterly': balance_sheet_quarterly,
+            'cash_flow_statement': cash_flow_statement,
+            'enterprise_value': enterprise_value,
+            'financial_ratios': financial_ratios}
+
+def synthetic_quarterly_statements(ticker, n_quarters=8, seed=None, end='2020-12-31'):
+    """
+    Summary:
+    Quarterly income, balance sheet and cash-flow statements of a fictitious company, in the
+    'financialmodelingprep' json layout of period=quarter (see data/quarterly.py).
+    inputs:
+    ticker (str): ticker of the company.
+    n_quarters (int): number of quarters.
+    seed (int): seed for reproducible statements, defaults to a seed derived from the ticker.
+    end (str): date of the latest quarter, 'YYYY-MM-DD'.
+    returns:
+    (dict) = {statement_name: list of quarters, newest first}
+    """
+    if seed is None:
+        seed = sum(ord(c)*37**i for i, c in enumerate(ticker)) % 2**32
+    rng = np.random.RandomState(seed)
+    dates = _dates(n_quarters, 3, datetime.datetime.strptime(end, '%Y-%m-%d'))
+
+    revenue = np.exp(rng.uniform(np.log(2.5e7), np.log(7.5e10)))*np.cumprod(1/(1 + rng.normal(0.015, 0.03, n_quarters)))
+    ebitda = revenue*np.clip(rng.normal(0.25, 0.08) + rng.normal(0, 0.02, n_quarters), 0.02, 0.7)
+    depreciation = revenue*rng.uniform(0.02, 0.08)
+    total_assets = 4*revenue*rng.uniform(0.8, 2.5)
+    total_debt = total_assets*rng.uniform(0.05, 0.4)
+    current_assets = total_assets*rng.uniform(0.2, 0.5)
+
+    income_statement = [{'date': dates[i],
+                         'symbol': ticker,
+                         'period': f'Q{(int(dates[i][5:7]) - 1)//3 + 1}',
+                         'revenue': float(revenue[i]),
+                         'ebitda': float(ebitda[i]),
+                         'depreciationAndAmortization': float(depreciation[i]),
+                         'interestExpense': float(revenue[i]*rng.uniform(0.002, 0.03)),
+                         'weightedAverageShsOutDil': float(rng.uniform(1e8, 1.1e8))} for i in range(n_quarters)]
+
+    balance_sheet = [{'date': dates[i],
+                      'symbol': ticker,
+                      'totalAssets': float(total_assets[i]),
+                      'longTermDebt': float(total_debt[i]*0.8),
+                      'totalDebt': float(total_debt[i]),
+                      'totalCurrentAssets': float(current_assets[i]),
+                      'totalCurrentLiabilities': float(current_assets[i]/rng.uniform(0.8, 2.5)),
+                      'totalStockholdersEquity': float(total_assets[i]*rng.uniform(0.3, 0.7)),
+                      'cashAndCashEquivalents': float(current_assets[i]*rng.uniform(0.2, 0.6))} for i in range(n_quarters)]
+
+    cash_flow_statement = [{'date': dates[i],
+                            'symbol': ticker,
+                            'depreciationAndAmortization': float(depreciation[i]),
+                            'changeInWorkingCapital': float(revenue[i]*rng.normal(0, 0.01)),
+                            'capitalExpenditure': float(-revenue[i]*rng.uniform(0.02, 0.08)),
+                            'operatingCashFlow': float(ebitda[i]*rng.uniform(0.6, 0.9))} for i in range(n_quarters)]
+
+    return {'income-statement': income_statement,
+            'balance-sheet-statement': balance_sheet,
+            'cash-flow-statement': cash_flow_statement}
+
+def synthetic_tickers(n):
+    """
+    Summary:
+    n distinct fictitious tickers ('SYN0', 'SYN1', ...).
+    """
+    return [f'SYN{i}' for i in range(n)]
+
+def synthetic_universe(n, n_periods=5, seed=0):
+    """
+    Summary:
+    Statements of n fictitious companies, in the layout returned by data.batch_fetch.fetch_statements().
+    returns:
+    (dict) = {ticker: {Fundamentals argument: json}}
+    """
+    return {ticker: synthetic_statements(ticker, n_periods, seed=seed + i) for i, ticker in enumerate(synthetic_tickers(n))}
+
+#market data used with synthetic statements (so benchmarks never reach FRED)
+SYNTHETIC_MARKET_DATA = MarketData(0.015, 0.1, '2020-12-31')
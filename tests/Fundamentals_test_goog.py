@@ -68,7 +68,7 @@ def test(ticker, earnings_growth_rate, cap_ex_growth_rate, perpetual_growth_rate
     
 if __name__ == '__main__':
     
-    api_key = #your financialmodelingprep api key
+    api_key = '' #your financialmodelingprep api key
     test(ticker = 'GOOG', 
          earnings_growth_rate = 0.15, 
          cap_ex_growth_rate = 0.5, 
@@ -0,0 +1,75 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from data.batch_fetch import BatchFetcher, FUNDAMENTALS_STATEMENTS, fetch_statements
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    #number of 503 responses to send before answering each path
+    failures = {}
+    seen = {}
+
+    def do_GET(self):
+        path = self.path.split('&apikey')[0]
+        count = StubHandler.seen.get(path, 0)
+        StubHandler.seen[path] = count + 1
+
+        if count < StubHandler.failures.get(path, 0):
+            body = b'{}'
+            self.send_response(503)
+        else:
+            #echo the request so each statement can be identified
+            body = json.dumps([{'path': path}]).encode()
+            self.send_response(200)
+
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    StubHandler.failures = {}
+    StubHandler.seen = {}
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_fetch_all_statements(server):
+
+    results = fetch_statements(['GOOG', 'AAPL'], 'key', base_url=server, max_workers=4)
+
+    assert set(results) == {'GOOG', 'AAPL'}
+    assert set(results['GOOG']) == set(FUNDAMENTALS_STATEMENTS)
+    assert results['AAPL']['balance_sheet_statement_quarterly'] == [{'path': '/balance-sheet-statement/AAPL?period=quarter'}]
+
+def test_retry_with_backoff(server):
+
+    StubHandler.failures = {'/income-statement/GOOG?period=annual': 2}
+
+    with BatchFetcher('key', base_url=server, retries=2, backoff=0.001) as fetcher:
+        results = fetcher.fetch(['GOOG'])
+
+    assert results['GOOG']['income_statement'] == [{'path': '/income-statement/GOOG?period=annual'}]
+    assert fetcher.retried == 2
+    assert fetcher.errors == {}
+
+def test_failures_are_isolated_per_ticker(server):
+
+    StubHandler.failures = {'/income-statement/BAD?period=annual': 10}
+
+    with BatchFetcher('key', base_url=server, retries=1, backoff=0.001) as fetcher:
+        results = fetcher.fetch(['GOOG', 'BAD'])
+
+    assert list(results) == ['GOOG']
+    assert list(fetcher.errors) == ['BAD']
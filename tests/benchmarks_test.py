@@ -0,0 +1,52 @@
+import contextlib
+import io
+
+import numpy as np
+
+from benchmarks import run
+from benchmarks.harness import compare, measure
+from data.statement_store import FIELDS, STATEMENTS, StatementStore, read_field
+from data.synthetic_statements import SYNTHETIC_MARKET_DATA, synthetic_statements, synthetic_universe
+from tools.fundamentals_class import Fundamentals
+
+def test_synthetic_statements_value_offline():
+
+    statements = synthetic_statements('SYN0')
+    assert statements == synthetic_statements('SYN0')
+    assert isinstance(statements['financial_ratios']['ratios'][0]['profitabilityIndicatorRatios']['effectiveTaxRate'], str)
+
+    company = Fundamentals(**statements, company_ticker = 'SYN0', forecasting_period = 4, api_key = '',
+                           market_data = SYNTHETIC_MARKET_DATA, beta = 1.1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        company.dcf(0.05, 0.05, 0.02)
+        company.f_score()
+    assert np.isfinite(company.share_price)
+
+    #every field the valuation reads is present, in the json and in the columnar store
+    universe = synthetic_universe(3)
+    store = StatementStore.from_statements(universe)
+    for field, (key, _) in FIELDS.items():
+        statement = universe['SYN1'][STATEMENTS[key][0]]
+        assert store.value(field, 'SYN1') == read_field(statement, field)
+
+def test_measure_and_compare():
+
+    result = measure(lambda: sum(range(1000)), items = 1000, repeat = 5)
+    assert result['p50'] <= result['p99']
+    assert result['peak_memory'] is not None
+    assert result['throughput'] > 0
+
+    baseline = {'a': dict(result), 'b': dict(result)}
+    slower = dict(result, p50 = result['p50']*2)
+    assert compare({'a': result, 'b': slower, 'c': slower}, baseline) == [('b', 'p50', result['p50'], slower['p50'])]
+
+def test_only_selected_benchmarks_build_their_inputs():
+
+    run._universe.cache_clear()
+    results = run.run(quick = True, pattern = 'what_if', memory = False, progress = False)
+    assert list(results) == ['what_if_perpetual_growth']
+    assert run._universe.cache_info().misses == 0
+
+    results = run.run(quick = True, pattern = 'value_batch_10', memory = False, progress = False)
+    assert list(results) == ['value_batch_10', 'value_batch_100', 'value_batch_1000']
+    assert all(result['throughput'] > 0 for result in results.values())
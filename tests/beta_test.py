@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from data.prices import INDEX_SYMBOL, load_prices, save_prices, synthetic_prices
+from data.result_store import ResultStore
+from data.synthetic_statements import SYNTHETIC_MARKET_DATA, synthetic_statements, synthetic_universe
+from tools.beta import estimate_betas, regress
+from tools.fundamentals_class import Fundamentals
+from tools.universe import value_universe
+
+BETAS = {'SYN0': 0.5, 'SYN1': 1.2, 'SYN2': 2.0}
+
+def test_regression_matches_polyfit_per_column():
+
+    rng = np.random.RandomState(1)
+    market = rng.normal(size = 60)
+    returns = market[:, None]*np.array([0.3, 1.0, 1.7]) + rng.normal(0, 0.5, (60, 3))
+    returns[::7, 1] = np.nan
+    returns[:, 2] = np.nan
+    returns[:3, 2] = [0.1, 0.2, 0.3]
+
+    results = regress(returns, market, min_periods = 10)
+    for column in range(2):
+        known = np.isfinite(returns[:, column])
+        slope, intercept = np.polyfit(market[known], returns[known, column], 1)
+        assert np.isclose(results['beta'][column], slope)
+        assert np.isclose(results['alpha'][column], intercept)
+        assert np.isclose(results['r_squared'][column], np.corrcoef(market[known], returns[known, column])[0, 1]**2)
+    assert results['observations'].tolist() == [60, 51, 3]
+    #too few observations
+    assert np.isnan(results['beta'][2])
+
+def test_estimate_betas_window_frequency_and_as_of():
+
+    prices = synthetic_prices(BETAS, n_days = 1500)
+
+    betas = estimate_betas(prices, frequency = 'daily', window = 1000)
+    assert betas.index.tolist() == list(BETAS)
+    assert (betas['observations'] == 1000).all()
+    assert np.allclose(betas['beta'], list(BETAS.values()), atol = 0.1)
+
+    weekly = estimate_betas(prices, tickers = ['SYN1'], window = 52, as_of = '2019-12-31')
+    assert weekly.index.tolist() == ['SYN1']
+    assert weekly['observations'].iloc[0] == 52
+
+    #the same regression on returns resampled by hand
+    closes = prices.loc[:'2019-12-31'].resample('W-FRI').last().pct_change().iloc[-52:]
+    assert np.isclose(weekly['beta'].iloc[0], np.polyfit(closes[INDEX_SYMBOL], closes['SYN1'], 1)[0])
+
+def test_prices_files_round_trip(tmp_path):
+
+    prices = synthetic_prices(BETAS, n_days = 30)
+    save_prices(prices, str(tmp_path / 'wide.csv'))
+    assert np.allclose(load_prices(str(tmp_path / 'wide.csv')).to_numpy(), prices.to_numpy())
+
+    long = prices.stack().rename('close').rename_axis(['date', 'symbol']).reset_index()
+    long.to_csv(str(tmp_path / 'long.csv'), index = False)
+    loaded = load_prices(str(tmp_path / 'long.csv'))
+    assert np.allclose(loaded[prices.columns].to_numpy(), prices.to_numpy())
+    assert isinstance(loaded.index, pd.DatetimeIndex)
+
+def test_fundamentals_uses_estimated_betas():
+
+    betas = estimate_betas(synthetic_prices(BETAS))['beta']
+    company = Fundamentals(**synthetic_statements('SYN1'), company_ticker = 'SYN1', forecasting_period = 4, api_key = '',
+                           market_data = SYNTHETIC_MARKET_DATA, beta = betas, quiet = True)
+    company.dcf(0.05, 0.05, 0.02)
+    assert company.beta == betas['SYN1']
+
+def test_universe_store_keys_tell_beta_sources_apart(tmp_path):
+
+    store = ResultStore(str(tmp_path), metrics = ['share_price'])
+    universe = synthetic_universe(2)
+    for beta_source in ['prices a weekly 104', 'prices a monthly 24']:
+        value_universe(list(universe), '', 0.05, 0.05, 0.02, statements = universe, market_data = SYNTHETIC_MARKET_DATA,
+                       processes = 1, progress = False, store = store, betas = BETAS, beta_source = beta_source)
+
+    records = store.find(ticker = 'SYN1')
+    assert len(records) == 2
+    assert [record['params']['beta'] for record in records] == [1.2, 1.2]
+    assert {record['params']['beta_source'] for record in records} == {'prices a weekly 104', 'prices a monthly 24'}
@@ -0,0 +1,111 @@
+import csv
+import gzip
+import io
+import json
+import random
+
+import numpy as np
+import pytest
+
+from data.bulk_loader import BulkLoader, iter_json_records
+from data.statement_store import FIELDS, STATEMENTS, StatementStore, periods
+from data.synthetic_statements import SYNTHETIC_MARKET_DATA, synthetic_universe
+from tools.fundamentals_class import Fundamentals
+
+def dump_records(universe, key):
+    #records of every ticker for one statement, as in a whole-market dump (shuffled)
+    records = []
+    for ticker, statements in universe.items():
+        for record in periods(statements[STATEMENTS[key][0]], key):
+            records.append(dict(record, symbol = ticker))
+    random.Random(0).shuffle(records)
+    return records
+
+def test_iter_json_records_across_chunks():
+
+    records = [{'symbol': f'T{i}', 'value': [i, {'x': 'a, ]'}]} for i in range(50)]
+    text = json.dumps(records, indent = 1)
+    assert list(iter_json_records(io.StringIO(text), chunk_size = 7)) == records
+    #json lines
+    lines = '\n'.join(json.dumps(record) for record in records)
+    assert list(iter_json_records(io.StringIO(lines), chunk_size = 5)) == records
+
+def test_malformed_record_raises_without_reading_the_rest():
+
+    class CountingReader(io.StringIO):
+        reads = 0
+        def read(self, size=-1):
+            self.reads += 1
+            return super().read(size)
+
+    records = [json.dumps({'symbol': f'T{i}', 'value': i}) for i in range(100000)]
+    records[3] = '{"symbol": "T3", "value": 3 4}'
+    text = '[' + ',\n'.join(records) + ']'
+    reader = CountingReader(text)
+
+    with pytest.raises(ValueError, match = f'character {text.index("4}")}'):
+        list(iter_json_records(reader, chunk_size = 4096))
+    assert reader.reads == 1
+
+    #a record longer than a chunk is read in a few growing reads
+    reader = CountingReader(json.dumps([{'values': list(range(20000))}]))
+    assert len(list(iter_json_records(reader, chunk_size = 64))[0]['values']) == 20000
+    assert reader.reads < 20
+
+def test_bulk_load_matches_statement_store_and_values(tmp_path):
+
+    universe = synthetic_universe(30, n_periods = 6)
+    loader = BulkLoader(n_periods = 24, chunk_size = 500, batch_size = 37)
+
+    for key in STATEMENTS:
+        records = dump_records(universe, key)
+        if key in ('inc', 'cf'):
+            path = str(tmp_path / f'{key}.json.gz')
+            with gzip.open(path, 'wt') as f:
+                f.write('\n'.join(json.dumps(record) for record in records))
+        elif key == 'fr':
+            path = str(tmp_path / f'{key}.json')
+            with open(path, 'w') as f:
+                json.dump(records, f)
+        else:
+            #csv with the field names of the json layout
+            path = str(tmp_path / f'{key}.csv')
+            names = sorted({name for record in records for name in record})
+            with open(path, 'w', newline = '') as f:
+                writer = csv.DictWriter(f, names)
+                writer.writeheader()
+                writer.writerows(records)
+
+        stats = loader.load(path, key)
+        assert stats['records'] == len(records) == stats['loaded']
+        assert stats['records_per_second'] > 0
+
+    store = loader.store()
+    expected = StatementStore.from_statements(universe, n_periods = 24)
+    rows = [store.index[ticker] for ticker in expected.tickers]
+    for field in FIELDS:
+        assert np.array_equal(store.fields[field][rows], expected.fields[field], equal_nan = True), field
+    for key in expected.dates:
+        assert np.array_equal(store.dates[key][rows], expected.dates[key])
+
+    company = Fundamentals.from_store(store, 'SYN3', 4, '', market_data = SYNTHETIC_MARKET_DATA, beta = 1.1, quiet = True)
+    reference = Fundamentals(**universe['SYN3'], company_ticker = 'SYN3', forecasting_period = 4, api_key = '',
+                             market_data = SYNTHETIC_MARKET_DATA, beta = 1.1, quiet = True)
+    company.dcf(0.05, 0.05, 0.02)
+    reference.dcf(0.05, 0.05, 0.02)
+    assert company.share_price == reference.share_price
+
+def test_only_latest_periods_are_kept_and_duplicates_replace(tmp_path):
+
+    records = [{'symbol': 'AAA', 'date': f'20{year:02d}-12-31', 'ebitda': year} for year in range(10)]
+    records += [{'symbol': 'AAA', 'date': '2008-12-31', 'ebitda': 80}, {'date': '2001-12-31', 'ebitda': 1}]
+    path = str(tmp_path / 'inc.json')
+    with open(path, 'w') as f:
+        json.dump(records, f)
+
+    loader = BulkLoader(n_periods = 3, fields = ['inc.ebitda'], batch_size = 4)
+    stats = loader.load(path, 'inc')
+    assert stats['records'] == 12
+    store = loader.store()
+    assert store.history('inc.ebitda', 'AAA').tolist() == [9, 80, 7]
+    assert store.dates['inc'][0].tolist() == ['2009-12-31', '2008-12-31', '2007-12-31']
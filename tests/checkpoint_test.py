@@ -0,0 +1,79 @@
+import copy
+
+import numpy as np
+
+from data.checkpoint import Checkpoint, input_hash
+from data.market_data import MarketData
+from data.synthetic_statements import SYNTHETIC_MARKET_DATA, synthetic_statements, synthetic_universe
+from tools.universe import METRICS, value_universe
+
+def test_checkpoint_survives_reopening_and_partial_writes(tmp_path):
+
+    path = str(tmp_path/'checkpoint.jsonl')
+    statements = synthetic_statements('SYN0')
+    hash = input_hash(statements, {'perpetual_growth_rate': 0.02})
+    assert hash == input_hash(copy.deepcopy(statements), {'perpetual_growth_rate': 0.02})
+    assert hash != input_hash(statements, {'perpetual_growth_rate': 0.03})
+
+    checkpoint = Checkpoint(path)
+    checkpoint.add([('SYN0', hash, {'share_price': np.float64(10.5), 'f_score': np.int64(7)}),
+                    ('SYN1', 'abc', {'share_price': float('nan')})])
+    checkpoint.add([('SYN1', 'def', {'share_price': 2.0})])
+
+    #an interrupted append leaves a partial line
+    with open(path, 'a') as f:
+        f.write('{"ticker": "SYN2", "ha')
+
+    checkpoint = Checkpoint(path)
+    assert len(checkpoint) == 2 and checkpoint.lines == 3
+    assert checkpoint.get('SYN0', hash) == {'share_price': 10.5, 'f_score': 7}
+    assert checkpoint.get('SYN1', 'abc') is None
+    assert checkpoint.get('SYN1') == {'share_price': 2.0}
+    assert 'SYN2' not in checkpoint
+    assert open(path).read().endswith('\n')
+
+    checkpoint.compact()
+    assert len(open(path).readlines()) == 2
+    assert Checkpoint(path).get('SYN1', 'def') == {'share_price': 2.0}
+
+def test_universe_only_revalues_changed_tickers_and_resumes(tmp_path):
+
+    path = str(tmp_path/'checkpoint.jsonl')
+    universe = synthetic_universe(6)
+    tickers = list(universe)
+    betas = {ticker: 1.1 for ticker in tickers}
+
+    def run(statements=universe, tickers=tickers, market_data=SYNTHETIC_MARKET_DATA, perpetual_growth_rate=0.02, checkpoint=path):
+        stats = {}
+        results = value_universe(tickers, '', 0.05, 0.05, perpetual_growth_rate, statements = statements,
+                                 market_data = market_data, processes = 2, shard_size = 2, progress = False,
+                                 stats = stats, betas = betas, checkpoint = checkpoint)
+        return results, stats
+
+    #an interrupted run that valued half of the tickers
+    run(tickers = tickers[:3])
+    results, stats = run()
+    assert (stats['unchanged'], stats['revalued']) == (3, 3)
+
+    reference, _ = run(checkpoint = None)
+    for column in ['error'] + METRICS[:-2]:
+        np.testing.assert_array_equal(results[column], reference[column])
+
+    #nothing changed, a new market data date alone does not change the inputs
+    again, stats = run(market_data = MarketData(SYNTHETIC_MARKET_DATA.risk_free_rate, SYNTHETIC_MARKET_DATA.index_return, '2021-01-01'))
+    assert (stats['unchanged'], stats['revalued']) == (6, 0)
+    for column in results:
+        np.testing.assert_array_equal(again[column], results[column])
+
+    #one restated statement
+    restated = dict(universe)
+    restated['SYN2'] = copy.deepcopy(universe['SYN2'])
+    restated['SYN2']['income_statement'][0]['ebitda'] *= 1.1
+    changed, stats = run(statements = restated)
+    assert (stats['unchanged'], stats['revalued']) == (5, 1)
+    assert changed['share_price'][2] > results['share_price'][2]
+
+    #new growth parameters change every ticker's inputs
+    _, stats = run(statements = restated, perpetual_growth_rate = 0.03)
+    assert (stats['unchanged'], stats['revalued']) == (0, 6)
+    assert Checkpoint(path).lines == 6
@@ -0,0 +1,41 @@
+import json
+
+import numpy as np
+
+from tools.credit_rating import LARGE_CAP, SMALL_CAP, RatingTable, cost_of_debt
+
+def branch_spread(ratio):
+    #the if/elif chain previously used by Fundamentals._get_cost_of_debt
+    for lower, upper, spread in [(8.5, np.inf, 0.0063), (6.5, 8.5, 0.0078), (5.5, 6.5, 0.0098), (4.25, 5.49, 0.0108),
+                                 (3, 4.25, 0.0122), (2.5, 3, 0.0156), (2.25, 2.5, 0.02), (2, 2.25, 0.0240),
+                                 (1.75, 2, 0.0351), (1.5, 1.75, 0.0421), (1.25, 1.5, 0.0515), (0.8, 1.25, 0.0820),
+                                 (0.65, 0.8, 0.0864), (0.2, 0.65, 0.1134)]:
+        if lower < ratio <= upper:
+            return spread
+    return 0.1512
+
+def test_large_cap_table_matches_previous_branches():
+
+    ratios = np.concatenate([np.linspace(-5, 20, 5001), LARGE_CAP.thresholds])
+    #the old chain had a gap between 5.49 and 5.5 that fell through to the D spread
+    ratios = ratios[(ratios <= 5.49) | (ratios > 5.5)]
+
+    expected = [branch_spread(r) for r in ratios]
+    assert LARGE_CAP.spread(ratios).tolist() == expected
+
+def test_lookup_labels_gap_and_missing_values():
+
+    ratings, spreads = LARGE_CAP.lookup([10, 5.495, 0.1, np.nan])
+
+    assert ratings.tolist() == ['AAA', 'A', 'D', 'D']
+    assert spreads.tolist() == [0.0063, 0.0108, 0.1512, 0.1512]
+    assert SMALL_CAP.lookup(10)[0] == 'AA'
+    np.testing.assert_allclose(cost_of_debt([10, 0.1], 0.01), [0.0163, 0.1612])
+
+def test_load_from_config(tmp_path):
+
+    path = tmp_path / 'ratings.json'
+    path.write_text(json.dumps({'large_cap': LARGE_CAP.to_dict(), 'small_cap': SMALL_CAP.to_dict()}))
+
+    table = RatingTable.from_config(str(path), 'small_cap')
+    assert table.lookup(10)[0] == 'AA'
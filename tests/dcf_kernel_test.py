@@ -0,0 +1,55 @@
+import numpy as np
+
+from tools import dcf_kernel
+
+def reference_forecast(ebit, non_cash_charges, cwc, cap_ex, tax_rate, eg, cxg, g, wacc, forecasting_period):
+    #year by year formulation of Fundamentals._get_enterprise_value
+    ulfcf = ebit * (1-tax_rate) + non_cash_charges + cwc + cap_ex
+    npv_fcf_list = [ulfcf]
+
+    for yr in range(1, forecasting_period+1):
+        ebit = ebit * (1 + (yr * eg))
+        non_cash_charges = non_cash_charges * (1 + (yr * eg))
+        cap_ex = cap_ex * (1 + (yr * cxg))
+        cwc = cwc*0.7
+        ulfcf = ebit * (1-tax_rate) + non_cash_charges + cwc + cap_ex
+        npv_fcf_list.append(ulfcf/((1 + wacc)**yr))
+
+    npv_fcf_sum = sum(npv_fcf_list)
+    TV = (npv_fcf_list[-1] * (1 + g))/(wacc - g)
+    NPV_TV = TV/(1+wacc)**(1+forecasting_period)
+
+    return NPV_TV + npv_fcf_sum, npv_fcf_list, TV
+
+BASE = dict(ebit=40e9, non_cash_charges=10e9, cwc=2e9, cap_ex=-20e9, tax_rate=0.16)
+
+def test_scalar_matches_year_by_year_loop():
+
+    ev, pv, tv = reference_forecast(**BASE, eg=0.15, cxg=0.5, g=0.02, wacc=0.08, forecasting_period=4)
+    result = dcf_kernel.forecast(**BASE, earnings_growth_rate=0.15, cap_ex_growth_rate=0.5,
+                                 perpetual_growth_rate=0.02, wacc=0.08, forecasting_period=4)
+
+    assert float(result['enterprise_value']) == ev
+    assert result['pv_fcf'].tolist() == pv
+    assert float(result['terminal_value']) == tv
+
+def test_batch_matches_scalar_for_every_scenario():
+
+    rng = np.random.default_rng(0)
+    eg = rng.uniform(0, 0.3, 200)
+    cxg = rng.uniform(0, 0.6, 200)
+    g = rng.uniform(0, 0.03, 200)
+    wacc = rng.uniform(0.05, 0.12, 200)
+    n = rng.integers(1, 10, 200)
+
+    result = dcf_kernel.forecast(**BASE, earnings_growth_rate=eg, cap_ex_growth_rate=cxg,
+                                 perpetual_growth_rate=g, wacc=wacc, forecasting_period=n)
+
+    #vectorized pow may differ from the scalar one in the last bit
+    assert result['pv_fcf'].shape == (200, n.max() + 1)
+    for i in range(200):
+        ev, pv, tv = reference_forecast(**BASE, eg=float(eg[i]), cxg=float(cxg[i]), g=float(g[i]), wacc=float(wacc[i]), forecasting_period=int(n[i]))
+        np.testing.assert_allclose(result['enterprise_value'][i], ev, rtol=1e-13)
+        np.testing.assert_allclose(result['pv_fcf'][i, :n[i] + 1], pv, rtol=1e-13)
+        np.testing.assert_allclose(result['terminal_value'][i], tv, rtol=1e-13)
+        assert not result['pv_fcf'][i, n[i] + 1:].any()
@@ -0,0 +1,36 @@
+import numpy as np
+
+from tools.f_score import f_scores, CURRENT_FIELDS, PREVIOUS_FIELDS
+
+def inputs(n):
+    current = {field: np.ones(n) for field in CURRENT_FIELDS}
+    previous = {field: np.ones(n) for field in PREVIOUS_FIELDS}
+    return current, previous
+
+def test_scores_every_company():
+
+    current, previous = inputs(3)
+    current['fr.returnOnAssets'] = np.array([0.1, -0.1, 0.1])
+    current['fr.assetTurnover'] = np.array([2.0, 0.5, 2.0])
+    current['bs.longTermDebt'] = np.array([0.5, 1.0, 1.0])
+
+    results = f_scores(current, previous)
+
+    assert results['profitability1'].tolist() == [True, False, True]
+    assert results['leverage_liquidity1'].tolist() == [True, False, False]
+    assert results['f_score'].tolist() == [6, 3, 5]
+    assert (results['f_score'] == results['profitability_score'] + results['leverage_liquidity_score'] + results['operating_efficiency_score']).all()
+
+def test_zero_and_missing_denominators_do_not_raise():
+
+    current, previous = inputs(2)
+    current['bs.totalDebt'] = np.array([0.0, np.nan])
+    previous['bs.totalCurrentLiabilities'] = np.array([0.0, 1.0])
+
+    results = f_scores(current, previous, as_frame=True, index=['A', 'B'])
+
+    assert np.isnan(results.loc['A', 'long_term_leverage_change'])
+    assert np.isnan(results.loc['A', 'current_ratio_change'])
+    assert not results['leverage_liquidity1'].any()
+    assert not results.loc['A', 'leverage_liquidity2']
+    assert list(results.index) == ['A', 'B']
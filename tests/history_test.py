@@ -0,0 +1,77 @@
+import time
+
+import numpy as np
+
+from data.request_scheduler import INTERACTIVE, get_scheduler, set_scheduler
+from data.statement_store import STATEMENTS, StatementStore
+from data.synthetic_statements import SYNTHETIC_MARKET_DATA, synthetic_statements
+from tools.fundamentals_class import Fundamentals
+
+def shifted(statements, period):
+    #the statements as they were published `period` years ago
+    result = {}
+    for key, (argument, container) in STATEMENTS.items():
+        statement = statements[argument]
+        start = 4*period if key == 'bsq' else period
+        result[argument] = dict(statement, **{container: statement[container][start:]}) if container else statement[start:]
+    return result
+
+def make_company(statements, **kwargs):
+    return Fundamentals(**statements, company_ticker = 'SYN0', forecasting_period = 4, api_key = '',
+                        market_data = SYNTHETIC_MARKET_DATA, beta = 1.1, quiet = True, **kwargs)
+
+def test_history_matches_one_valuation_per_period():
+
+    statements = synthetic_statements('SYN0', n_periods = 6)
+    history = make_company(statements).history(0.05, 0.05, 0.02)
+
+    assert len(history) == 6
+    assert history.index[0] == '2020-12-31'
+    assert np.isnan(history['f_score'].iloc[-1])
+
+    for period in range(5):
+        company = make_company(shifted(statements, period))
+        company.dcf(0.05, 0.05, 0.02)
+        row = history.iloc[period]
+        assert row['wacc'] == company.wacc
+        assert row['share_price'] == company.share_price
+        assert row['credit_rating'] == company.credit_rating
+        assert row['f_score'] == company.f_score()['F1-Score']
+
+def test_history_from_store_and_per_period_inputs():
+
+    statements = synthetic_statements('SYN0', n_periods = 6)
+    store = StatementStore.from_statements({'SYN0': statements})
+    company = Fundamentals.from_store(store, 'SYN0', 4, '', market_data = SYNTHETIC_MARKET_DATA, beta = 1.1, quiet = True)
+
+    expected = make_company(statements).history(0.05, 0.05, 0.02)
+    result = company.history(0.05, 0.05, 0.02)
+    assert result.equals(expected)
+
+    #one growth rate per period
+    growth = np.linspace(0.02, 0.03, 6)
+    varying = company.history(0.05, 0.05, growth, as_frame = False)
+    assert varying['share_price'][0] == result['share_price'].iloc[0]
+    assert varying['share_price'][-1] != result['share_price'].iloc[-1]
+
+def test_beta_fetch_is_not_counted_as_history_time():
+
+    class SlowScheduler:
+        def get_json(self, url, priority=INTERACTIVE):
+            time.sleep(0.2)
+            return {'profile': {'beta': 1.3}}
+
+    previous = get_scheduler()
+    set_scheduler(SlowScheduler())
+    try:
+        company = Fundamentals(**synthetic_statements('SYN0'), company_ticker = 'SYN0', forecasting_period = 4, api_key = '',
+                               market_data = SYNTHETIC_MARKET_DATA, quiet = True)
+        company.history(0.05, 0.05, 0.02)
+    finally:
+        set_scheduler(previous)
+
+    stats = company.instrumentation.summary()
+    totals = company.instrumentation.totals()
+    assert stats['beta']['kind'] == 'fetch' and stats['beta']['seconds'] >= 0.2
+    assert stats['history']['seconds'] < 0.2
+    assert totals['fetch'] + totals['compute'] < 0.4
@@ -0,0 +1,52 @@
+import json
+
+from data.synthetic_statements import SYNTHETIC_MARKET_DATA, synthetic_statements
+from tools.fundamentals_class import Fundamentals
+from tools.instrumentation import JsonLinesExporter, MemoryExporter
+
+def make_company(**kwargs):
+    return Fundamentals(**synthetic_statements('SYN0'), company_ticker = 'SYN0', forecasting_period = 4,
+                        api_key = '', market_data = SYNTHETIC_MARKET_DATA, beta = 1.1, **kwargs)
+
+def test_quiet_mode_prints_nothing_and_keeps_results(capsys):
+
+    loud = make_company()
+    loud.dcf(0.05, 0.05, 0.02)
+    loud.sensitivity(0.9, plot = False)
+    loud_f_score = loud.f_score()
+    assert 'WACC' in capsys.readouterr().out
+
+    quiet = make_company(quiet = True)
+    quiet.dcf(0.05, 0.05, 0.02)
+    quiet.sensitivity(0.9, plot = False)
+    assert quiet.f_score() == loud_f_score
+    assert capsys.readouterr().out == ''
+    assert quiet.share_price == loud.share_price
+    assert quiet.sensitivity_summary == loud.sensitivity_summary
+
+def test_stage_timings_and_exporters(tmp_path):
+
+    memory = MemoryExporter()
+    path = str(tmp_path/'events.jsonl')
+    with JsonLinesExporter(path) as jsonl:
+        company = make_company(quiet = True, exporters = [memory, jsonl])
+        company.dcf(0.05, 0.05, 0.02)
+        company.what_if(perpetual_growth_rate = 0.025)
+        company.f_score()
+
+    stats = company.instrumentation.summary()
+    assert stats['beta']['kind'] == 'fetch'
+    assert stats['wacc']['kind'] == 'compute'
+    assert stats['f_score']['calls'] == 1
+    #what_if() reuses the WACC and the projection and recomputes the terminal value
+    assert stats['fcf_projection']['calls'] - stats['fcf_projection']['cached'] == 1
+    assert stats['enterprise_value']['calls'] - stats['enterprise_value']['cached'] == 2
+
+    totals = company.instrumentation.totals()
+    assert totals['compute'] > 0 and totals['fetch'] >= 0
+
+    with open(path) as f:
+        events = [json.loads(line) for line in f]
+    assert events == memory.events
+    assert {event['ticker'] for event in events} == {'SYN0'}
+    assert len(events) == sum(s['calls'] for s in stats.values())
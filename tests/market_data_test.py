@@ -0,0 +1,43 @@
+import datetime
+
+import pytest
+
+from data import market_data
+from data.market_data import MarketData, get_market_data
+
+def test_market_data_is_fetched_once_per_date(monkeypatch):
+
+    calls = []
+
+    def fetch_market_data(as_of):
+        calls.append(as_of)
+        return MarketData(0.015, 0.1, as_of)
+
+    monkeypatch.setattr(market_data, '_loaded', {})
+    monkeypatch.setattr(market_data, 'fetch_market_data', fetch_market_data)
+
+    first = get_market_data('2021-01-04')
+    assert get_market_data(datetime.date(2021, 1, 4)) is first
+    assert get_market_data(datetime.datetime(2021, 1, 4, 15, 30)) is first
+    assert get_market_data('2021-01-04T00:00:00') is first
+    assert calls == ['2021-01-04']
+
+    assert get_market_data('2021-01-05').as_of == '2021-01-05'
+    assert calls == ['2021-01-04', '2021-01-05']
+
+def test_file_round_trip(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(market_data, '_loaded', {})
+    monkeypatch.setattr(market_data, 'fetch_market_data', lambda as_of: pytest.fail('fetched from FRED'))
+
+    path = str(tmp_path/'market_data.json')
+    saved = MarketData(0.0123, -0.045, '2020-03-20')
+    saved.to_file(path)
+
+    loaded = MarketData.from_file(path)
+    assert loaded == saved and hash(loaded) == hash(saved)
+    assert loaded.to_dict() == {'risk_free_rate': 0.0123, 'index_return': -0.045, 'as_of': '2020-03-20'}
+
+    #a file loaded through get_market_data() also serves later requests for its date
+    assert get_market_data(path = path) == saved
+    assert get_market_data('2020-03-20') == saved
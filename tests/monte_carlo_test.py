@@ -0,0 +1,83 @@
+import math
+
+import numpy as np
+import pytest
+
+from tools.monte_carlo import PARAMETERS, _draw, _norm_cdf, simulate
+from tools.streaming_stats import StreamingHistogram
+
+BASE = {'ebit': 1e9, 'non_cash_charges': 2e8, 'cwc': 1e7, 'cap_ex': -3e8, 'tax_rate': 0.2,
+        'debt': 2e9, 'cash': 5e8, 'number_of_shares': 1e8, 'forecasting_period': 4}
+
+DISTRIBUTIONS = {'earnings_growth_rate': ('normal', 0.05, 0.02),
+                 'cap_ex_growth_rate': ('uniform', 0.0, 0.1),
+                 'perpetual_growth_rate': ('triangular', 0.0, 0.02, 0.04),
+                 'wacc': ('lognormal', np.log(0.08), 0.1)}
+
+def test_same_seed_and_budget_give_identical_results():
+
+    def run(seed):
+        return simulate(BASE, DISTRIBUTIONS, n_scenarios = 50000, seed = seed, memory_budget = 256*1024)
+
+    first, second = run(7), run(7)
+    for ours, theirs in zip(first.pop('histogram'), second.pop('histogram')):
+        np.testing.assert_array_equal(ours, theirs)
+    assert first == second
+    assert first['mean'] != run(8)['mean']
+
+def test_sampled_correlation_matches_rho():
+
+    distributions = {p: ('normal', 0.0, 1.0) for p in PARAMETERS}
+    matrix = np.eye(len(PARAMETERS))
+    matrix[0, 3] = matrix[3, 0] = 0.6
+    matrix[1, 2] = matrix[2, 1] = -0.3
+
+    draws = _draw(np.random.default_rng(0), 200000, np.linalg.cholesky(matrix), distributions)
+    np.testing.assert_allclose(np.corrcoef(draws), matrix, atol = 0.01)
+
+def test_invalid_correlation_matrices_are_rejected():
+
+    matrix = np.eye(len(PARAMETERS))
+    matrix[0, 1] = 0.5
+    with pytest.raises(ValueError, match = 'symmetric'):
+        simulate(BASE, DISTRIBUTIONS, n_scenarios = 10, correlation = matrix)
+    with pytest.raises(ValueError, match = 'unit diagonal'):
+        simulate(BASE, DISTRIBUTIONS, n_scenarios = 10, correlation = 2*np.eye(len(PARAMETERS)))
+    with pytest.raises(ValueError, match = 'positive definite'):
+        simulate(BASE, DISTRIBUTIONS, n_scenarios = 10, correlation = {('earnings_growth_rate', 'wacc'): 0.9,
+                                                                       ('earnings_growth_rate', 'cap_ex_growth_rate'): 0.9,
+                                                                       ('cap_ex_growth_rate', 'wacc'): -0.9})
+    with pytest.raises(ValueError, match = '4x4'):
+        simulate(BASE, DISTRIBUTIONS, n_scenarios = 10, correlation = np.eye(3))
+
+def test_streaming_histogram_quantiles_within_a_bin():
+
+    values = np.random.default_rng(1).lognormal(0, 0.5, 300000)
+    histogram = StreamingHistogram(bins = 500, tail_capacity = 100)
+    for chunk in np.array_split(values, 30):
+        histogram.update(chunk)
+
+    quantiles = [0.05, 0.25, 0.5, 0.75, 0.95]
+    width = histogram.edges[1] - histogram.edges[0]
+    np.testing.assert_allclose(histogram.quantile(quantiles), np.quantile(values, quantiles), atol = width)
+    assert histogram.n == len(values)
+    assert histogram.mean == pytest.approx(values.mean()) and histogram.std == pytest.approx(values.std(ddof = 1))
+    assert (histogram.min, histogram.max) == (values.min(), values.max())
+
+def test_norm_cdf_matches_erf():
+
+    z = np.linspace(-8, 8, 2001)
+    expected = [0.5*(1 + math.erf(x/math.sqrt(2))) for x in z]
+    np.testing.assert_allclose(_norm_cdf(z), expected, rtol = 0, atol = 1e-7)
+
+def test_scenarios_with_wacc_below_g_are_excluded_and_counted():
+
+    distributions = dict(DISTRIBUTIONS, wacc = ('fixed', 0.05), perpetual_growth_rate = ('uniform', 0.0, 0.1))
+    results = simulate(BASE, distributions, n_scenarios = 20000, seed = 3)
+
+    #the same draws (one chunk)
+    g = _draw(np.random.default_rng(3), 20000, None, distributions)[2]
+    assert results['scenarios'] == 20000
+    assert results['valid'] == np.count_nonzero(g < 0.05)
+    assert 0 < results['valid'] < 20000
+    assert np.isfinite(results['max'])
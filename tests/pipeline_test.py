@@ -0,0 +1,72 @@
+import pytest
+
+from data.market_data import MarketData
+from data.synthetic_statements import SYNTHETIC_MARKET_DATA, synthetic_statements
+from tools.fundamentals_class import Fundamentals
+from tools.pipeline import Pipeline, Stage
+
+def make_pipeline():
+    stages = [Stage('wacc', lambda rate, spread: rate + spread, ['rate', 'spread']),
+              Stage('projection', lambda wacc, growth: [wacc*growth], ['wacc', 'growth']),
+              Stage('value', lambda projection, g: projection[0]/(1 + g), ['projection', 'g'])]
+    pipeline = Pipeline(stages)
+    pipeline.set(rate = 0.01, spread = 0.02, growth = 2.0, g = 0.5)
+    return pipeline
+
+def test_only_downstream_stages_are_recomputed():
+
+    pipeline = make_pipeline()
+    assert pipeline.get('value') == pytest.approx(0.06/1.5)
+
+    #a new g reuses the wacc and the projection
+    pipeline.set(g = 0.2)
+    assert pipeline.get('value') == pytest.approx(0.06/1.2)
+    assert pipeline.computed == {'wacc': 1, 'projection': 1, 'value': 2}
+
+    #a new rate invalidates everything downstream of it
+    pipeline.set(rate = 0.03)
+    assert pipeline.get('value') == pytest.approx(0.1/1.2)
+    assert pipeline.computed == {'wacc': 2, 'projection': 2, 'value': 3}
+
+    #going back to earlier inputs is served from the cache
+    pipeline.set(rate = 0.01, g = 0.5)
+    assert pipeline.get('value') == pytest.approx(0.06/1.5)
+    assert pipeline.computed['value'] == 3
+
+def test_unhashable_inputs_are_keyed_by_identity_and_cache_is_bounded():
+
+    pipeline = make_pipeline()
+    pipeline.max_entries = 2
+    pipeline.stages['projection'].function = lambda wacc, growth: [wacc*growth[0]]
+
+    growth = [2.0]
+    pipeline.set(growth = growth)
+    pipeline.get('value')
+    pipeline.get('value')
+    assert pipeline.computed['projection'] == 1
+    assert len(pipeline._cache) == 2
+
+    pipeline.set(growth = [2.0])
+    pipeline.get('value')
+    assert pipeline.computed['projection'] == 2
+
+    with pytest.raises(KeyError):
+        Pipeline([Stage('x', lambda y: y, ['y'])]).get('x')
+
+def test_what_if_leaves_the_company_unchanged():
+
+    company = Fundamentals(**synthetic_statements('SYN0'), company_ticker = 'SYN0', forecasting_period = 4, api_key = '',
+                           market_data = SYNTHETIC_MARKET_DATA, beta = 1.1, quiet = True)
+    with pytest.raises(ValueError):
+        company.what_if(perpetual_growth_rate = 0.03)
+
+    company.dcf(0.05, 0.05, 0.02)
+    before = (company.enterprise_value, company.share_price, dict(company.pipeline.inputs))
+
+    result = company.what_if(perpetual_growth_rate = 0.03, market_data = MarketData(0.02, 0.08, '2020-12-31'))
+    assert result['share_price'] != company.share_price
+
+    #later stage calls still run on the dcf() inputs
+    assert company.pipeline.inputs == before[2]
+    assert company._get_equity_value()['share_price'] == round(before[1], 4)
+    assert (company.enterprise_value, company.share_price) == before[:2]
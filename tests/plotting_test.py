@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from tools import plotting
+from tools.sensitivity import summarize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_distribution_stats_match_numpy():
+
+    values = np.random.default_rng(0).normal(100, 20, (60, 50))
+    values[0, :5] = np.nan
+    values[1, 0] = np.inf
+    finite = values[np.isfinite(values)]
+
+    #the quantiles sensitivity() passes in, from summarize()
+    summary = summarize(np.where(np.isinf(values), np.nan, values), 0.9, quantiles = (0.05, 0.25, 0.75, 0.95))
+    quantiles = dict(summary['quantiles'])
+    quantiles[0.5] = summary['median']
+    stats = plotting.distribution_stats(values, quantiles, bins = 40)
+
+    counts, edges = np.histogram(finite, bins = 40)
+    np.testing.assert_array_equal(stats['counts'], counts)
+    np.testing.assert_array_equal(stats['edges'], edges)
+    box = stats['box']
+    np.testing.assert_allclose([box['whislo'], box['q1'], box['med'], box['q3'], box['whishi']],
+                               np.quantile(finite, [0.05, 0.25, 0.5, 0.75, 0.95]), rtol = 1e-12)
+
+def test_headless_renderer_writes_without_pyplot(tmp_path):
+
+    path = tmp_path/'distribution.png'
+    #a fresh interpreter, pyplot may already be imported by this one
+    script = f"""
+import sys
+import numpy as np
+from tools import plotting
+plotting.set_headless()
+values = np.linspace(0, 1, 1000)
+quantiles = dict(zip([0.05, 0.25, 0.5, 0.75, 0.95], np.quantile(values, [0.05, 0.25, 0.5, 0.75, 0.95])))
+renderer = plotting.PlotRenderer()
+renderer.submit(plotting.distribution_stats(values, quantiles), {str(path)!r})
+renderer.wait()
+renderer.close()
+assert not renderer.errors, renderer.errors
+assert 'matplotlib.pyplot' not in sys.modules
+"""
+    subprocess.run([sys.executable, '-c', script], cwd = ROOT, check = True)
+    assert path.read_bytes().startswith(b'\x89PNG')
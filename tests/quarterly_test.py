@@ -0,0 +1,125 @@
+import datetime
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pytest
+
+from data.batch_fetch import BatchFetcher
+from data.quarterly import QUARTERLY_STATEMENTS, TTM_FLOWS, QuarterlyIngestor, TTMAccumulator
+from data.synthetic_statements import SYNTHETIC_MARKET_DATA, synthetic_quarterly_statements, synthetic_statements
+from tools.fundamentals_class import Fundamentals
+
+QUARTERS = synthetic_quarterly_statements('SYN0', n_quarters = 12)
+
+class QuarterHandler(BaseHTTPRequestHandler):
+
+    #number of the oldest quarters published so far
+    published = 12
+    limits = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        statement = url.path.split('/')[1]
+        limit = int(parse_qs(url.query)['limit'][0])
+        QuarterHandler.limits.append(limit)
+
+        records = QUARTERS[statement][12 - QuarterHandler.published:]
+        body = json.dumps(records[:limit]).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    QuarterHandler.published = 12
+    QuarterHandler.limits = []
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), QuarterHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+def ttm_sum(field, newest, year=0):
+    #sum of a flow over the four quarters of a trailing year, from the fixture
+    statement, key = TTM_FLOWS[field]
+    return sum(QUARTERS[statement][newest + 4*year + i][key] for i in range(4))
+
+def test_accumulator_matches_direct_sums():
+
+    rng = np.random.RandomState(0)
+    flows = rng.normal(size = (30, len(TTM_FLOWS)))
+    flows[7, 2] = np.nan
+    accumulator = TTMAccumulator(n_years = 2, resync = 5)
+    balances = np.zeros(len(accumulator.balances))
+
+    for quarter in range(30):
+        assert accumulator.push(f'2000-01-{quarter + 1:02d}', flows[quarter], balances + quarter)
+        values = accumulator.values()
+        for year in range(2):
+            end = quarter + 1 - 4*year
+            expected = flows[end - 4:end].sum(axis = 0) if end >= 4 else np.full(len(TTM_FLOWS), np.nan)
+            actual = np.array([values[field][year] for field in accumulator.flows])
+            assert np.allclose(actual, expected, equal_nan = True)
+            if quarter >= 4*year:
+                assert values['bs.totalAssets'][year] == quarter - 4*year
+            else:
+                assert np.isnan(values['bs.totalAssets'][year])
+
+    #quarters that are not newer are ignored
+    assert not accumulator.push('2000-01-01', flows[0], balances)
+    assert accumulator.count == 30
+
+def test_incremental_refresh_only_fetches_new_quarters(server, tmp_path):
+
+    QuarterHandler.published = 8
+    fetcher = BatchFetcher('key', base_url = server)
+    ingestor = QuarterlyIngestor(str(tmp_path), fetcher)
+
+    today = datetime.datetime(2020, 2, 15)
+    assert ingestor.refresh('SYN0', today) == 8
+    assert QuarterHandler.limits == [8, 8, 8]
+    assert ingestor.ttm('SYN0')['inc.ebitda'][0] == pytest.approx(ttm_sum('inc.ebitda', 4))
+
+    #nothing new: a one-quarter request per statement
+    QuarterHandler.limits = []
+    assert ingestor.refresh('SYN0', today) == 0
+    assert QuarterHandler.limits == [1, 1, 1]
+
+    #four new quarters while one was expected: the request is doubled until a known quarter is returned
+    QuarterHandler.published = 12
+    QuarterHandler.limits = []
+    assert ingestor.refresh('SYN0', datetime.datetime(2020, 4, 15)) == 4
+    assert QuarterHandler.limits == [1, 2, 4, 8]*3
+    ttm = ingestor.ttm('SYN0')
+    assert ttm['cf.capitalExpenditure'][0] == pytest.approx(ttm_sum('cf.capitalExpenditure', 0))
+    assert ttm['cf.capitalExpenditure'][1] == pytest.approx(ttm_sum('cf.capitalExpenditure', 0, year = 1))
+    assert ttm['ev.cash'][0] == QUARTERS['balance-sheet-statement'][0]['cashAndCashEquivalents']
+
+    #a new ingestor rebuilds the same figures from disk
+    reloaded = QuarterlyIngestor(str(tmp_path), fetcher)
+    assert [len(reloaded.statements('SYN0')[name]) for name in QUARTERLY_STATEMENTS] == [12, 12, 12]
+    assert np.allclose(reloaded.ttm('SYN0')['inc.ebitda'], ttm['inc.ebitda'])
+
+def test_fundamentals_values_on_ttm(server, tmp_path):
+
+    ingestor = QuarterlyIngestor(str(tmp_path), BatchFetcher('key', base_url = server))
+    ingestor.refresh('SYN0', datetime.datetime(2021, 1, 15))
+    ttm = ingestor.ttm('SYN0')
+
+    company = Fundamentals(**synthetic_statements('SYN0'), company_ticker = 'SYN0', forecasting_period = 4, api_key = '',
+                           market_data = SYNTHETIC_MARKET_DATA, beta = 1.1, quiet = True, ttm = ttm)
+    company.dcf(0.05, 0.05, 0.02)
+
+    ebit = ttm['inc.ebitda'][0] - ttm['inc.depreciationAndAmortization'][0]
+    assert company.interest_coverage_ratio == ebit/ttm['inc.interestExpense'][0]
+    assert company.cash == ttm['ev.cash'][0]
+    assert company.f_score()['F1-Score'] >= 0
@@ -0,0 +1,160 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from data.batch_fetch import BatchFetcher, fetch_betas
+from data.request_scheduler import BATCH, INTERACTIVE, BudgetExceededError, RequestScheduler, get_scheduler, set_scheduler
+from data.synthetic_statements import SYNTHETIC_MARKET_DATA, synthetic_statements, synthetic_universe
+from tools import universe
+from tools.fundamentals_class import Fundamentals
+
+class SlowHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    delay = 0.0
+    hits = []
+
+    def do_GET(self):
+        SlowHandler.hits.append(self.path)
+        time.sleep(SlowHandler.delay)
+        path = self.path.split('?')[0]
+        body = json.dumps({'path': path, 'profile': {'beta': 1.3}} if path.startswith('/company/profile/') else {'path': path}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    SlowHandler.delay = 0.0
+    SlowHandler.hits = []
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), SlowHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_duplicate_requests_in_flight_are_sent_once(server):
+
+    SlowHandler.delay = 0.2
+    scheduler = RequestScheduler(rate=100, burst=100, daily_budget=None)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(scheduler.get_json(f'{server}/company/profile/GOOG?apikey=k')))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [{'path': '/company/profile/GOOG', 'profile': {'beta': 1.3}}]*5
+    assert len(SlowHandler.hits) == 1
+    assert scheduler.sent == 1 and scheduler.coalesced == 4
+
+def test_daily_budget_and_interactive_reserve(tmp_path):
+
+    state = str(tmp_path/'budget.json')
+    scheduler = RequestScheduler(rate=100, burst=100, daily_budget=3, reserve=1, state_path=state)
+
+    scheduler.call('a', lambda: 1, BATCH)
+    scheduler.call('b', lambda: 2, BATCH)
+    #the last call of the day is reserved for interactive requests
+    with pytest.raises(BudgetExceededError):
+        scheduler.call('c', lambda: 3, BATCH)
+    assert scheduler.call('c', lambda: 3, INTERACTIVE) == 3
+    assert scheduler.remaining() == 0
+    with pytest.raises(BudgetExceededError):
+        scheduler.call('d', lambda: 4, INTERACTIVE)
+
+    #a later run of the same day starts from the calls already used
+    assert RequestScheduler(daily_budget=3, state_path=state).remaining() == 0
+
+def test_rate_limit_and_priorities():
+
+    scheduler = RequestScheduler(rate=20, burst=1, daily_budget=None)
+    order = []
+    start = time.monotonic()
+    scheduler.call('first', lambda: order.append('first'))
+
+    threads = [threading.Thread(target=scheduler.call, args=(f'batch{i}', lambda i=i: order.append(f'batch{i}'), BATCH))
+               for i in range(3)]
+    for thread in threads:
+        thread.start()
+    #every batch request is queued behind the spent token before the interactive one arrives
+    while len(scheduler._waiting) < 3:
+        time.sleep(0.001)
+    interactive = threading.Thread(target=scheduler.call, args=('interactive', lambda: order.append('interactive'), INTERACTIVE))
+    interactive.start()
+    for thread in threads + [interactive]:
+        thread.join()
+
+    #one token every 50 ms after the burst, the interactive request skips the queued batch requests
+    assert time.monotonic() - start >= 4*0.05*0.9
+    assert order[:2] == ['first', 'interactive']
+    assert sorted(order[2:]) == ['batch0', 'batch1', 'batch2']
+
+def test_batch_fetcher_goes_through_the_scheduler(server):
+
+    scheduler = RequestScheduler(rate=1000, burst=1000, daily_budget=100)
+    with BatchFetcher('key', base_url=server, scheduler=scheduler) as fetcher:
+        results = fetcher.fetch(['GOOG', 'AAPL'])
+
+    assert set(results) == {'GOOG', 'AAPL'}
+    assert scheduler.status()['used'] == 12
+    assert scheduler.remaining() == 88
+
+def test_betas_are_fetched_once_within_the_budget(server):
+
+    scheduler = RequestScheduler(rate=1000, burst=1000, daily_budget=2)
+    betas, errors = fetch_betas(['GOOG', 'AAPL', 'MSFT'], 'key', base_url=server, scheduler=scheduler, retries=0)
+
+    assert len(betas) == 2 and set(betas.values()) == {1.3}
+    assert list(errors) == [({'GOOG', 'AAPL', 'MSFT'} - set(betas)).pop()]
+    assert isinstance(next(iter(errors.values())), BudgetExceededError)
+    assert scheduler.used == 2
+
+def test_universe_fetches_missing_betas_before_sharding(monkeypatch):
+
+    calls = []
+    def fake_fetch_betas(tickers, api_key, **kwargs):
+        calls.append(list(tickers))
+        return {ticker: 1.3 for ticker in tickers if ticker != 'SYN2'}, {'SYN2': KeyError('beta')}
+    monkeypatch.setattr(universe, 'fetch_betas', fake_fetch_betas)
+
+    statements = synthetic_universe(3)
+    results = universe.value_universe(list(statements), '', 0.05, 0.05, 0.02, statements = statements,
+                                      market_data = SYNTHETIC_MARKET_DATA, processes = 1, progress = False,
+                                      betas = {'SYN0': 0.9})
+
+    #the workers value with the betas of the parent, they never reach the api
+    assert calls == [['SYN1', 'SYN2']]
+    assert results['error'].tolist()[:2] == ['', '']
+    assert results['error'][2].startswith('beta fetch failed')
+
+def test_beta_lookup_uses_the_priority_of_the_caller():
+
+    class RecordingScheduler:
+        priorities = []
+        def get_json(self, url, priority=INTERACTIVE):
+            self.priorities.append(priority)
+            return {'profile': {'beta': 1.3}}
+
+    previous = get_scheduler()
+    set_scheduler(RecordingScheduler())
+    try:
+        for priority in (BATCH, INTERACTIVE):
+            company = Fundamentals(**synthetic_statements('SYN0'), company_ticker = 'SYN0', forecasting_period = 4, api_key = '',
+                                   market_data = SYNTHETIC_MARKET_DATA, quiet = True, priority = priority)
+            company.dcf(0.05, 0.05, 0.02)
+            assert company.beta == 1.3
+    finally:
+        set_scheduler(previous)
+
+    assert RecordingScheduler.priorities == [BATCH, INTERACTIVE]
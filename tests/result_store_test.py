@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import pytest
+
+from data.result_store import ResultStore, params_hash
+from data.synthetic_statements import SYNTHETIC_MARKET_DATA, synthetic_statements
+from tools.fundamentals_class import Fundamentals
+
+PARAMS = {'earnings_growth_rate': 0.05, 'perpetual_growth_rate': 0.02}
+
+def test_append_query_and_supersede(tmp_path):
+
+    store = ResultStore(str(tmp_path), metrics = ['wacc', 'share_price'])
+    store.add('AAA', '2020-12-31', PARAMS, {'wacc': 0.08, 'share_price': 10.0}, grids = {'grid': np.arange(6.0).reshape(2, 3)})
+    store.add('AAA', '2021-12-31', PARAMS, {'wacc': 0.09, 'share_price': 12.0})
+    store.add('BBB', '2021-12-31', dict(PARAMS, perpetual_growth_rate = 0.03), {'share_price': 5.0})
+    #same key again: appended, the new valuation supersedes the first one
+    store.add('AAA', '2020-12-31', PARAMS, {'wacc': 0.07, 'share_price': 11.0})
+
+    assert len(store) == 4
+    assert store.column('share_price').tolist() == [10.0, 12.0, 5.0, 11.0]
+    assert isinstance(store.column('share_price').base, np.memmap)
+    assert [r['row'] for r in store.find(ticker = 'AAA')] == [1, 3]
+    assert len(store.find(ticker = 'AAA', latest = False)) == 3
+    assert store.get('AAA', '2020-12-31', PARAMS)['wacc'] == 0.07
+    assert np.isnan(store.get('BBB', '2021-12-31', dict(PARAMS, perpetual_growth_rate = 0.03))['wacc'])
+    assert store.get('CCC', '2020-12-31', PARAMS) is None
+    assert store.history('AAA', 'share_price', PARAMS).tolist() == [11.0, 12.0]
+
+    #a new instance reads the same index, grids are memory-mapped
+    reopened = ResultStore(str(tmp_path))
+    assert reopened.metrics == ['wacc', 'share_price']
+    grid = reopened.grid(reopened.records[0], 'grid')
+    assert isinstance(grid, np.memmap)
+    assert grid.tolist() == [[0, 1, 2], [3, 4, 5]]
+    assert reopened.frame(params = params_hash(PARAMS))['ticker'].tolist() == ['AAA', 'AAA']
+
+    with pytest.raises(ValueError):
+        ResultStore(str(tmp_path), metrics = ['wacc'])
+    with pytest.raises(ValueError):
+        store.add('AAA', '2020-12-31', PARAMS, {'f_score': 1})
+
+def test_interrupted_write_is_dropped(tmp_path):
+
+    store = ResultStore(str(tmp_path), metrics = ['share_price'])
+    store.add('AAA', '2020-12-31', PARAMS, {'share_price': 10.0}, grids = {'grid': np.ones(4)})
+
+    #data of a valuation whose index line was only partly written
+    with open(os.path.join(str(tmp_path), 'metrics.f64'), 'ab') as f:
+        f.write(np.zeros(1).tobytes())
+    with open(os.path.join(str(tmp_path), 'grids.f64'), 'ab') as f:
+        f.write(np.zeros(3).tobytes())
+    with open(os.path.join(str(tmp_path), 'index.jsonl'), 'a') as f:
+        f.write('{"ticker": "BB')
+
+    store = ResultStore(str(tmp_path))
+    assert len(store) == 1
+    store.add('BBB', '2020-12-31', PARAMS, {'share_price': 5.0}, grids = {'grid': np.full(2, 2.0)})
+    assert store.column('share_price').tolist() == [10.0, 5.0]
+    assert store.get('BBB', '2020-12-31', PARAMS)['grids']['grid'].tolist() == [2.0, 2.0]
+
+def test_save_result_from_fundamentals(tmp_path):
+
+    company = Fundamentals(**synthetic_statements('SYN0'), company_ticker = 'SYN0', forecasting_period = 4, api_key = '',
+                           market_data = SYNTHETIC_MARKET_DATA, beta = 1.1, quiet = True)
+    company.dcf(0.05, 0.05, 0.02)
+    grid = company.sensitivity(plot = False, grid_size = 8)
+
+    store = ResultStore(str(tmp_path))
+    record = company.save_result(store)
+    assert record['as_of'] == SYNTHETIC_MARKET_DATA.as_of
+
+    result = ResultStore(str(tmp_path)).get('SYN0', SYNTHETIC_MARKET_DATA.as_of, record['params'])
+    assert result['share_price'] == company.share_price
+    assert result['wacc'] == company.wacc
+    assert np.array_equal(result['grids']['sensitivity'], grid)
+    assert record['grids']['sensitivity']['axes']['wacc'] == company.sensitivity_axes['wacc'].tolist()
+
+def test_data_is_synced_before_the_index_line(tmp_path, monkeypatch):
+
+    store = ResultStore(str(tmp_path))
+    fsync = os.fsync
+    synced = []
+
+    def recording_fsync(fd):
+        inode = os.fstat(fd).st_ino
+        name = next(name for name in os.listdir(tmp_path) if os.stat(tmp_path/name).st_ino == inode)
+        #what the index holds when the file is synced
+        index = tmp_path/'index.jsonl'
+        synced.append((name, len(index.read_text().splitlines()) if index.exists() else 0))
+        fsync(fd)
+
+    monkeypatch.setattr(os, 'fsync', recording_fsync)
+    store.add('SYN0', '2020-12-31', {'g': 0.02}, {'share_price': 10.0}, grids = {'grid': np.ones((2, 2))})
+
+    assert synced == [('grids.f64', 0), ('metrics.f64', 0), ('index.jsonl', 1)]
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from data.statement_store import StatementStore
+from data.synthetic_statements import SYNTHETIC_MARKET_DATA, synthetic_statements, synthetic_universe
+from tools.fundamentals_class import Fundamentals
+from tools.reverse_dcf import find_roots, implied_growth_screen
+
+@pytest.mark.parametrize('method', ['illinois', 'bisection'])
+def test_find_roots_solves_every_problem_and_reports_convergence(method):
+
+    targets = np.array([0.5, 2.0, 9.0, 50.0, -1.0])
+    calls = []
+
+    def function(x, index):
+        calls.append(len(index))
+        return x**2 - targets[index]
+
+    solution = find_roots(function, np.zeros(5), np.full(5, 10.0), method = method)
+
+    np.testing.assert_allclose(solution['root'][:4], np.sqrt(targets[:4]), rtol = 1e-10)
+    assert solution['converged'].tolist() == [True, True, True, True, False]
+    assert solution['bracketed'].tolist() == [True, True, True, True, False]
+    assert np.isnan(solution['root'][4]) and solution['iterations'][4] == 0
+    assert np.all(np.abs(solution['residual'][:4]) <= 1e-8)
+    #converged problems are no longer evaluated
+    assert calls[-1] < len(targets)
+
+    solution = find_roots(function, np.zeros(5), np.full(5, 10.0), max_iterations = 3, method = method)
+    assert not solution['converged'][:4].all()
+    assert solution['iterations'].max() == 3
+
+def test_screen_matches_one_valuation_per_ticker():
+
+    universe = synthetic_universe(8)
+    store = StatementStore.from_statements(universe)
+    betas = {ticker: 0.8 + 0.1*i for i, ticker in enumerate(universe)}
+
+    for solve_for in ['earnings_growth_rate', 'perpetual_growth_rate']:
+        screen = implied_growth_screen(store, SYNTHETIC_MARKET_DATA, betas, solve_for)
+        assert list(screen.index) == list(universe)
+
+        for ticker, row in screen.iterrows():
+            company = Fundamentals.from_store(store, ticker, 4, '', SYNTHETIC_MARKET_DATA, beta = betas, quiet = True)
+            company.dcf(0.05, 0.05, 0.02)
+            assert row['wacc'] == company.wacc
+            if not row['bracketed']:
+                assert np.isnan(row[solve_for]) and not row['converged']
+                continue
+            assert row['converged']
+            price = company.what_if(**{solve_for: row[solve_for]})['share_price']
+            assert price == pytest.approx(row['market_price'], rel = 1e-8)
+
+def test_implied_perpetual_growth_matches_the_closed_form():
+
+    company = Fundamentals(**synthetic_statements('SYN0'), company_ticker = 'SYN0', forecasting_period = 4, api_key = '',
+                           market_data = SYNTHETIC_MARKET_DATA, beta = 1.1, quiet = True)
+    company.dcf(0.05, 0.05, 0.02)
+    market_price = 2*company.share_price
+    solution = company.implied_growth('perpetual_growth_rate', market_price = market_price)
+
+    #the terminal value needed to reach the market price: npv_tv = L*(1+g)/(wacc-g)/(1+wacc)**(n+1)
+    npv_tv = market_price*company.number_of_shares + company.debt - company.cash - company.npv_fcf_sum
+    k = npv_tv*(1 + company.wacc)**(company.forecasting_period + 1)
+    last_flow = company.npv_fcf_list[company.forecasting_period]
+    expected = (k*company.wacc - last_flow)/(k + last_flow)
+
+    assert solution['converged'] and solution['bracketed']
+    assert solution['perpetual_growth_rate'] == pytest.approx(expected, rel = 1e-9)
+    #the last dcf() is left untouched
+    assert company.g == 0.02
+
+    solution = company.implied_growth(market_price = market_price, bracket = (0.0, 0.01))
+    assert not solution['bracketed'] and not solution['converged']
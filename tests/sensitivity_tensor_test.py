@@ -0,0 +1,78 @@
+import numpy as np
+
+from data.synthetic_statements import SYNTHETIC_MARKET_DATA, synthetic_statements
+from tools import dcf_kernel
+from tools.fundamentals_class import Fundamentals
+from tools.sensitivity_tensor import AXES, load_tensor, sensitivity_tensor
+
+BASE = {'ebit': 4e10, 'non_cash_charges': 1e10, 'cwc': 2e9, 'cap_ex': -2e10, 'tax_rate': 0.16,
+        'debt': 1.5e10, 'cash': 1e11, 'number_of_shares': 7e8}
+
+GRID = {'wacc': np.linspace(0.02, 0.14, 7),
+        'perpetual_growth_rate': np.linspace(0.012, 0.028, 5),
+        'earnings_growth_rate': np.linspace(0.03, 0.07, 4),
+        'cap_ex_growth_rate': np.linspace(0.03, 0.07, 3),
+        'forecasting_period': [2, 5, 3]}
+
+def brute_force(base, axes):
+    #one dcf_kernel valuation per cell
+    prices = np.full(tuple(len(axes[axis]) for axis in AXES), np.nan)
+    for index in np.ndindex(prices.shape):
+        wacc, g, eg, cxg, n = (axes[axis][i] for axis, i in zip(AXES, index))
+        if wacc > g:
+            forecast = dcf_kernel.forecast(base['ebit'], base['non_cash_charges'], base['cwc'], base['cap_ex'],
+                                           base['tax_rate'], eg, cxg, g, wacc, int(n))
+            prices[index] = dcf_kernel.equity_value(forecast['enterprise_value'], base['debt'], base['cash'],
+                                                    base['number_of_shares'])[1]
+    return prices
+
+def test_tensor_matches_brute_force_and_marginals(tmp_path):
+
+    results = sensitivity_tensor(BASE, GRID, path = str(tmp_path), dtype = 'float64')
+    expected = brute_force(BASE, GRID)
+
+    prices, metadata = load_tensor(str(tmp_path))
+    assert prices.shape == expected.shape
+    assert np.array_equal(np.isnan(prices), np.isnan(expected))
+    assert np.allclose(prices, expected, rtol = 1e-12, equal_nan = True)
+    assert metadata['axis_order'] == AXES
+    assert metadata['axes']['forecasting_period'] == [2, 5, 3]
+    assert results['valid'] == int(np.sum(~np.isnan(expected)))
+
+    for axis_number, axis in enumerate(AXES):
+        others = tuple(a for a in range(len(AXES)) if a != axis_number)
+        marginal = results['marginals'][axis]
+        with np.errstate(all = 'ignore'):
+            counts = np.sum(~np.isnan(expected), axis = others)
+            assert marginal['count'] == counts.tolist()
+            assert np.allclose(marginal['mean'], np.nanmean(expected, axis = others), equal_nan = True)
+            assert np.allclose(marginal['max'], np.nanmax(expected, axis = others), equal_nan = True)
+
+def test_chunking_does_not_change_the_results(tmp_path):
+
+    whole = sensitivity_tensor(BASE, GRID, path = str(tmp_path / 'whole'))
+    #a tiny budget splits even the trailing axes into blocks
+    chunked = sensitivity_tensor(BASE, GRID, path = str(tmp_path / 'chunked'), memory_budget = 1000)
+
+    assert np.array_equal(load_tensor(str(tmp_path / 'whole'))[0], load_tensor(str(tmp_path / 'chunked'))[0], equal_nan = True)
+    assert chunked['valid'] == whole['valid']
+    assert np.isclose(chunked['mean'], whole['mean'])
+    for axis in AXES:
+        assert np.allclose(chunked['marginals'][axis]['std'], whole['marginals'][axis]['std'], equal_nan = True)
+    assert chunked['prices'].dtype == np.float32
+
+def test_fundamentals_sensitivity_tensor():
+
+    company = Fundamentals(**synthetic_statements('SYN0'), company_ticker = 'SYN0', forecasting_period = 4, api_key = '',
+                           market_data = SYNTHETIC_MARKET_DATA, beta = 1.1, quiet = True)
+    company.dcf(0.05, 0.05, 0.02)
+    results = company.sensitivity_tensor(steps = 5, axes = {'forecasting_period': [3, 4]})
+
+    assert results['shape'] == [5, 5, 5, 5, 2]
+    assert results['prices'] is None
+    #the dcf() inputs are the centre of the default axes
+    centre = results['marginals']['forecasting_period']['value'].index(4)
+    assert results['axes']['wacc'][2] == company.wacc
+    assert results['min'] <= company.share_price <= results['max']
+    assert results['marginals']['forecasting_period']['count'][centre] == 5**4 - np.sum(
+        np.subtract.outer(results['axes']['wacc'], results['axes']['perpetual_growth_rate']) <= 0)*25
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from data.synthetic_statements import SYNTHETIC_MARKET_DATA, synthetic_statements
+from tools.fundamentals_class import Fundamentals
+from tools.sensitivity import implied_share_price_grid, summarize
+
+FLOWS = {'last_flow': 8e9, 'npv_fcf_sum': 4e10, 'n_flows': 6, 'debt': 1.5e10, 'cash': 3e10, 'number_of_shares': 7e8}
+
+def reference_grid(wacc_range, g_range, last_flow, npv_fcf_sum, n_flows, debt, cash, number_of_shares):
+    #one valuation per (wacc, g) cell
+    grid = np.empty((len(wacc_range), len(g_range)))
+    for i, wacc in enumerate(wacc_range):
+        for j, g in enumerate(g_range):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                terminal_value = np.float64(last_flow*(1 + g))/(wacc - g)/(1 + wacc)**n_flows
+            grid[i, j] = (npv_fcf_sum + terminal_value - debt + cash)/number_of_shares
+    return grid
+
+def test_grid_matches_one_valuation_per_cell():
+
+    wacc_range = np.linspace(0.06, 0.1, 9)
+    g_range = np.linspace(0.01, 0.03, 7)
+    grid = implied_share_price_grid(wacc_range, g_range, **FLOWS)
+
+    assert grid.shape == (9, 7)
+    np.testing.assert_allclose(grid, reference_grid(wacc_range, g_range, **FLOWS), rtol = 1e-12)
+
+    #the optional output buffer is filled in place
+    out = np.empty((9, 7))
+    assert implied_share_price_grid(wacc_range, g_range, out = out, **FLOWS) is out
+    np.testing.assert_array_equal(out, grid)
+
+def test_grid_cells_with_wacc_at_or_below_g():
+
+    wacc_range = np.array([0.02, 0.03, 0.04])
+    g_range = np.array([-1.0, 0.03, 0.035])
+    grid = implied_share_price_grid(wacc_range, g_range, **FLOWS)
+    np.testing.assert_allclose(grid, reference_grid(wacc_range, g_range, **FLOWS), rtol = 1e-12)
+
+    #wacc == g divides by zero, a zero last flow makes it 0/0
+    assert np.isposinf(grid[1, 1])
+    assert np.isnan(implied_share_price_grid([0.03], [0.03], **dict(FLOWS, last_flow = 0.0))[0, 0])
+    #wacc < g gives a negative terminal value, not a valid price
+    assert grid[1, 2] < grid[0, 0] and np.isfinite(grid[1, 2])
+
+    #summarize() skips NaN cells
+    grid[0, :] = grid[1, 1] = np.nan
+    finite = grid[~np.isnan(grid)]
+    summary = summarize(grid, 0.5)
+    assert summary['median'] == np.median(finite)
+    assert (summary['min'], summary['max']) == (finite.min(), finite.max())
+
+def test_summary_matches_numpy_quantiles():
+
+    grid = implied_share_price_grid(np.linspace(0.05, 0.12, 40), np.linspace(0.005, 0.035, 31), **FLOWS)
+    summary = summarize(grid, [0.9, 0.5, 0.99], quantiles = (0.05, 0.25, 0.75, 0.95))
+    values = grid.ravel()
+
+    assert summary['median'] == pytest.approx(np.median(values), rel = 1e-12)
+    assert summary['mean'] == pytest.approx(values.mean(), rel = 1e-12)
+    assert (summary['min'], summary['max']) == (values.min(), values.max())
+    for ci, (lower, upper) in summary['bands'].items():
+        expected = np.percentile(values, [100*(1 - ci)/2, 100*(1 + ci)/2])
+        np.testing.assert_allclose((lower, upper), expected, rtol = 1e-12)
+    np.testing.assert_allclose(list(summary['quantiles'].values()), np.quantile(values, [0.05, 0.25, 0.75, 0.95]), rtol = 1e-12)
+
+    with pytest.raises(ValueError):
+        summarize(grid, 1.2)
+    with pytest.raises(ValueError):
+        summarize(np.full(4, np.nan), 0.9)
+
+def test_invalid_arguments_raise_in_quiet_mode(capsys):
+
+    company = Fundamentals(**synthetic_statements('SYN0'), company_ticker = 'SYN0', forecasting_period = 4, api_key = '',
+                           market_data = SYNTHETIC_MARKET_DATA, beta = 1.1, quiet = True)
+    company.dcf(0.05, 0.05, 0.02)
+
+    with pytest.raises(ValueError, match = 'bound'):
+        company.sensitivity(bound = 1.5, plot = False)
+    with pytest.raises(ValueError, match = 'confidence_intervals'):
+        company.sensitivity(confidence_intervals = 1.5, plot = False)
+    assert capsys.readouterr().out == ''
+
+    company.quiet = False
+    assert company.sensitivity(bound = 1.5, plot = False) is None
+    assert 'Ensure that 0 < bound < 1' in capsys.readouterr().out
@@ -0,0 +1,221 @@
+import asyncio
+import collections
+import json
+import time
+
+import pytest
+
+from data.batch_fetch import FUNDAMENTALS_STATEMENTS
+from data.synthetic_statements import SYNTHETIC_MARKET_DATA, synthetic_statements
+from tools import service as service_module
+from tools.service import HTTPError, ValuationService, parse_parameters
+from tools.universe import value_ticker
+
+QUERY = 'earnings_growth_rate=0.05&cap_ex_growth_rate=0.05&perpetual_growth_rate=0.02'
+
+async def get(port, target):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, body = response.split(b'\r\n\r\n', 1)
+    return int(head.split()[1]), json.loads(body)
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_concurrent_requests_are_coalesced_and_cached():
+
+    clock = Clock()
+    service = ValuationService(stub = True, ttl = 60, clock = clock)
+    parameters = parse_parameters(QUERY)
+
+    async def run():
+        results = await asyncio.gather(*[service.valuation('syn0', parameters) for _ in range(10)])
+        #same ticker, other parameters: one more valuation, the statements are reused
+        other = await service.valuation('SYN0', parse_parameters(QUERY + '&bound=0.2'))
+        cached = await service.valuation('SYN0', parameters)
+        clock.now = 61
+        expired = await service.valuation('SYN0', parameters)
+        return results, other, cached, expired
+
+    try:
+        results, other, cached, expired = asyncio.run(run())
+    finally:
+        service.close()
+
+    assert all(result is results[0] for result in results)
+    assert cached is results[0]
+    assert expired is not results[0] and expired['share_price'] == results[0]['share_price']
+    assert other['share_price'] == results[0]['share_price']
+    assert service.counters['valuations_computed'] == 3
+    assert service.counters['valuations_coalesced'] == 9
+    assert service.counters['valuations_hits'] == 1
+    assert service.counters['statements_computed'] == 2
+
+def test_parameters():
+
+    assert dict(parse_parameters(QUERY))['forecasting_period'] == 4
+    with pytest.raises(HTTPError):
+        parse_parameters('earnings_growth_rate=0.05')
+    with pytest.raises(HTTPError):
+        parse_parameters(QUERY + '&bound=x')
+    with pytest.raises(HTTPError):
+        parse_parameters(QUERY + '&beta=1')
+
+def test_http_endpoints_and_metrics():
+
+    service = ValuationService(stub = True)
+
+    async def run():
+        server = await service.start(port = 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            responses = await asyncio.gather(*[get(port, f'/valuation/SYN1?{QUERY}') for _ in range(5)])
+            missing = await get(port, f'/valuation/SYN1?earnings_growth_rate=0.05')
+            unknown = await get(port, '/unknown')
+            metrics = await get(port, '/metrics')
+        return responses, missing, unknown, metrics
+
+    try:
+        responses, missing, unknown, (status, metrics) = asyncio.run(run())
+    finally:
+        service.close()
+
+    assert all(status == 200 for status, _ in responses)
+    assert len({body['share_price'] for _, body in responses}) == 1
+    assert missing[0] == 400 and 'cap_ex_growth_rate' in missing[1]['error']
+    assert unknown[0] == 404
+    assert status == 200
+    assert metrics['counters']['valuations_computed'] == 1
+    assert metrics['latency_ms']['valuation']['count'] == 6
+    assert metrics['cached_valuations'] == 1
+
+def test_cancelling_the_first_request_does_not_fail_the_others():
+
+    service = ValuationService(stub = True)
+
+    async def run():
+        release = asyncio.Event()
+        cache = collections.OrderedDict()
+
+        async def compute():
+            await release.wait()
+            return {'share_price': 1.0}
+
+        first = asyncio.ensure_future(service._cached(cache, 'SYN0', compute, 'test'))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(service._cached(cache, 'SYN0', compute, 'test'))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return first, await second
+
+    try:
+        first, second = asyncio.run(run())
+    finally:
+        service.close()
+
+    assert first.cancelled()
+    assert second == {'share_price': 1.0}
+    assert service.counters['test_computed'] == 1 and not service._in_flight
+
+def test_market_data_is_loaded_once(monkeypatch):
+
+    calls = []
+
+    def get_market_data():
+        calls.append(1)
+        time.sleep(0.05)
+        return SYNTHETIC_MARKET_DATA
+
+    monkeypatch.setattr(service_module, 'get_market_data', get_market_data)
+    service = ValuationService(stub = True)
+    service.market_data = None
+    parameters = parse_parameters(QUERY)
+
+    async def run():
+        return await asyncio.gather(*[service.valuation(f'SYN{i}', parameters) for i in range(4)])
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        service.close()
+
+    assert len(calls) == 1
+    assert service.market_data is SYNTHETIC_MARKET_DATA
+    assert service.counters['market_data_computed'] == 1 and service.counters['market_data_coalesced'] == 3
+    assert all(result['share_price'] > 0 for result in results)
+
+def test_failed_fetch_is_a_502_and_is_not_cached():
+
+    service = ValuationService(api_key = 'key', market_data = SYNTHETIC_MARKET_DATA, fetch_workers = 8)
+    keys = {request: key for key, request in FUNDAMENTALS_STATEMENTS.items()}
+
+    def fetch_statement(ticker, statement_name, frequency='annual', limit=None):
+        #every request is in flight at the same time, half of the tickers fail one statement
+        time.sleep(0.01)
+        key = keys[(statement_name, frequency)]
+        if ticker.startswith('BAD') and key == 'cash_flow_statement':
+            raise ConnectionError(f'{ticker} {key} failed')
+        return synthetic_statements(ticker)[key]
+
+    service.fetcher.fetch_statement = fetch_statement
+    tickers = [f'{prefix}{i}' for i in range(8) for prefix in ('SYN', 'BAD')]
+
+    async def run():
+        return await asyncio.gather(*[service.statements(ticker) for ticker in tickers], return_exceptions = True)
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        service.close()
+
+    for ticker, result in zip(tickers, results):
+        if ticker.startswith('BAD'):
+            assert isinstance(result, HTTPError) and result.status == 502
+            assert f'{ticker} cash_flow_statement failed' in str(result)
+            assert ticker not in service._statements
+        else:
+            assert result == synthetic_statements(ticker)
+            assert service._statements[ticker][1] == synthetic_statements(ticker)
+
+def test_betas_are_fetched_once_on_the_event_loop_side():
+
+    service = ValuationService(api_key = 'key', market_data = SYNTHETIC_MARKET_DATA)
+    keys = {request: key for key, request in FUNDAMENTALS_STATEMENTS.items()}
+    profiles = []
+
+    def fetch_statement(ticker, statement_name, frequency='annual', limit=None):
+        if statement_name == 'company/profile':
+            profiles.append(ticker)
+            if ticker == 'NOBETA':
+                return {'profile': {}}
+            return {'profile': {'beta': 1.3}}
+        return synthetic_statements(ticker)[keys[(statement_name, frequency)]]
+
+    service.fetcher.fetch_statement = fetch_statement
+
+    async def run():
+        valuations = [service.valuation(ticker, parse_parameters(QUERY + f'&bound={bound}'))
+                      for ticker in ('SYN0', 'SYN1') for bound in (0.2, 0.3, 0.4)]
+        return await asyncio.gather(*valuations, service.valuation('NOBETA', parse_parameters(QUERY)), return_exceptions = True)
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        service.close()
+
+    #a valuation without a beta would have looked it up in the executor, from the real api
+    assert sorted(profiles) == ['NOBETA', 'SYN0', 'SYN1']
+    expected = value_ticker('SYN0', synthetic_statements('SYN0'), '', SYNTHETIC_MARKET_DATA, 0.05, 0.05, 0.02, bound = 0.2, beta = 1.3)
+    assert results[0]['share_price'] == expected['share_price']
+    assert isinstance(results[-1], HTTPError) and results[-1].status == 502 and 'Beta of NOBETA' in str(results[-1])
+    assert service.counters['betas_computed'] == 3 and 'NOBETA' not in service._betas
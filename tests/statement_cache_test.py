@@ -0,0 +1,71 @@
+import os
+import time
+
+import pytest
+
+from data import get_statements
+from data.request_scheduler import RequestScheduler
+from data.statement_cache import StatementCache, CacheMissError
+
+INCOME = [{'date': '2020-12-31', 'ebitda': 100.0, 'depreciationAndAmortization': 10.0}]
+
+def test_round_trip_and_ttl(tmp_path):
+
+    cache = StatementCache(str(tmp_path), ttl={'income-statement': 60})
+    assert cache.get('GOOG', 'income-statement', 'annual') is None
+
+    cache.put('GOOG', 'income-statement', 'annual', INCOME)
+    assert cache.get('goog', 'income-statement', 'annual') == INCOME
+    assert cache.get('GOOG', 'income-statement', 'quarter') is None
+
+    #expire the entry
+    cache.ttl['income-statement'] = -1
+    assert cache.get('GOOG', 'income-statement', 'annual') is None
+
+def test_offline_serves_stale_and_raises_on_miss(tmp_path):
+
+    StatementCache(str(tmp_path)).put('GOOG', 'income-statement', 'annual', INCOME)
+
+    offline = StatementCache(str(tmp_path), ttl={'income-statement': -1}, offline=True)
+    assert offline.get('GOOG', 'income-statement', 'annual') == INCOME
+    with pytest.raises(CacheMissError):
+        offline.get('AAPL', 'income-statement', 'annual')
+
+def test_lru_eviction(tmp_path):
+
+    cache = StatementCache(str(tmp_path), max_bytes=10**9)
+    for i, ticker in enumerate(['A', 'B', 'C']):
+        cache.put(ticker, 'income-statement', 'annual', INCOME)
+        file = cache._file(ticker, 'income-statement', 'annual')
+        os.utime(file, (time.time() - 100 + i, time.time() - 100 + i))
+
+    #touch A so that B becomes the least recently used entry
+    cache.get('A', 'income-statement', 'annual')
+
+    cache.max_bytes = cache.size() - 1
+    cache._evict()
+    assert cache.get('B', 'income-statement', 'annual') is None
+    assert cache.get('A', 'income-statement', 'annual') == INCOME
+    assert cache.get('C', 'income-statement', 'annual') == INCOME
+
+def test_get_statement_uses_cache(tmp_path, monkeypatch):
+
+    calls = []
+
+    class Response:
+        def json(self):
+            return INCOME
+
+    def fake_get(url, timeout=None):
+        calls.append(url)
+        return Response()
+
+    scheduler = RequestScheduler(daily_budget=None)
+    monkeypatch.setattr(scheduler.session, 'get', fake_get)
+    cache = StatementCache(str(tmp_path))
+
+    for _ in range(3):
+        statement = get_statements.get_statement('GOOG', 'income-statement', 'key', cache=cache, scheduler=scheduler)
+
+    assert statement == INCOME
+    assert len(calls) == 1
@@ -0,0 +1,56 @@
+import copy
+
+import numpy as np
+import pytest
+
+from data.statement_store import FIELDS, STATEMENTS, StatementStore, periods, read_field
+from data.synthetic_statements import synthetic_universe
+
+def universe_with_gaps():
+    universe = copy.deepcopy(synthetic_universe(4))
+    #a field missing from one period, a shorter history and a missing statement
+    del universe['SYN1']['income_statement'][1]['ebitda']
+    universe['SYN2']['cash_flow_statement'] = universe['SYN2']['cash_flow_statement'][:2]
+    universe['SYN3']['enterprise_value'] = None
+    return universe
+
+def test_from_statements_matches_read_field():
+
+    universe = universe_with_gaps()
+    store = StatementStore.from_statements(universe)
+    assert store.n_periods == 20
+
+    for ticker, statements in universe.items():
+        for field, (key, _) in FIELDS.items():
+            statement = statements[STATEMENTS[key][0]]
+            for period in range(5):
+                try:
+                    expected = read_field(statement, field, period)
+                except (KeyError, IndexError):
+                    with pytest.raises(KeyError):
+                        store.value(field, ticker, period)
+                    assert np.isnan(store.history(field, ticker, 5)[period])
+                    continue
+                assert store.value(field, ticker, period) == expected
+            assert store.dates[key][store.index[ticker], 0] == (str(periods(statement, key)[0]['date'])[:10] if statement else '')
+
+    assert np.isnan(store.column('inc.ebitda', 1)[1])
+    with pytest.raises(KeyError):
+        read_field(universe['SYN1']['income_statement'], 'inc.ebitda', 1)
+
+def test_save_load_round_trip(tmp_path):
+
+    store = StatementStore.from_statements(universe_with_gaps(), n_periods = 3, fields = ['inc.ebitda', 'ev.cash'], dtype = 'float32')
+    store.save(str(tmp_path))
+    loaded = StatementStore.load(str(tmp_path))
+
+    assert loaded.tickers.tolist() == store.tickers.tolist() and loaded.index == store.index
+    assert list(loaded.fields) == ['inc.ebitda', 'ev.cash']
+    for field, array in store.fields.items():
+        assert isinstance(loaded.fields[field], np.memmap)
+        assert loaded.fields[field].dtype == np.float32 and loaded.fields[field].shape == (4, 3)
+        np.testing.assert_array_equal(loaded.fields[field], array)
+    for key, array in store.dates.items():
+        np.testing.assert_array_equal(loaded.dates[key], array)
+    assert loaded.value('inc.ebitda', 'SYN0', 2) == store.value('inc.ebitda', 'SYN0', 2)
+    assert loaded.nbytes() == store.nbytes()
@@ -0,0 +1,85 @@
+import os
+
+import numpy as np
+
+from data.synthetic_statements import SYNTHETIC_MARKET_DATA, synthetic_statements, synthetic_universe
+from tools import universe as universe_module
+from tools.fundamentals_class import Fundamentals
+from tools.universe import METRICS, _value_shard, value_ticker, value_universe
+
+class ExitOnUnpickle:
+    #kills the worker process that receives it, the way a segfault or the OOM killer would
+    def __reduce__(self):
+        return (os._exit, (1,))
+
+def run(universe, tickers, **kwargs):
+    betas = {ticker: 1.1 for ticker in tickers}
+    return value_universe(tickers, '', 0.05, 0.05, 0.02, statements = universe, market_data = SYNTHETIC_MARKET_DATA,
+                          progress = False, betas = betas, **kwargs)
+
+def test_pool_matches_serial_valuations_and_isolates_failures():
+
+    universe = synthetic_universe(7)
+    universe['SYN3'] = dict(universe['SYN3'], income_statement = [])
+    tickers = list(universe) + ['MISSING']
+    stats = {}
+    results = run(universe, tickers, processes = 2, shard_size = 2, stats = stats)
+
+    assert results['ticker'].tolist() == tickers
+    errors = dict(zip(tickers, results['error'].tolist()))
+    assert errors['SYN3'].startswith('IndexError') and errors['MISSING'] == 'no statements'
+    assert np.isnan(results['share_price'][tickers.index('SYN3')])
+    assert stats['revalued'] == 6 and 1 <= len(stats['worker_startup']) <= 2
+
+    for i, ticker in enumerate(tickers):
+        if errors[ticker]:
+            continue
+        row = value_ticker(ticker, universe[ticker], '', SYNTHETIC_MARKET_DATA, 0.05, 0.05, 0.02, beta = 1.1)
+        for column in METRICS[:-2]:
+            assert results[column][i] == row[column]
+
+def test_value_shard_records_the_error_of_each_ticker():
+
+    jobs = [('SYN0', synthetic_statements('SYN0')), ('SYN1', dict(synthetic_statements('SYN1'), financial_ratios = None))]
+    pid, _, results = _value_shard(jobs, api_key = '', market_data = SYNTHETIC_MARKET_DATA, earnings_growth_rate = 0.05,
+                                   cap_ex_growth_rate = 0.05, perpetual_growth_rate = 0.02, beta = 1.1)
+
+    assert pid == os.getpid()
+    assert [ticker for ticker, _, _ in results] == ['SYN0', 'SYN1']
+    assert results[0][2] is None and results[0][1]['share_price'] > 0
+    assert results[1][1] is None and results[1][2].startswith('IndexError')
+
+def test_crashed_worker_fails_its_tickers_without_stopping_the_run():
+
+    universe = synthetic_universe(4)
+    universe['CRASH'] = dict(synthetic_statements('CRASH'), income_statement = ExitOnUnpickle())
+    tickers = list(universe)
+    results = run(universe, tickers, processes = 1, shard_size = 1)
+
+    errors = dict(zip(tickers, results['error'].tolist()))
+    assert errors['CRASH'].startswith('worker crashed')
+    #the other shards were either valued before the crash or failed with the pool
+    for i, ticker in enumerate(tickers):
+        assert (errors[ticker] == '') == np.isfinite(results['share_price'][i])
+        assert errors[ticker] == '' or errors[ticker].startswith('worker crashed')
+
+def test_missing_betas_are_fetched(monkeypatch):
+
+    calls = []
+    def fetch_betas(tickers, api_key, **kwargs):
+        calls.append(list(tickers))
+        return {ticker: 1.1 for ticker in tickers}, {}
+    monkeypatch.setattr(universe_module, 'fetch_betas', fetch_betas)
+
+    universe = synthetic_universe(4)
+    results = value_universe(list(universe), '', 0.05, 0.05, 0.02, statements = universe, market_data = SYNTHETIC_MARKET_DATA,
+                             processes = 1, progress = False, betas = {'SYN0': None, 'SYN1': float('nan'), 'SYN2': 1.1})
+
+    assert calls == [['SYN0', 'SYN1', 'SYN3']]
+    assert results['error'].tolist() == ['']*4
+
+    for beta in (None, float('nan'), {'SYN0': None}, {'SYN0': float('nan')}, {}):
+        company = Fundamentals(**universe['SYN0'], company_ticker = 'SYN0', forecasting_period = 4, api_key = '', beta = beta, quiet = True)
+        assert company._beta is None
+    company = Fundamentals(**universe['SYN0'], company_ticker = 'SYN0', forecasting_period = 4, api_key = '', beta = {'SYN0': '1.2'}, quiet = True)
+    assert company._beta == 1.2
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+from data.prices import INDEX_SYMBOL
+
+#resampling of the prices before computing returns: {frequency: pandas rule}
+FREQUENCIES = {'daily': None, 'weekly': 'W-FRI', 'monthly': 'ME'}
+
+#periods per year of each frequency (default window: two years)
+PERIODS_PER_YEAR = {'daily': 252, 'weekly': 52, 'monthly': 12}
+
+def period_returns(prices, frequency='weekly'):
+    """
+    Summary:
+    Simple returns of closing prices at a frequency (the last close of every week/month is used).
+    inputs:
+    prices (DataFrame): closing prices, one column per symbol, indexed by date.
+    frequency (str): one of FREQUENCIES.
+    returns:
+    (DataFrame) = returns, NaN where a price is missing.
+    """
+    if frequency not in FREQUENCIES:
+        raise ValueError(f"frequency must be one of {list(FREQUENCIES)}")
+    if FREQUENCIES[frequency] is not None:
+        prices = prices.resample(FREQUENCIES[frequency]).last()
+    return prices.pct_change(fill_method=None).iloc[1:]
+
+def regress(returns, market_returns, min_periods=2):
+    """
+    Summary:
+    Ordinary least squares of every column of returns on the market returns at once, using for each
+    column only the periods where both returns are known.
+    inputs:
+    returns (ndarray): (period, ticker) returns.
+    market_returns (ndarray): (period,) returns of the index.
+    min_periods (int): betas with fewer observations are NaN.
+    returns:
+    (dict) = {'beta', 'alpha', 'r_squared', 'observations'}, each an ndarray (ticker,)
+    """
+    returns = np.asarray(returns, dtype='float64')
+    market_returns = np.asarray(market_returns, dtype='float64')[:, None]
+
+    known = np.isfinite(returns) & np.isfinite(market_returns)
+    n = known.sum(axis=0)
+    y = np.where(known, returns, 0.0)
+    x = np.where(known, market_returns, 0.0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_mean = x.sum(axis=0)/n
+        y_mean = y.sum(axis=0)/n
+        dx = np.where(known, x - x_mean, 0.0)
+        dy = np.where(known, y - y_mean, 0.0)
+        sxx = (dx*dx).sum(axis=0)
+        syy = (dy*dy).sum(axis=0)
+        sxy = (dx*dy).sum(axis=0)
+
+        beta = sxy/sxx
+        alpha = y_mean - beta*x_mean
+        r_squared = sxy**2/(sxx*syy)
+
+    enough = (n >= max(min_periods, 2)) & (sxx > 0)
+    return {'beta': np.where(enough, beta, np.nan),
+            'alpha': np.where(enough, alpha, np.nan),
+            'r_squared': np.where(enough, r_squared, np.nan),
+            'observations': n}
+
+def estimate_betas(prices, index=INDEX_SYMBOL, tickers=None, frequency='weekly', window=None, as_of=None, min_periods=None):
+    """
+    Summary:
+    Betas of every ticker against the index from one vectorized regression over the price history,
+    so no per-ticker 'financialmodelingprep' company profile call is needed.
+    inputs:
+    prices (DataFrame): closing prices of the tickers and the index (see data/prices.py: load_prices/fetch_prices).
+    index (str): column of the index.
+    tickers (list): tickers to estimate, defaults to every other column.
+    frequency (str): 'daily', 'weekly' or 'monthly' returns.
+    window (int): number of returns used (the latest ones), defaults to two years at the frequency.
+    as_of (str): last date used, defaults to the last date of the prices.
+    min_periods (int): minimum returns of a ticker, defaults to half of the window.
+    returns:
+    (DataFrame) = index ticker, columns ['beta', 'alpha', 'r_squared', 'observations'].
+                  e.g. Fundamentals(..., beta=estimate_betas(prices)['beta'])
+    """
+    if index not in prices.columns:
+        raise ValueError(f"The prices have no {index} column")
+    tickers = [column for column in prices.columns if column != index] if tickers is None else list(tickers)
+    window = 2*PERIODS_PER_YEAR[frequency] if window is None else window
+    min_periods = max(window//2, 2) if min_periods is None else min_periods
+
+    if as_of is not None:
+        prices = prices.loc[:pd.Timestamp(as_of)]
+    returns = period_returns(prices.reindex(columns=tickers + [index]), frequency).iloc[-window:]
+
+    results = regress(returns[tickers].to_numpy(), returns[index].to_numpy(), min_periods)
+    return pd.DataFrame(results, index=pd.Index(tickers, name='ticker'))
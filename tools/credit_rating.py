@@ -0,0 +1,82 @@
+import json
+
+import numpy as np
+
+class RatingTable:
+
+    def __init__(self, thresholds, ratings, spreads):
+        """
+        Summary:
+        Breakpoint table mapping interest-coverage ratios to a credit rating and credit spread.
+        A ratio r gets ratings[i] for the first i with r <= thresholds[i], and ratings[-1] above the last threshold.
+        inputs:
+        thresholds (list): ascending upper bounds of the coverage ratio, one less than ratings.
+        ratings (list): rating labels, from the lowest to the highest rating.
+        spreads (list): credit spread of each rating.
+        """
+        self.thresholds = np.asarray(thresholds, dtype='float64')
+        self.ratings = np.asarray(ratings, dtype=str)
+        self.spreads = np.asarray(spreads, dtype='float64')
+
+        if not (len(self.ratings) == len(self.spreads) == len(self.thresholds) + 1):
+            raise ValueError("A rating table needs one more rating/spread than thresholds")
+        if np.any(np.diff(self.thresholds) <= 0):
+            raise ValueError("Rating table thresholds must be strictly increasing")
+
+    @classmethod
+    def from_dict(cls, table):
+        return cls(table['thresholds'], table['ratings'], table['spreads'])
+
+    @classmethod
+    def from_config(cls, path, name=None):
+        """
+        Summary:
+        Loads a table from a json file, either {'thresholds': [...], 'ratings': [...], 'spreads': [...]}
+        or several named tables, e.g. {'large_cap': {...}, 'small_cap': {...}}, selected with name.
+        """
+        with open(path) as f:
+            config = json.load(f)
+        return cls.from_dict(config if name is None else config[name])
+
+    def to_dict(self):
+        return {'thresholds': self.thresholds.tolist(),
+                'ratings': self.ratings.tolist(),
+                'spreads': self.spreads.tolist()}
+
+    def _index(self, coverage_ratio):
+        coverage_ratio = np.asarray(coverage_ratio, dtype='float64')
+        index = np.searchsorted(self.thresholds, coverage_ratio, side='left')
+        #a missing ratio gets the lowest rating
+        return np.where(np.isnan(coverage_ratio), 0, index)
+
+    def lookup(self, coverage_ratio):
+        """
+        Summary:
+        Resolves the credit rating of one or many interest-coverage ratios with a binary search.
+        returns:
+        (tuple) = (rating labels, credit spreads), arrays shaped like coverage_ratio.
+        """
+        index = self._index(coverage_ratio)
+        return self.ratings[index], self.spreads[index]
+
+    def spread(self, coverage_ratio):
+        return self.spreads[self._index(coverage_ratio)]
+
+#Interest coverage ratio -> rating -> spread for large companies
+LARGE_CAP = RatingTable(thresholds = [0.2, 0.65, 0.8, 1.25, 1.5, 1.75, 2, 2.25, 2.5, 3, 4.25, 5.5, 6.5, 8.5],
+                        ratings = ['D', 'C', 'CC', 'CCC', 'B-', 'B', 'B+', 'BB', 'BB+', 'BBB', 'A-', 'A', 'A+', 'AA', 'AAA'],
+                        spreads = [0.1512, 0.1134, 0.0864, 0.0820, 0.0515, 0.0421, 0.0351, 0.0240, 0.02, 0.0156, 0.0122, 0.0108, 0.0098, 0.0078, 0.0063])
+
+#Smaller and riskier companies need a higher coverage ratio for the same rating
+SMALL_CAP = RatingTable(thresholds = [0.5, 0.8, 1.25, 1.5, 2, 2.5, 3, 3.5, 4, 4.5, 6, 7.5, 9.5, 12.5],
+                        ratings = LARGE_CAP.ratings,
+                        spreads = LARGE_CAP.spreads)
+
+def cost_of_debt(interest_coverage_ratio, risk_free_rate, table=LARGE_CAP):
+    """
+    Summary:
+    Cost of debt of many companies at once using the credit-rating method.
+    returns:
+    cost of debt (array) = rfr + cs
+    """
+    return np.asarray(risk_free_rate, dtype='float64') + table.spread(interest_coverage_ratio)
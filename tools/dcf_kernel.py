@@ -0,0 +1,111 @@
+import numpy as np
+
+def project_free_cash_flows(ebit, non_cash_charges, cwc, cap_ex, tax_rate, earnings_growth_rate, cap_ex_growth_rate, wacc, forecasting_period):
+    """
+    Summary:
+    Projects and discounts the un-levered free-cash-flow of every scenario at once.
+    In year yr, earnings and non-cash-charges grow by (1 + yr*eg), cap-ex by (1 + yr*cxg) and the
+    change in working capital decays by 0.7, i.e. each driver is the cumulative product of its factors.
+    inputs:
+    ebit, non_cash_charges, cwc, cap_ex (float/array): base-year values.
+    tax_rate (float/array): effective tax rate.
+    earnings_growth_rate, cap_ex_growth_rate, wacc (float/array): scenario parameters.
+    forecasting_period (int/array): number of years to forecast.
+    All inputs broadcast against each other to the scenario shape S.
+    returns:
+    pv_fcf (ndarray): shape S + (max(forecasting_period) + 1,), the base-year free-cash-flow followed by the
+                      present value of each forecast year. Years beyond a scenario's forecasting_period are 0.
+    """
+    ebit, non_cash_charges, cwc, cap_ex, tax_rate, eg, cxg, wacc, n = np.broadcast_arrays(
+        *[np.asarray(x, dtype='float64') for x in (ebit, non_cash_charges, cwc, cap_ex, tax_rate,
+                                                     earnings_growth_rate, cap_ex_growth_rate, wacc)],
+        np.asarray(forecasting_period, dtype='int64'))
+
+    n_max = int(n.max()) if n.size else 0
+    years = np.arange(1, n_max + 1)
+
+    #cumulative products [base, base*f1, base*f1*f2, ...] in the same order as a year by year loop
+    def grow(base, factors):
+        return np.cumprod(np.concatenate([base[..., None], factors], axis=-1), axis=-1)
+
+    ebit = grow(ebit, 1 + years*eg[..., None])
+    non_cash_charges = grow(non_cash_charges, 1 + years*eg[..., None])
+    cap_ex = grow(cap_ex, 1 + years*cxg[..., None])
+    cwc = grow(cwc, np.full(eg.shape + (n_max,), 0.7))
+
+    ulfcf = ebit*(1 - tax_rate[..., None]) + non_cash_charges + cwc + cap_ex
+
+    #discount by WACC, the base year is not discounted
+    pv_fcf = ulfcf
+    pv_fcf[..., 1:] = ulfcf[..., 1:]/((1 + wacc[..., None])**years)
+    pv_fcf[np.arange(n_max + 1) > n[..., None]] = 0
+
+    return pv_fcf
+
+def terminal_value(last_pv_flow, perpetual_growth_rate, wacc, forecasting_period):
+    """
+    Summary:
+    Terminal value via the perpetual-growth method.
+    returns:
+    (tuple) = (terminal value, present value of the terminal value)
+    TV = fcfn*(1+g)/(i-g), discounted by (1+i)**(n+1)
+    """
+    g = np.asarray(perpetual_growth_rate, dtype='float64')
+    wacc = np.asarray(wacc, dtype='float64')
+
+    final_cashflow = last_pv_flow * (1 + g)
+    TV = final_cashflow/(wacc - g)
+    NPV_TV = TV/(1 + wacc)**(1 + np.asarray(forecasting_period))
+
+    return TV, NPV_TV
+
+def discount_terminal_value(pv_fcf, perpetual_growth_rate, wacc, forecasting_period):
+    """
+    Summary:
+    Adds the terminal value to projected free-cash-flows (the output of project_free_cash_flows),
+    so a new perpetual growth rate can be evaluated without projecting the cash flows again.
+    returns:
+    (dict) = {'enterprise_value', 'pv_fcf', 'npv_fcf_sum', 'terminal_value', 'npv_terminal_value'}
+    """
+    #sum year by year (sequential, so scalar and batch results are identical)
+    npv_fcf_sum = pv_fcf[..., 0].copy()
+    for yr in range(1, pv_fcf.shape[-1]):
+        npv_fcf_sum += pv_fcf[..., yr]
+
+    n = np.broadcast_to(np.asarray(forecasting_period, dtype='int64'), npv_fcf_sum.shape)
+    last_pv_flow = np.take_along_axis(pv_fcf, n[..., None], axis=-1)[..., 0]
+
+    TV, NPV_TV = terminal_value(last_pv_flow, perpetual_growth_rate, wacc, n)
+
+    return {'enterprise_value': NPV_TV + npv_fcf_sum,
+            'pv_fcf': pv_fcf,
+            'npv_fcf_sum': npv_fcf_sum,
+            'terminal_value': TV,
+            'npv_terminal_value': NPV_TV}
+
+def forecast(ebit, non_cash_charges, cwc, cap_ex, tax_rate, earnings_growth_rate, cap_ex_growth_rate, perpetual_growth_rate, wacc, forecasting_period):
+    """
+    Summary:
+    Stateless two-stage DCF forecast for arrays of scenarios (see project_free_cash_flows for the inputs).
+    enterprise_value = sum(fcf0 + fcf1/(1+i)**1 + ... + fcfn/(1+i)**n) + (fcfn*(1+g)/i-g)/(1+i)**(n+1)
+    returns:
+    (dict) = {'enterprise_value': array S,
+              'pv_fcf': array S + (n_max+1,),
+              'npv_fcf_sum': array S,
+              'terminal_value': array S,
+              'npv_terminal_value': array S}
+    """
+    pv_fcf = project_free_cash_flows(ebit, non_cash_charges, cwc, cap_ex, tax_rate,
+                                     earnings_growth_rate, cap_ex_growth_rate, wacc, forecasting_period)
+
+    return discount_terminal_value(pv_fcf, perpetual_growth_rate, wacc, forecasting_period)
+
+def equity_value(enterprise_value, debt, cash, number_of_shares):
+    """
+    Summary:
+    Converts enterprise values to equity values and implied share prices.
+    returns:
+    (tuple) = (equity value, implied share price)
+    """
+    equity = enterprise_value - debt + cash
+    return equity, equity/number_of_shares
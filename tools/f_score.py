@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+#Piotroski conditions by group (names used by Fundamentals.f_score)
+GROUPS = {'profitability': ['profitability1', 'profitability2', 'profitability3', 'profitability4'],
+          'leverage_and_liquidity': ['leverage_liquidity1', 'leverage_liquidity2', 'leverage_liquidity3'],
+          'operational_efficiency': ['operational_efficiency_1', 'operational_efficiency_2']
+         }
+CONDITIONS = [condition for group in GROUPS.values() for condition in group]
+
+#statement fields needed for the current and the previous period
+CURRENT_FIELDS = ['fr.returnOnAssets', 'fr.operatingCashFlowPerShare', 'fr.assetTurnover',
+                  'cf.operatingCashFlow', 'bs.totalAssets', 'bs.longTermDebt', 'bs.totalDebt',
+                  'bs.totalCurrentAssets', 'bs.totalCurrentLiabilities', 'inc.weightedAverageShsOutDil']
+PREVIOUS_FIELDS = ['fr.returnOnAssets', 'fr.assetTurnover', 'bs.longTermDebt', 'bs.totalDebt',
+                   'bs.totalCurrentAssets', 'bs.totalCurrentLiabilities', 'inc.weightedAverageShsOutDil']
+
+#metrics behind the conditions
+METRICS = ['return_on_assets', 'operating_cash_flow_per_share', 'return_on_assets_change', 'operating_cash_flow_to_assets',
+           'long_term_leverage_change', 'current_ratio_change', 'number_of_shares_change',
+           'gross_margin_change', 'asset_turnover_change']
+SCORES = ['f_score', 'profitability_score', 'leverage_liquidity_score', 'operating_efficiency_score']
+
+DTYPE = np.dtype([(name, 'float64') for name in METRICS] +
+                 [(name, 'bool') for name in CONDITIONS] +
+                 [(name, 'int8') for name in SCORES])
+
+def _ratio(numerator, denominator):
+    """
+    Summary:
+    numerator/denominator, NaN where the denominator is 0 or missing.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator != 0, numerator/denominator, np.nan)
+
+def f_scores(current, previous, as_frame=False, index=None):
+    """
+    Summary:
+    Piotroski f-score of N companies at once.
+    Missing values and zero denominators (e.g. totalDebt == 0) give NaN metrics, and a condition
+    on a NaN metric is not satisfied, so no exception is raised.
+    inputs:
+    current (dict): {field: array (N,)} for every field in CURRENT_FIELDS (current period).
+    previous (dict): {field: array (N,)} for every field in PREVIOUS_FIELDS (previous period).
+    as_frame (bool): return a DataFrame instead of a structured array.
+    index (list): optional index of the DataFrame (e.g. tickers).
+    returns:
+    structured array (N,) (or DataFrame) with the metrics, the condition flags and the scores.
+    """
+    c = {field: np.asarray(current[field], dtype='float64') for field in CURRENT_FIELDS}
+    p = {field: np.asarray(previous[field], dtype='float64') for field in PREVIOUS_FIELDS}
+    n = len(c['fr.returnOnAssets'])
+
+    results = np.zeros(n, dtype=DTYPE)
+
+    with np.errstate(invalid='ignore'):
+        #profitability conditions
+        roa = c['fr.returnOnAssets']
+        results['return_on_assets'] = roa
+        results['operating_cash_flow_per_share'] = c['fr.operatingCashFlowPerShare']
+        results['return_on_assets_change'] = roa - p['fr.returnOnAssets']
+        results['operating_cash_flow_to_assets'] = _ratio(c['cf.operatingCashFlow'], c['bs.totalAssets'])
+
+        #leverage, liquidity and source of funds conditions
+        results['long_term_leverage_change'] = _ratio(c['bs.longTermDebt'], c['bs.totalDebt']) - _ratio(p['bs.longTermDebt'], p['bs.totalDebt'])
+        results['current_ratio_change'] = (_ratio(c['bs.totalCurrentAssets'], c['bs.totalCurrentLiabilities'])
+                                           - _ratio(p['bs.totalCurrentAssets'], p['bs.totalCurrentLiabilities']))
+        results['number_of_shares_change'] = c['inc.weightedAverageShsOutDil'] - p['inc.weightedAverageShsOutDil']
+
+        #operating efficiency conditions (the gross margin change is measured on returnOnAssets, as in Fundamentals.f_score)
+        results['gross_margin_change'] = roa - p['fr.returnOnAssets']
+        results['asset_turnover_change'] = c['fr.assetTurnover'] - p['fr.assetTurnover']
+
+    #comparisons with NaN are False
+    results['profitability1'] = results['return_on_assets'] > 0
+    results['profitability2'] = results['operating_cash_flow_per_share'] > 0
+    results['profitability3'] = results['return_on_assets_change'] > 0
+    results['profitability4'] = results['operating_cash_flow_to_assets'] > roa
+    results['leverage_liquidity1'] = results['long_term_leverage_change'] < 0
+    results['leverage_liquidity2'] = results['current_ratio_change'] > 0
+    results['leverage_liquidity3'] = results['number_of_shares_change'] == 0
+    results['operational_efficiency_1'] = results['gross_margin_change'] > 0
+    results['operational_efficiency_2'] = results['asset_turnover_change'] > 0
+
+    for score, group in zip(SCORES[1:], GROUPS.values()):
+        results[score] = sum(results[condition].astype('int8') for condition in group)
+    results['f_score'] = results['profitability_score'] + results['leverage_liquidity_score'] + results['operating_efficiency_score']
+
+    if as_frame:
+        return pd.DataFrame(results, index=index)
+
+    return results
+
+def f_scores_from_store(store, period=0, as_frame=True):
+    """
+    Summary:
+    f-score of every ticker in a StatementStore (period vs period + 1).
+    inputs:
+    store (StatementStore): columnar statements.
+    period (int): period to score (0 = latest).
+    as_frame (bool): return a DataFrame indexed by ticker instead of a structured array.
+    """
+    current = {field: store.column(field, period) for field in CURRENT_FIELDS}
+    previous = {field: store.column(field, period + 1) for field in PREVIOUS_FIELDS}
+
+    return f_scores(current, previous, as_frame=as_frame, index=store.tickers if as_frame else None)
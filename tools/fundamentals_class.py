@@ -1,6 +1,23 @@
+import numpy as np
+import pandas as pd
+
+from data.market_data import MarketData, get_market_data
+from data.request_scheduler import INTERACTIVE, get_scheduler
+from data.statement_store import FIELDS, periods, read_field, read_history
+from tools import dcf_kernel
+from tools.credit_rating import LARGE_CAP
+from tools.f_score import f_scores, CONDITIONS, CURRENT_FIELDS, PREVIOUS_FIELDS, SCORES
+from tools import plotting
+from tools.instrumentation import FETCH, Instrumentation
+from tools.monte_carlo import simulate
+from tools.pipeline import Pipeline, Stage
+from tools.reverse_dcf import implied_growth
+from tools.sensitivity import implied_share_price_grid, summarize
+from tools.sensitivity_tensor import sensitivity_tensor
+
 class Fundamentals:
     
-    def __init__(self, income_statement, balance_sheet_statement, balance_sheet_statement_quarterly, cash_flow_statement, enterprise_value, financial_ratios, company_ticker, forecasting_period, api_key):
+    def __init__(self, income_statement, balance_sheet_statement, balance_sheet_statement_quarterly, cash_flow_statement, enterprise_value, financial_ratios, company_ticker, forecasting_period, api_key, market_data=None, rating_table=LARGE_CAP, beta=None, quiet=False, exporters=None, ttm=None, priority=INTERACTIVE):
         """
         Summary:
         Reads data from financial statements and calculates a DCF valuation.
@@ -14,6 +31,17 @@ class Fundamentals:
         company_ticker (str): e.g. 'AAPL' for Apple inc.
         forecasting_period (float/int): number of years to forecast.
         api_key (str): 'financialmodelingprep' secret api key.
+        market_data (MarketData): risk-free-rate and index return shared by every company in a run.
+                                  If None, it is loaded from FRED once per day and reused (see data/market_data.py).
+        rating_table (RatingTable): interest-coverage-ratio to credit spread table, e.g. credit_rating.SMALL_CAP.
+        beta (float/dict): company's beta, or betas by ticker (e.g. tools.beta.estimate_betas(...)['beta']).
+                           If None (or the ticker has no beta), it is fetched from the 'financialmodelingprep' company profile.
+        quiet (bool): if True, nothing is formatted or printed, results are only stored in attributes/returned.
+        exporters (list): instrumentation exporters receiving the timing of every stage, e.g. [MemoryExporter()]
+                          (see tools/instrumentation.py). Aggregated timings are always in self.instrumentation.
+        ttm (dict): trailing-twelve-month figures {field: values by trailing year} replacing the annual ones,
+                    e.g. QuarterlyIngestor.ttm(ticker) (see data/quarterly.py). Fields left out stay annual.
+        priority (int): request_scheduler.INTERACTIVE or BATCH, priority of the beta lookup (see data/request_scheduler.py).
         """
         
         self.inc = income_statement
@@ -25,7 +53,143 @@ class Fundamentals:
         self.ticker = company_ticker
         self.forecasting_period = forecasting_period
         self._api_key = api_key
+        self.market_data = market_data
+        self.rating_table = rating_table
+        if beta is not None and not np.isscalar(beta):
+            beta = beta.get(company_ticker)
+        #missing (None) and NaN betas are looked up later, as in tools.reverse_dcf._betas()
+        self._beta = None if (beta is None or np.isnan(float(beta))) else float(beta)
+        self.quiet = quiet
+        self.instrumentation = Instrumentation(exporters, ticker = company_ticker)
+        self._store = None
+        self._pipeline = None
+        self._ttm = ttm
+        self.priority = priority
+    
+    @classmethod
+    def from_store(cls, store, company_ticker, forecasting_period, api_key, market_data=None, rating_table=LARGE_CAP, beta=None, quiet=False, exporters=None, ttm=None, priority=INTERACTIVE):
+        """
+        Summary:
+        Creates the object from a columnar StatementStore (see data/statement_store.py) instead of json statements.
+        inputs:
+        store (StatementStore): store holding company_ticker.
+        company_ticker (str), forecasting_period (int), api_key (str), market_data (MarketData), rating_table (RatingTable), beta (float/dict),
+        quiet (bool), exporters (list), ttm (dict), priority (int): as in __init__.
+        """
+        company = cls(None, None, None, None, None, None, company_ticker, forecasting_period, api_key, market_data, rating_table, beta, quiet, exporters, ttm, priority)
+        company._store = store
+        return company
     
+    def _field(self, field, period=0):
+        """
+        Summary:
+        Reads a statement field (see data.statement_store.FIELDS) for a period (0 = latest),
+        from the trailing-twelve-month figures, the StatementStore or the json statements (in this order).
+        """
+        if self._ttm is not None and field in self._ttm and period < len(self._ttm[field]):
+            return float(self._ttm[field][period])
+
+        if self._store is not None:
+            return self._store.value(field, self.ticker, period)
+        
+        return read_field(getattr(self, FIELDS[field][0]), field, period)
+    
+    def _pipeline_stages(self):
+        """
+        Summary:
+        Stages of the DCF, from the statements and inputs to the implied share price (see tools/pipeline.py).
+        Each stage only depends on the inputs it names, so e.g. a new perpetual_growth_rate reuses the WACC
+        and the free-cash-flow projection, and new market data leaves the statement-only stages untouched.
+        The statements are read once per stage and assumed not to change after the object is created.
+        """
+        def interest_coverage_ratio():
+            EBIT = self._field('inc.ebitda') - self._field('inc.depreciationAndAmortization')
+            return EBIT / self._field('inc.interestExpense')
+
+        def risk_free_rate(market_data):
+            return market_data.risk_free_rate
+
+        def credit(interest_coverage_ratio, risk_free_rate, rating_table):
+            #Rating and credit spread from the breakpoint table (see tools/credit_rating.py)
+            rating, credit_spread = rating_table.lookup(interest_coverage_ratio)
+            return str(rating), risk_free_rate + float(credit_spread)
+
+        def beta(known_beta):
+            if known_beta is not None:
+                return float(known_beta)
+            beta = get_scheduler().get_json(f'https://financialmodelingprep.com/api/v3/company/profile/{self.ticker}?apikey={self._api_key}', self.priority)
+            return float(beta['profile']['beta'])
+
+        def capm(risk_free_rate, beta, market_data):
+            return risk_free_rate+(beta*(market_data.index_return - risk_free_rate))
+
+        def capital_structure():
+            total_debt = self._field('bsq.totalDebt')
+            equity = self._field('bsq.totalStockholdersEquity')
+            #effective tax rate, debt proportion, equity proportion
+            return self._field('fr.effectiveTaxRate'), total_debt / (total_debt + equity), equity / (total_debt + equity)
+
+        def wacc(credit, capm, capital_structure):
+            effective_tax_rate, dp, ep = capital_structure
+            return (credit[1]*(1-effective_tax_rate)*dp) + (capm*ep)
+
+        def base_year():
+            return (float(self._field('inc.ebitda') - self._field('inc.depreciationAndAmortization')),
+                    self._field('cf.depreciationAndAmortization'),
+                    self._field('cf.changeInWorkingCapital'),
+                    self._field('cf.capitalExpenditure'))
+
+        def fcf_projection(base_year, capital_structure, earnings_growth_rate, cap_ex_growth_rate, wacc, forecasting_period):
+            return dcf_kernel.project_free_cash_flows(*base_year,
+                                                      tax_rate = capital_structure[0],
+                                                      earnings_growth_rate = earnings_growth_rate,
+                                                      cap_ex_growth_rate = cap_ex_growth_rate,
+                                                      wacc = wacc,
+                                                      forecasting_period = forecasting_period)
+
+        def enterprise_value(fcf_projection, perpetual_growth_rate, wacc, forecasting_period):
+            return dcf_kernel.discount_terminal_value(fcf_projection, perpetual_growth_rate, wacc, forecasting_period)
+
+        def net_debt():
+            return self._field('ev.totalDebt'), self._field('ev.cash'), self._field('ev.numberOfShares')
+
+        def equity_value(enterprise_value, net_debt):
+            equity, share_price = dcf_kernel.equity_value(float(enterprise_value['enterprise_value']), *net_debt)
+            return equity, share_price
+
+        return [Stage('interest_coverage_ratio', interest_coverage_ratio),
+                Stage('risk_free_rate', risk_free_rate, ['market_data']),
+                Stage('credit', credit, ['interest_coverage_ratio', 'risk_free_rate', 'rating_table']),
+                Stage('beta', beta, ['known_beta'], kind = FETCH),
+                Stage('capm', capm, ['risk_free_rate', 'beta', 'market_data']),
+                Stage('capital_structure', capital_structure),
+                Stage('wacc', wacc, ['credit', 'capm', 'capital_structure']),
+                Stage('base_year', base_year),
+                Stage('fcf_projection', fcf_projection, ['base_year', 'capital_structure', 'earnings_growth_rate',
+                                                         'cap_ex_growth_rate', 'wacc', 'forecasting_period']),
+                Stage('enterprise_value', enterprise_value, ['fcf_projection', 'perpetual_growth_rate', 'wacc', 'forecasting_period']),
+                Stage('net_debt', net_debt),
+                Stage('equity_value', equity_value, ['enterprise_value', 'net_debt'])]
+
+    @property
+    def pipeline(self):
+        """
+        Summary:
+        Memoized stage graph of the DCF, created on first use.
+        """
+        if self._pipeline is None:
+            self._pipeline = Pipeline(self._pipeline_stages(), hook = self.instrumentation.record)
+        return self._pipeline
+
+    def _set_market_inputs(self):
+        if self.market_data is None:
+            with self.instrumentation.stage('market_data', FETCH):
+                self.market_data = get_market_data()
+        self.pipeline.set(market_data = self.market_data,
+                          rating_table = self.rating_table,
+                          known_beta = self._beta,
+                          forecasting_period = self.forecasting_period)
+
     def _get_interest_coverage_and_risk_free_rate(self):
         """
         Summary:
@@ -34,23 +198,17 @@ class Fundamentals:
         risk_free_rate (float): Assumed risk-free-rate (based on US 1-Year treasury bonds)
         interest_coverage_ratio (float): interest coverage ratio = EBIT/interest_expense
         """
-        
-        #EBIT
-        EBIT = self.inc[0]['ebitda'] - self.inc[0]['depreciationAndAmortization'] 
+        self._set_market_inputs()
 
-        #Interest Coverage
-        interest_expense = self.inc[0]['interestExpense']
-        self.interest_coverage_ratio = EBIT / interest_expense
+        #Interest Coverage = EBIT/interest_expense
+        self.interest_coverage_ratio = self.pipeline.get('interest_coverage_ratio')
 
         #Risk-free rate
-        start = datetime.datetime(2019, 7, 10)
-        end= datetime.datetime.today().strftime('%Y-%m-%d')
+        self.risk_free_rate = self.pipeline.get('risk_free_rate')
         
-        Treasury = web.DataReader(['TB1YR'], 'fred', start, end)
-        self.risk_free_rate = float(Treasury.iloc[-1])/100
-        
-        print(f"Interest coverage ratio: {round(self.interest_coverage_ratio,4)}")
-        print(f"Risk free rate: {round(self.risk_free_rate,4)}")
+        if not self.quiet:
+            print(f"Interest coverage ratio: {round(self.interest_coverage_ratio,4)}")
+            print(f"Risk free rate: {round(self.risk_free_rate,4)}")
         
     def _get_cost_of_debt(self):
         """
@@ -62,57 +220,11 @@ class Fundamentals:
         rfr = risk-free-rate
         cs = credit-spread (calculated using interest-coverage-ratio)
         """
-        if self.interest_coverage_ratio > 8.5:
-            #Rating is AAA
-            credit_spread = 0.0063
-        elif (self.interest_coverage_ratio > 6.5) & (self.interest_coverage_ratio <= 8.5):
-            #Rating is AA
-            credit_spread = 0.0078
-        elif (self.interest_coverage_ratio > 5.5) & (self.interest_coverage_ratio <=  6.5):
-            #Rating is A+
-            credit_spread = 0.0098
-        elif (self.interest_coverage_ratio > 4.25) & (self.interest_coverage_ratio <=  5.49):
-            #Rating is A
-            credit_spread = 0.0108
-        elif (self.interest_coverage_ratio > 3) & (self.interest_coverage_ratio <=  4.25):
-            #Rating is A-
-            credit_spread = 0.0122
-        elif (self.interest_coverage_ratio > 2.5) & (self.interest_coverage_ratio <=  3):
-            #Rating is BBB
-            credit_spread = 0.0156
-        elif (self.interest_coverage_ratio > 2.25) & (self.interest_coverage_ratio <=  2.5):
-            #Rating is BB+
-            credit_spread = 0.02
-        elif (self.interest_coverage_ratio > 2) & (self.interest_coverage_ratio <=  2.25):
-            #Rating is BB
-            credit_spread = 0.0240
-        elif (self.interest_coverage_ratio > 1.75) & (self.interest_coverage_ratio <=  2):
-            #Rating is B+
-            credit_spread = 0.0351
-        elif (self.interest_coverage_ratio > 1.5) & (self.interest_coverage_ratio <=  1.75):
-            #Rating is B
-            credit_spread = 0.0421
-        elif (self.interest_coverage_ratio > 1.25) & (self.interest_coverage_ratio <=  1.5):
-            #Rating is B-
-            credit_spread = 0.0515
-        elif (self.interest_coverage_ratio > 0.8) & (self.interest_coverage_ratio <=  1.25):
-            #Rating is CCC
-            credit_spread = 0.0820
-        elif (self.interest_coverage_ratio > 0.65) & (self.interest_coverage_ratio <=  0.8):
-            #Rating is CC
-            credit_spread = 0.0864
-        elif (self.interest_coverage_ratio > 0.2) & (self.interest_coverage_ratio <=  0.65):
-            #Rating is C
-            credit_spread = 0.1134
-        elif self.interest_coverage_ratio <=  0.2:
-            #Rating is D
-            credit_spread = 0.1512
-        else:
-            credit_spread = 0.1512
-
-        self.cost_of_debt = self.risk_free_rate + credit_spread
+        self._set_market_inputs()
+        self.credit_rating, self.cost_of_debt = self.pipeline.get('credit')
         
-        print(f"Cost of debt: {round(self.cost_of_debt,4)}")
+        if not self.quiet:
+            print(f"Cost of debt: {round(self.cost_of_debt,4)}")
     
     def _get_cost_of_equity(self):
         """
@@ -122,23 +234,15 @@ class Fundamentals:
         capm (float) = rfr + beta*(iar-rfr)
         Where:
         rfr = risk-free-rate
-        beta = company's beta value
+        beta = company's beta value (given, or fetched once per object)
         iar = index-annual-return
         """
-        #Beta
-        beta = requests.get(f'https://financialmodelingprep.com/api/v3/company/profile/{self.ticker}?apikey={self._api_key}').json()
-        beta = float(beta['profile']['beta'])
-
-        #Market Return
-        start = datetime.datetime(2019, 7, 10)
-        end = datetime.datetime.today().strftime('%Y-%m-%d')
-        SP500 = web.DataReader(['sp500'], 'fred', start, end)
-        SP500.dropna(inplace = True)
-        SP500yearlyreturn = (SP500['sp500'].iloc[-1]/SP500['sp500'].iloc[-252]) - 1
-
-        self.capm = self.risk_free_rate+(beta*(SP500yearlyreturn - self.risk_free_rate))
+        self._set_market_inputs()
+        self.beta = self.pipeline.get('beta')
+        self.capm = self.pipeline.get('capm')
         
-        print(f"CAPM: {round(self.capm,4)}")
+        if not self.quiet:
+            print(f"CAPM: {round(self.capm,4)}")
     
     def _get_wacc(self):
         """
@@ -153,16 +257,12 @@ class Fundamentals:
         dp -- proportion of company structure attributable to debt
         ep -- proportion of company structure attributable to equity
         """
-        #effective tax rate
-        self.effective_tax_rate = float(self.fr['ratios'][0]['profitabilityIndicatorRatios']['effectiveTaxRate'])
-        #capital structure debt proportion
-        dp = self.bsq[0]['totalDebt'] / (self.bsq[0]['totalDebt'] + self.bsq[0]['totalStockholdersEquity'])
-        #capital structure equity proportion
-        ep = self.bsq[0]['totalStockholdersEquity'] / (self.bsq[0]['totalDebt'] + self.bsq[0]['totalStockholdersEquity'])
-        #wacc calculation
-        self.wacc = (self.cost_of_debt*(1-self.effective_tax_rate)*dp) + (self.capm*ep)
+        self._set_market_inputs()
+        self.effective_tax_rate = self.pipeline.get('capital_structure')[0]
+        self.wacc = self.pipeline.get('wacc')
         
-        print(f"WACC: {round(self.wacc,4)}")
+        if not self.quiet:
+            print(f"WACC: {round(self.wacc,4)}")
     
     def _get_enterprise_value(self, earnings_growth_rate, cap_ex_growth_rate, perpetual_growth_rate):
         """
@@ -186,41 +286,22 @@ class Fundamentals:
         self.eg = earnings_growth_rate
         self.cxg = cap_ex_growth_rate
 
-        ebit = float(self.inc[0]['ebitda'] - self.inc[0]['depreciationAndAmortization'])
-        non_cash_charges = float(self.cf[0]['depreciationAndAmortization'])
-        cwc = float(self.cf[0]['changeInWorkingCapital'])
-        cap_ex = float(self.cf[0]['capitalExpenditure'])
-        
-        ulfcf = ebit * (1-self.effective_tax_rate) + non_cash_charges + cwc + cap_ex
-        #store a list of each cash flow and discount appropriately
-        self.npv_fcf_list = [ulfcf]
-
-        for yr in range(1, self.forecasting_period+1):    
-
-            # increment each value by growth rate
-            ebit = ebit * (1 + (yr * self.eg))
-            non_cash_charges = non_cash_charges * (1 + (yr * self.eg))
-            cap_ex = cap_ex * (1 + (yr * self.cxg))  
-            cwc = cwc*0.7
-            
-            #calculate new fcf
-            ulfcf = ebit * (1-self.effective_tax_rate) + non_cash_charges + cwc + cap_ex
-
-            # discount by WACC
-            PV_flow = ulfcf/((1 + self.wacc)**yr)
-            self.npv_fcf_list.append(PV_flow)
-        
-        self.npv_fcf_sum = sum(self.npv_fcf_list)
-        #Terminal value via the perpetual-growth method
-        final_cashflow = self.npv_fcf_list[-1] * (1 + self.g)
+        self._set_market_inputs()
+        self.pipeline.set(earnings_growth_rate = self.eg,
+                          cap_ex_growth_rate = self.cxg,
+                          perpetual_growth_rate = self.g)
         
-        TV = final_cashflow/(self.wacc - self.g)
+        #project and discount the free-cash-flows, then add the terminal value (see tools/dcf_kernel.py)
+        forecast = self.pipeline.get('enterprise_value')
         
-        NPV_TV = TV/(1+self.wacc)**(1+self.forecasting_period)
+        #store a list of each cash flow discounted appropriately
+        self.npv_fcf_list = forecast['pv_fcf'].tolist()
+        self.npv_fcf_sum = float(forecast['npv_fcf_sum'])
         #enterprise value calculation
-        self.enterprise_value = NPV_TV + self.npv_fcf_sum
+        self.enterprise_value = float(forecast['enterprise_value'])
         
-        print(f"Enterprise_value: {round(self.enterprise_value,4)}")
+        if not self.quiet:
+            print(f"Enterprise_value: {round(self.enterprise_value,4)}")
     
     def _get_equity_value(self):
         """
@@ -231,13 +312,10 @@ class Fundamentals:
                   'implied share price': float}
         """
         #get values for enterprise-value to equity-value calculation
-        self.debt = float(self.ev['enterpriseValues'][0]['+ Total Debt'])
-        self.cash = float(self.ev['enterpriseValues'][0]['- Cash & Cash Equivalents'])
-        self.number_of_shares = float(self.ev['enterpriseValues'][0]['Number of Shares'])
+        self.debt, self.cash, self.number_of_shares = self.pipeline.get('net_debt')
 
-        self.equity_value = self.enterprise_value-self.debt+self.cash
-        #intrinsic value per share
-        self.share_price = self.equity_value/self.number_of_shares
+        #equity value and intrinsic value per share
+        self.equity_value, self.share_price = self.pipeline.get('equity_value')
 
         return {'equity value':self.equity_value, 
                 'share_price':round(self.share_price,4)}
@@ -255,17 +333,305 @@ class Fundamentals:
         Enterprise Value	
         {'equity value':float, 'share price':float}	
         """	
-        print("***********************************************\n")	
-        print("DCF Calculation:\n")	
+        if not self.quiet:
+            print("***********************************************\n")
+            print("DCF Calculation:\n")
         self._get_interest_coverage_and_risk_free_rate()	
         self._get_cost_of_debt()	
         self._get_cost_of_equity()	
         self._get_wacc()	
         self._get_enterprise_value(earnings_growth_rate, cap_ex_growth_rate, perpetual_growth_rate)	
-        self._get_equity_value()	
+        self._get_equity_value()
         return
+
+    def what_if(self, earnings_growth_rate=None, cap_ex_growth_rate=None, perpetual_growth_rate=None, market_data=None):
+        """
+        Summary:
+        Re-values the company with some inputs changed, without printing or changing the dcf() attributes
+        and inputs (raises ValueError before dcf()).
+        Only the stages downstream of the changed inputs are recomputed, e.g. a new perpetual_growth_rate
+        reuses the WACC and the free-cash-flow projection of the last dcf().
+        Inputs:
+        earnings_growth_rate, cap_ex_growth_rate, perpetual_growth_rate -- (float) defaults to the last dcf() inputs.
+        market_data -- (MarketData) defaults to the market data of the object.
+        Returns:
+        (dict) = {'wacc': float, 'enterprise value': float, 'equity value': float, 'share_price': float}
+        """
+        if not hasattr(self, 'eg'):
+            raise ValueError("what_if() re-values the last dcf(), run dcf() first")
+
+        pipeline = self.pipeline
+        self._set_market_inputs()
+        #the inputs of the last dcf() are restored afterwards, so later stage calls still see them
+        saved = {name: pipeline.inputs[name] for name in ('earnings_growth_rate', 'cap_ex_growth_rate', 'perpetual_growth_rate', 'market_data')}
+        try:
+            pipeline.set(earnings_growth_rate = self.eg if earnings_growth_rate is None else earnings_growth_rate,
+                         cap_ex_growth_rate = self.cxg if cap_ex_growth_rate is None else cap_ex_growth_rate,
+                         perpetual_growth_rate = self.g if perpetual_growth_rate is None else perpetual_growth_rate)
+            if market_data is not None:
+                pipeline.set(market_data = market_data)
+
+            equity_value, share_price = pipeline.get('equity_value')
+
+            return {'wacc': pipeline.get('wacc'),
+                    'enterprise value': float(pipeline.get('enterprise_value')['enterprise_value']),
+                    'equity value': equity_value,
+                    'share_price': share_price}
+        finally:
+            pipeline.set(**saved)
+
+    def implied_growth(self, solve_for='earnings_growth_rate', market_price=None, **kwargs):
+        """
+        Summary:
+        Reverse DCF: the growth rate at which the implied share price of the last dcf() equals the market
+        price, keeping its wacc and other growth rates (see tools/reverse_dcf.py, kwargs are passed to
+        implied_growth(), e.g. bracket).
+        Inputs:
+        solve_for -- (str) 'earnings_growth_rate' or 'perpetual_growth_rate'.
+        market_price -- (float) defaults to the stock price of the enterprise-value statement.
+        Returns:
+        (dict) = {solve_for: float, 'converged': bool, 'iterations': int, 'residual': float, 'bracketed': bool}
+        """
+        market_price = self._field('ev.stockPrice') if market_price is None else market_price
+        inputs = dict(self._base_inputs(), wacc = self.wacc)
+
+        with self.instrumentation.stage('implied_growth'):
+            solution = implied_growth(inputs, market_price, solve_for,
+                                      earnings_growth_rate = self.eg,
+                                      cap_ex_growth_rate = self.cxg,
+                                      perpetual_growth_rate = self.g,
+                                      **kwargs)
+
+        solution = {name: values[0].item() for name, values in solution.items()}
+        if not self.quiet:
+            print(f"Implied {solve_for}: {round(solution[solve_for],4)} ({'converged' if solution['converged'] else 'not converged'} after {solution['iterations']} iterations)")
+        return solution
+
+    def save_result(self, store, as_of=None, grids=None):
+        """
+        Summary:
+        Appends the results of the last dcf() (and sensitivity() if it was run) to a result store, so they can
+        be queried later without re-running the model (see data/result_store.py).
+        Inputs:
+        store -- (ResultStore) store to write to.
+        as_of -- (str) date of the valuation, defaults to the date of the market data.
+        grids -- (dict) extra {name: array or (array, {axis: values})} to store with the valuation.
+        Returns:
+        (dict) = the index record of the valuation.
+        """
+        params = {'earnings_growth_rate': self.eg,
+                  'cap_ex_growth_rate': self.cxg,
+                  'perpetual_growth_rate': self.g,
+                  'forecasting_period': self.forecasting_period,
+                  'market_data': self.market_data.to_dict(),
+                  'beta': self._beta}
+        metrics = {'wacc': self.wacc,
+                   'cost_of_debt': self.cost_of_debt,
+                   'capm': self.capm,
+                   'beta': self.beta,
+                   'enterprise_value': self.enterprise_value,
+                   'equity_value': self.equity_value,
+                   'share_price': self.share_price,
+                   'npv_fcf_sum': self.npv_fcf_sum,
+                   'debt': self.debt,
+                   'cash': self.cash,
+                   'number_of_shares': self.number_of_shares}
+
+        all_grids = {}
+        if getattr(self, 'sensitivity_grid', None) is not None:
+            all_grids['sensitivity'] = (self.sensitivity_grid, self.sensitivity_axes)
+        all_grids.update(grids or {})
+
+        return store.add(self.ticker, self.market_data.as_of if as_of is None else as_of, params,
+                         {metric: value for metric, value in metrics.items() if metric in store.metrics},
+                         all_grids)
+
+    def _history(self, field, n_periods):
+        """
+        Summary:
+        Values of a statement field for the n_periods latest periods (newest first, NaN where missing).
+        """
+        if self._store is not None:
+            return self._store.history(field, self.ticker, n_periods)
+
+        return read_history(getattr(self, FIELDS[field][0]), field, n_periods)
+
+    def _history_dates(self, n_periods):
+        if self._store is not None:
+            dates = self._store.dates['inc'][self._store.index[self.ticker]][:n_periods]
+        else:
+            dates = [str(record.get('date', ''))[:10] for record in periods(self.inc, 'inc')[:n_periods]]
+        return list(dates) + ['']*(n_periods - len(dates))
+
+    def history(self, earnings_growth_rate, cap_ex_growth_rate, perpetual_growth_rate, n_periods=None, market_data=None, beta=None, as_frame=True):
+        """
+        Summary:
+        Values the company as of every annual period of the statements in one vectorized pass, e.g. to backtest
+        the intrinsic value against the market price. Period p uses the statements of period p (and p+1 for the
+        f-score) exactly as dcf() uses the latest ones, except that the capital structure is read from the annual
+        balance sheet of the period instead of the latest quarterly one.
+        Inputs:
+        earnings_growth_rate, cap_ex_growth_rate, perpetual_growth_rate -- (float/array) dcf() inputs, one value
+                                                                           or one per period.
+        n_periods -- (int) number of periods, defaults to every period of the income statement.
+        market_data -- (MarketData/list) market data of every period or a list with one per period (newest first),
+                       defaults to the market data of the object.
+        beta -- (float/array) beta of every period or one per period, defaults to the beta of the object.
+        as_frame -- if True, returns a DataFrame indexed by period date instead of a dict of arrays.
+        Returns:
+        Table of the WACC inputs, the projected free-cash-flows, the enterprise/equity value, the implied and
+        market share price and the f-score of every period (the f-score of the oldest period is NaN).
+        """
+        if n_periods is None:
+            if self._store is not None:
+                #store rows are padded to the longest history of any statement
+                n_periods = int(np.count_nonzero(self._store.dates['inc'][self._store.index[self.ticker]] != ''))
+            else:
+                n_periods = len(periods(self.inc, 'inc'))
+
+        #the market data and beta are resolved first, a fetch is recorded as its own stage and not as history time
+        if market_data is None:
+            self._set_market_inputs()
+            market_data = self.market_data
+        if beta is None:
+            self._set_market_inputs()
+            beta = self.pipeline.get('beta')
+
+        with self.instrumentation.stage('history'):
+            if isinstance(market_data, MarketData):
+                market_data = [market_data]*n_periods
+            risk_free_rate = np.array([m.risk_free_rate for m in market_data], dtype='float64')
+            index_return = np.array([m.index_return for m in market_data], dtype='float64')
+
+            field = {name: self._history(name, n_periods) for name in FIELDS}
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                #interest coverage and cost of debt
+                ebit = field['inc.ebitda'] - field['inc.depreciationAndAmortization']
+                interest_coverage_ratio = ebit / field['inc.interestExpense']
+                credit_rating, credit_spread = self.rating_table.lookup(interest_coverage_ratio)
+                cost_of_debt = risk_free_rate + credit_spread
+
+                #cost of equity
+                capm = risk_free_rate + (np.asarray(beta, dtype='float64')*(index_return - risk_free_rate))
+
+                #capital structure and wacc
+                effective_tax_rate = field['fr.effectiveTaxRate']
+                total_debt = field['bs.totalDebt']
+                equity = field['bs.totalStockholdersEquity']
+                dp = total_debt / (total_debt + equity)
+                ep = equity / (total_debt + equity)
+                wacc = (cost_of_debt*(1-effective_tax_rate)*dp) + (capm*ep)
+
+                #free-cash-flow projections and enterprise value of every period
+                forecast = dcf_kernel.forecast(ebit,
+                                               field['cf.depreciationAndAmortization'],
+                                               field['cf.changeInWorkingCapital'],
+                                               field['cf.capitalExpenditure'],
+                                               tax_rate = effective_tax_rate,
+                                               earnings_growth_rate = earnings_growth_rate,
+                                               cap_ex_growth_rate = cap_ex_growth_rate,
+                                               perpetual_growth_rate = perpetual_growth_rate,
+                                               wacc = wacc,
+                                               forecasting_period = self.forecasting_period)
+                equity_value, share_price = dcf_kernel.equity_value(forecast['enterprise_value'],
+                                                                    field['ev.totalDebt'],
+                                                                    field['ev.cash'],
+                                                                    field['ev.numberOfShares'])
+
+                #f-score of period p against period p+1
+                current = {name: field[name] for name in CURRENT_FIELDS}
+                previous = {name: np.append(field[name][1:], np.nan) for name in PREVIOUS_FIELDS}
+                scores = f_scores(current, previous)
+                has_previous = ~np.isnan(previous['fr.returnOnAssets'])
+
+                market_price = field['ev.stockPrice']
+                results = {'date': np.array(self._history_dates(n_periods)),
+                           'interest_coverage_ratio': interest_coverage_ratio,
+                           'credit_rating': np.asarray(credit_rating),
+                           'risk_free_rate': risk_free_rate,
+                           'cost_of_debt': cost_of_debt,
+                           'capm': capm,
+                           'effective_tax_rate': effective_tax_rate,
+                           'wacc': wacc}
+                for yr in range(forecast['pv_fcf'].shape[-1]):
+                    results[f'pv_fcf_{yr}'] = forecast['pv_fcf'][:, yr]
+                results.update({'npv_fcf_sum': forecast['npv_fcf_sum'],
+                                'npv_terminal_value': forecast['npv_terminal_value'],
+                                'enterprise_value': forecast['enterprise_value'],
+                                'equity_value': equity_value,
+                                'share_price': share_price,
+                                'market_price': market_price,
+                                'upside': share_price/market_price - 1})
+                for score in SCORES:
+                    results[score] = np.where(has_previous, scores[score], np.nan)
+
+        if as_frame:
+            dates = results.pop('date')
+            return pd.DataFrame(results, index = pd.Index(dates, name = 'date'))
+
+        return results
+
+    def _base_inputs(self):
+        """
+        Summary:
+        Base-year inputs of the last dcf(), used to evaluate many scenarios at once.
+        """
+        return {'ebit': float(self._field('inc.ebitda') - self._field('inc.depreciationAndAmortization')),
+                'non_cash_charges': self._field('cf.depreciationAndAmortization'),
+                'cwc': self._field('cf.changeInWorkingCapital'),
+                'cap_ex': self._field('cf.capitalExpenditure'),
+                'tax_rate': self.effective_tax_rate,
+                'debt': self.debt,
+                'cash': self.cash,
+                'number_of_shares': self.number_of_shares,
+                'forecasting_period': self.forecasting_period}
+
+    def monte_carlo(self, n_scenarios=1000000, distributions=None, correlation=None, seed=None, memory_budget=64*1024**2, quantiles=(0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99), bins=1000):
+        """
+        Summary:
+        Monte Carlo valuation around the last dcf() (run dcf() first).
+        Draws joint scenarios of earnings growth, cap-ex growth, g and WACC and reports the
+        distribution of the implied share price (see tools/monte_carlo.py).
+        Inputs:
+        n_scenarios -- (int) number of scenarios.
+        distributions -- (dict) {parameter: spec}, e.g. {'wacc': ('normal', 0.08, 0.01)}, see tools.monte_carlo.PARAMETERS.
+                         Parameters left out are drawn from a normal distribution centred on the dcf() inputs
+                         (standard deviation of 25% for the growth rates and 10% for WACC).
+        correlation -- (ndarray/dict) correlation of the parameters, e.g. {('earnings_growth_rate', 'cap_ex_growth_rate'): 0.5}
+        seed -- (int) seed for reproducible draws.
+        memory_budget -- (int) bytes used per chunk of scenarios.
+        Returns:
+        (dict) = {'scenarios', 'valid', 'mean', 'std', 'min', 'max', 'quantiles', 'histogram', 'seed'}
+        """
+        defaults = {'earnings_growth_rate': ('normal', self.eg, 0.25*abs(self.eg)),
+                    'cap_ex_growth_rate': ('normal', self.cxg, 0.25*abs(self.cxg)),
+                    'perpetual_growth_rate': ('normal', self.g, 0.25*abs(self.g)),
+                    'wacc': ('normal', self.wacc, 0.1*self.wacc)}
+        if distributions is not None:
+            defaults.update(distributions)
+
+        with self.instrumentation.stage('monte_carlo'):
+            self.monte_carlo_results = simulate(self._base_inputs(), defaults,
+                                                n_scenarios = n_scenarios,
+                                                correlation = correlation,
+                                                seed = seed,
+                                                memory_budget = memory_budget,
+                                                bins = bins,
+                                                quantiles = quantiles)
+        
+        if not self.quiet:
+            print("***********************************************\n")
+            print("Monte Carlo implied share price summary\n")
+            print(f"Scenarios: {self.monte_carlo_results['valid']} valid of {n_scenarios}")
+            print(f"Mean: ${round(self.monte_carlo_results['mean'],2)}")
+            for q, price in self.monte_carlo_results['quantiles'].items():
+                print(f"Quantile {q}: ${round(price,2)}")
+            print("***********************************************\n")
+        
+        return self.monte_carlo_results
     
-    def sensitivity(self, confidence_intervals = 0.9, bound = 0.4, plot=True):
+    def sensitivity(self, confidence_intervals = 0.9, bound = 0.4, plot=True, grid_size=None, as_frame=False, plot_path=None):
         """
         Summary:
         Performs sensitivity analysis on WACC and g values.
@@ -274,221 +640,210 @@ class Fundamentals:
         confidence_intervals -- (list/float) A list of all of the confidence intervals at which to perform the sensitivity analysis.
         bound -- (float) Determines the range of WACC and g values. (0 < bound < 1)
         plot -- if True, returns a plot of all the implied share prices for varying WACC, g values.
+        grid_size -- (int) number of WACC and g values in the grid, if None steps of WACC/100 and g/100 are used.
+        as_frame -- if True, returns the grid as a DataFrame (index WACC, columns g) instead of an ndarray.
+        plot_path -- if given (or in headless mode, see tools/plotting.py), the plots are written to this file
+                     by a background renderer instead of being shown.
         
         Returns:
         Summary of sensitivity analysis
         Plots demonstrating the distribution of implied share prices
+        Grid of implied share prices, rows: WACC values, columns: g values
+        In quiet mode an invalid bound or confidence interval raises ValueError instead of being printed.
         """
         #Ensure that the bound is in the desired range.
         if (0 < bound < 1):
             #Define a range for the WACC
             wacc_lower_bound = self.wacc*(round(1-bound,4))
             wacc_upper_bound = self.wacc*(round(1+bound,4))
-            wacc_step = self.wacc/100    
-            wacc_range = np.arange(wacc_lower_bound, wacc_upper_bound, wacc_step)
 
             #Define a range for the long-term growth rate
             g_lower_bound = self.g*(round(1-bound,4))
             g_upper_bound = self.g*(round(1+bound,4))
-            g_step = self.g/100
-            g_range = np.arange(g_lower_bound, g_upper_bound, g_step)
+
+            if grid_size is None:
+                wacc_range = np.arange(wacc_lower_bound, wacc_upper_bound, self.wacc/100)
+                g_range = np.arange(g_lower_bound, g_upper_bound, self.g/100)
+            else:
+                wacc_range = np.linspace(wacc_lower_bound, wacc_upper_bound, grid_size, endpoint=False)
+                g_range = np.linspace(g_lower_bound, g_upper_bound, grid_size, endpoint=False)
         
         else:
+            if self.quiet:
+                raise ValueError("Ensure that 0 < bound < 1")
             print("Ensure that 0 < bound < 1 ")
             return
         
-        #Create a function that calculates the implied share price for each wacc, g combination
-        def implied_share_price(wacc, g):
-            
-            last = self.npv_fcf_list[-1]
-            npv_tv = ((last*(1+g))/(wacc-g)) / ((1+wacc)**len(self.npv_fcf_list))
-            ev = float(self.npv_fcf_sum + npv_tv)
-            equity_value = ev-self.debt+self.cash
-            share_price = equity_value/self.number_of_shares
-        
-            return share_price
-        
-        #Store each combination and the associated implied share price as tuples in a list
-        ev_list = [(round(i,2),round(j,5),implied_share_price(i,j)) for j in g_range for i in wacc_range]
-     
-        #From this list, create a dataframe to store all of these values
-        ev_df = pd.DataFrame(ev_list, columns = ['WACC','perpetual (g)','Implied share price'])
+        with self.instrumentation.stage('sensitivity'):
+            #Evaluate the implied share price of every wacc, g combination at once
+            grid = implied_share_price_grid(wacc_range, g_range,
+                                            last_flow = self.npv_fcf_list[-1],
+                                            npv_fcf_sum = self.npv_fcf_sum,
+                                            n_flows = len(self.npv_fcf_list),
+                                            debt = self.debt,
+                                            cash = self.cash,
+                                            number_of_shares = self.number_of_shares)
+        
+            #Summary statistics and every confidence interval from a single partial sort
+            try:
+                summary = summarize(grid, confidence_intervals, quantiles = (0.05, 0.25, 0.75, 0.95) if plot else ())
+            except ValueError as e:
+                if self.quiet:
+                    raise
+                print(e)
+                return
         
-        #Convert the dataframe into a pivot table to better representation
-        ev_piv = ev_df.pivot_table(values='Implied share price',index='WACC',columns='perpetual (g)')
+        self.sensitivity_grid = grid
+        self.sensitivity_axes = {'wacc': wacc_range, 'perpetual_growth_rate': g_range}
+        self.sensitivity_summary = summary
         
         #Start printing the results of the sensitivity analysis
-        print("***********************************************\n")
-        print("Implied share price sensitivity analysis summary\n")
+        if not self.quiet:
+            print("***********************************************\n")
+            print("Implied share price sensitivity analysis summary\n")
         
-        print(f"Wacc range: {round(wacc_lower_bound,2)} : {round(wacc_upper_bound,2)}")
-        print(f"Perpetual growth range: {round(g_lower_bound,2)} : {round(g_upper_bound,2)}\n")
+            print(f"Wacc range: {round(wacc_lower_bound,2)} : {round(wacc_upper_bound,2)}")
+            print(f"Perpetual growth range: {round(g_lower_bound,2)} : {round(g_upper_bound,2)}\n")
         
-        print(f"Minimum: ${round(ev_df['Implied share price'].min(),2)}")
-        print(f"Maximum: ${round(ev_df['Implied share price'].max(),2)}")
-        print(f"Mean: ${round(ev_df['Implied share price'].mean(),2)}")
-        print(f"Median: ${round(ev_df['Implied share price'].median(),2)}\n")
+            print(f"Minimum: ${round(summary['min'],2)}")
+            print(f"Maximum: ${round(summary['max'],2)}")
+            print(f"Mean: ${round(summary['mean'],2)}")
+            print(f"Median: ${round(summary['median'],2)}\n")
         
-        #For each confidence interval, calculate a range of implied share price
-        #Ensure that each confidence interval is within the desired range.
-        for i in confidence_intervals:
-            
-            if (0 < i < 1):
-                #define bounds for the range of values
-                significance_level = (1-i)/2
-
-                lower_bound = round(significance_level,4)
-                lower_price = ev_df['Implied share price'].quantile(lower_bound)
-
-                upper_bound = round(1-significance_level,4)
-                upper_price = ev_df['Implied share price'].quantile(upper_bound)
-                #print the results
+            for i, (lower_price, upper_price) in summary['bands'].items():
                 print(f"At confidence level {i}:")
                 print(f"Intrinsic share price range: ${round(lower_price,4)} : ${round(upper_price,4)}\n")
-            
-            else:
-                print("Ensure that for i in confidence_intervals: 0 < i < 1")
-                return
         
-        print("***********************************************\n")
-        #plot the results with a distplot and a boxplot
+            print("***********************************************\n")
+        
+        #plot the distribution of the results with a histogram and a boxplot
         if plot:
-            g1 = sns.distplot(ev_df['Implied share price'], norm_hist=True, axlabel = 'Implied share price', bins=100)
-            plt.xticks(rotation=90)
-            plt.ylabel('Frequency')
-            plt.title('Implied share price with variation of WACC and g')
-            plt.show(g1)
+            quantiles = dict(summary['quantiles'])
+            quantiles[0.5] = summary['median']
+            with self.instrumentation.stage('sensitivity_plot'):
+                stats = plotting.distribution_stats(grid, quantiles, bins=100)
+            
+            if plot_path is None and plotting.HEADLESS:
+                plot_path = f"{self.ticker}_sensitivity.png"
             
-            g2 = sns.boxplot(ev_df['Implied share price'])
-            plt.xticks(rotation=90)
-            plt.title('Implied share price range')
-            plt.show(g2)
+            if plot_path is not None:
+                plotting.get_renderer().submit(stats, plot_path)
+            else:
+                plotting.show_distribution(stats)
         else:
             pass
 
-        print("***********************************************\n")
+        if not self.quiet:
+            print("***********************************************\n")
+        
+        if as_frame:
+            return pd.DataFrame(grid,
+                                index = pd.Index(wacc_range, name = 'WACC'),
+                                columns = pd.Index(g_range, name = 'perpetual (g)'))
         
-        return ev_piv
+        return grid
   
-  def f_score(self):
+    def sensitivity_tensor(self, axes=None, bound=0.4, steps=21, path=None, memory_budget=64*1024**2, confidence_intervals=0.9, dtype='float32'):
+        """
+        Summary:
+        Sensitivity analysis over WACC, g, earnings growth, cap-ex growth and forecasting period at once (run dcf() first).
+        The grid is evaluated in chunks of bounded size and can be written to a memory-mapped array on disk,
+        so grids larger than RAM are feasible (see tools/sensitivity_tensor.py).
+        Inputs:
+        axes -- (dict) {axis: values} for any of tools.sensitivity_tensor.AXES. Rate axes left out span
+                dcf() value*(1 -/+ bound) in steps values, the forecasting period is kept fixed.
+        bound -- (float) range of the default rate axes (0 < bound < 1).
+        steps -- (int) number of values of the default rate axes.
+        path -- (str) optional directory for the prices ('prices.npy') and the axis values and summary ('axes.json').
+        memory_budget -- (int) bytes used per chunk.
+        confidence_intervals -- (list/float) confidence levels of the share price bands.
+        dtype -- dtype of the prices written to disk.
+        Returns:
+        (dict) = summary of the tensor, marginal statistics of every axis value and the memory-mapped prices (if path).
         """
-        Summary: Calculates f1-score based on 9 financial conditions.
+        defaults = {'wacc': self.wacc,
+                    'perpetual_growth_rate': self.g,
+                    'earnings_growth_rate': self.eg,
+                    'cap_ex_growth_rate': self.cxg}
+        tensor_axes = {axis: np.linspace(value*(1-bound), value*(1+bound), steps) for axis, value in defaults.items()}
+        tensor_axes['forecasting_period'] = [self.forecasting_period]
+        if axes is not None:
+            tensor_axes.update(axes)
+
+        with self.instrumentation.stage('sensitivity_tensor'):
+            self.sensitivity_tensor_results = sensitivity_tensor(self._base_inputs(), tensor_axes,
+                                                                 path = path,
+                                                                 memory_budget = memory_budget,
+                                                                 confidence_intervals = confidence_intervals,
+                                                                 dtype = dtype)
+        results = self.sensitivity_tensor_results
+
+        if not self.quiet:
+            print("***********************************************\n")
+            print("Implied share price sensitivity tensor summary\n")
+            for axis, values in results['axes'].items():
+                print(f"{axis}: {len(values)} values, {round(min(values),4)} : {round(max(values),4)}")
+            print(f"\nCells: {results['cells']} ({results['valid']} valid)")
+            print(f"Minimum: ${round(results['min'],2)}")
+            print(f"Maximum: ${round(results['max'],2)}")
+            print(f"Mean: ${round(results['mean'],2)}\n")
+            for i, (lower_price, upper_price) in results['bands'].items():
+                print(f"At confidence level {i}:")
+                print(f"Intrinsic share price range: ${round(lower_price,4)} : ${round(upper_price,4)}\n")
+            print("***********************************************\n")
+
+        return results
+    
+    def f_score(self):
+        """
+        Summary: Calculates f1-score based on 9 financial conditions (see tools/f_score.py for the vectorized version).
         
         Returns:
         dict containing the results.
         """
-        f1_score = 0
-        profitability_score = 0
-        leverage_liquidity_score = 0
-        operating_efficiency_score = 0
-        
-        print("f-score results:\n")
-
-        #profitability conditions
-        
-        #1) Return on Assets (1 point if it is positive in the current year, 0 otherwise)
-        roa = float(self.fr['ratios'][0]['profitabilityIndicatorRatios']['returnOnAssets'])
-        print(f"P1(return_on_assets > 0): {roa}")
-        
-        #2) Operating Cash Flow (1 point if it is positive in the current year, 0 otherwise)
-        opcfps = float(self.fr['ratios'][0]['cashFlowIndicatorRatios']['operatingCashFlowPerShare'])
-        print(f"P2(opCF > 0): {opcfps}")
-        
-        #3) Change in Return of Assets (ROA) (1 point if ROA is higher in the current year compared to the previous one, 0 otherwise)
-        roa_this_year = float(self.fr['ratios'][0]['profitabilityIndicatorRatios']['returnOnAssets'])
-        roa_last_year = float(self.fr['ratios'][1]['profitabilityIndicatorRatios']['returnOnAssets'])
-        roa_change = roa_this_year - roa_last_year
-        print(f"P3(return_on_assets_change > 0): {roa_change}")
-        
-        #4) Accruals (1 point if Operating Cash Flow/Total Assets is higher than ROA in the current year, 0 otherwise)
-        op_ta = float(self.cf[0]['operatingCashFlow'] / self.bs[0]['totalAssets'])
-        print(f"P4(opCF/totalAssets > return_on_assets): {(op_ta, roa)}")
-        
-        #Leverage, liquidity and source of funds conditions
-        
-        #5) Change in Leverage (long-term) ratio (1 point if the ratio is lower this year compared to the previous one, 0 otherwise)
-        ltd_this_year = float(self.bs[0]['longTermDebt']/self.bs[0]['totalDebt'])
-        ltd_last_year = float(self.bs[1]['longTermDebt']/self.bs[1]['totalDebt'])
-        ltd_change = ltd_this_year - ltd_last_year
-        print(f"LL5(long_term_leverage_change < 0): {ltd_change}")
-        
-        #6) Change in Current ratio (1 point if it is higher in the current year compared to the previous one, 0 otherwise)
-        cur_this_year = float(self.bs[0]['totalCurrentAssets']/self.bs[0]['totalCurrentLiabilities'])
-        cur_last_year = float(self.bs[1]['totalCurrentAssets']/self.bs[1]['totalCurrentLiabilities'])
-        cur_change = cur_this_year - cur_last_year
-        print(f"LL6(current_ratio_change > 0): {cur_change}")
-        
-        #7) Change in the number of shares (1 point if no new shares were issued during the last year)
-        shares_this_year = float(self.inc[0]['weightedAverageShsOutDil'])
-        shares_last_year = float(self.inc[1]['weightedAverageShsOutDil'])
-        shares_change = shares_this_year - shares_last_year
-        print(f"LL7(number_of_shares_change == 0): {shares_change}")
-        
-        # Operating efficiency conditions
-        
-        #8) Change in Gross Margin (1 point if it is higher in the current year compared to the previous one, 0 otherwise)
-        gm_this_year = float(self.fr['ratios'][0]['profitabilityIndicatorRatios']['returnOnAssets'])
-        gm_last_year = float(self.fr['ratios'][1]['profitabilityIndicatorRatios']['returnOnAssets'])
-        gm_change = gm_this_year - gm_last_year
-        print(f"OE8(gross_margin_change > 0): {gm_change}")
-        
-        #9) Change in Asset Turnover ratio (1 point if it is higher in the current year compared to the previous one, 0 otherwise)
-        at_this_year = float(self.fr['ratios'][0]['operatingPerformanceRatios']['assetTurnover'])
-        at_last_year = float(self.fr['ratios'][1]['operatingPerformanceRatios']['assetTurnover'])
-        at_change = at_this_year - at_last_year
-        print(f"OE9(asset_turnover_ratio_change > 0): {at_change}")
-        
-        print("\n******************************************************\n")
-        
-        conditions = {'profitability':{
-                                      'profitability1':(roa>0),
-                                      'profitability2':(opcfps>0),
-                                      'profitability3':(roa_change>0),
-                                      'profitability4':(op_ta>roa_this_year)
-                                      },
-                      'leverage_and_liquidity':{
-                                                'leverage_liquidity1':(ltd_change<0),
-                                                'leverage_liquidity2':(cur_change>0),
-                                                'leverage_liquidity3':(shares_change==0)
-                                               },
-                      'operational_efficiency':{
-                                                'operational_efficiency_1':(gm_change>0),
-                                                'operational_efficiency_2':(at_change>0)}
-                                               }
-        
-        print("f-score conditions satisifed:\n")
-        for i in conditions.keys():
-            
-            for j in conditions[i].keys():
-                print(f"{j}: {conditions[i][j]}")
-                
-                
-                if (conditions[i][j]) & (i == 'profitability'):
-                   
-                    f1_score += 1
-                    profitability_score += 1
-                
-                elif (conditions[i][j]) & (i == 'leverage_and_liquidity'):
-                    
-                    f1_score += 1
-                    leverage_liquidity_score += 1
-                    
-                elif (conditions[i][j]) & (i == 'operational_efficiency'):
-                    
-                    f1_score += 1
-                    operating_efficiency_score += 1
-              
-                else:
-                    pass
+        with self.instrumentation.stage('f_score'):
+            #current and previous year of every field used by the conditions
+            current = {field: [self._field(field)] for field in CURRENT_FIELDS}
+            previous = {field: [self._field(field, 1)] for field in PREVIOUS_FIELDS}
+            row = f_scores(current, previous)[0]
+        
+        f1_score = int(row['f_score'])
+        profitability_score = int(row['profitability_score'])
+        leverage_liquidity_score = int(row['leverage_liquidity_score'])
+        operating_efficiency_score = int(row['operating_efficiency_score'])
         
         f1_performance = round((f1_score/9)*100,4)
         profitability_performance = round((profitability_score/4)*100,4)
         leverage_liquidity_performance = round((leverage_liquidity_score/3)*100,4)
         operating_efficiency_performance = round((operating_efficiency_score/2)*100,4)
         
-        print("\n******************************************************\n")
+        if not self.quiet:
+            print("f-score results:\n")
+
+            #profitability conditions
+            print(f"P1(return_on_assets > 0): {float(row['return_on_assets'])}")
+            print(f"P2(opCF > 0): {float(row['operating_cash_flow_per_share'])}")
+            print(f"P3(return_on_assets_change > 0): {float(row['return_on_assets_change'])}")
+            print(f"P4(opCF/totalAssets > return_on_assets): {(float(row['operating_cash_flow_to_assets']), float(row['return_on_assets']))}")
+        
+            #Leverage, liquidity and source of funds conditions
+            print(f"LL5(long_term_leverage_change < 0): {float(row['long_term_leverage_change'])}")
+            print(f"LL6(current_ratio_change > 0): {float(row['current_ratio_change'])}")
+            print(f"LL7(number_of_shares_change == 0): {float(row['number_of_shares_change'])}")
+        
+            # Operating efficiency conditions
+            print(f"OE8(gross_margin_change > 0): {float(row['gross_margin_change'])}")
+            print(f"OE9(asset_turnover_ratio_change > 0): {float(row['asset_turnover_change'])}")
+        
+            print("\n******************************************************\n")
         
-        print("f-score results summary:")
+            print("f-score conditions satisifed:\n")
+            for condition in CONDITIONS:
+                print(f"{condition}: {bool(row[condition])}")
+        
+            print("\n******************************************************\n")
+        
+            print("f-score results summary:")
         
         results = {'F1-Score':f1_score, 
                 'F1-performance':str(f1_performance)+'%',
@@ -500,8 +855,8 @@ class Fundamentals:
                 'operating-efficiency-performance':str(operating_efficiency_performance)+'%'
                }
         
-        print(results)
+        if not self.quiet:
+            print(results)
               
-        return
+        return results
               
-        
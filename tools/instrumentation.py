@@ -0,0 +1,121 @@
+import contextlib
+import json
+import threading
+import time
+
+#kinds of stage: waiting on an api/data source, or computing
+FETCH = 'fetch'
+COMPUTE = 'compute'
+
+class Instrumentation:
+
+    def __init__(self, exporters=None, ticker=None):
+        """
+        Summary:
+        Collects the wall time and call count of every valuation stage and passes each event to exporters.
+        inputs:
+        exporters (list): callables receiving each event dict, e.g. MemoryExporter() or JsonLinesExporter(path).
+        ticker (str): ticker added to the events (set by Fundamentals).
+        Each event is {'ticker', 'stage', 'kind' (FETCH/COMPUTE), 'seconds', 'cached', 'timestamp'}.
+        """
+        self.exporters = list(exporters or [])
+        self.ticker = ticker
+        self.stats = {}
+
+    def record(self, stage, seconds, kind=COMPUTE, cached=False):
+        """
+        Summary:
+        Records one call of a stage (cached calls are counted but take no time).
+        """
+        stats = self.stats.get(stage)
+        if stats is None:
+            stats = self.stats[stage] = {'kind': kind, 'calls': 0, 'cached': 0, 'seconds': 0.0, 'max': 0.0}
+        stats['calls'] += 1
+        stats['cached'] += cached
+        stats['seconds'] += seconds
+        stats['max'] = max(stats['max'], seconds)
+
+        if self.exporters:
+            event = {'ticker': self.ticker,
+                     'stage': stage,
+                     'kind': kind,
+                     'seconds': seconds,
+                     'cached': cached,
+                     'timestamp': time.time()}
+            for exporter in self.exporters:
+                exporter(event)
+
+    @contextlib.contextmanager
+    def stage(self, stage, kind=COMPUTE):
+        """
+        Summary:
+        Times the body of a with statement as one call of a stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, kind)
+
+    def totals(self):
+        """
+        Summary:
+        Total seconds spent per kind of stage.
+        returns:
+        (dict) = {FETCH: seconds, COMPUTE: seconds}
+        """
+        totals = {FETCH: 0.0, COMPUTE: 0.0}
+        for stats in self.stats.values():
+            totals[stats['kind']] = totals.get(stats['kind'], 0.0) + stats['seconds']
+        return totals
+
+    def summary(self):
+        """
+        Summary:
+        Per stage statistics, slowest stage first.
+        returns:
+        (dict) = {stage: {'kind', 'calls', 'cached', 'seconds', 'max'}}
+        """
+        return dict(sorted(((stage, dict(stats)) for stage, stats in self.stats.items()),
+                           key=lambda item: -item[1]['seconds']))
+
+    def reset(self):
+        self.stats = {}
+
+class MemoryExporter:
+
+    def __init__(self):
+        """
+        Summary:
+        Keeps every event in a list (e.g. to aggregate the stages of many valuations).
+        """
+        self.events = []
+
+    def __call__(self, event):
+        self.events.append(event)
+
+class JsonLinesExporter:
+
+    def __init__(self, path):
+        """
+        Summary:
+        Appends every event as one json line to a file, safe to share between threads.
+        """
+        self.path = path
+        self._file = open(path, 'a')
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        line = json.dumps(event)
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
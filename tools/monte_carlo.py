@@ -0,0 +1,164 @@
+import numpy as np
+
+from tools import dcf_kernel
+from tools.streaming_stats import StreamingHistogram
+
+#order of the simulated parameters (also the order of the correlation matrix)
+PARAMETERS = ['earnings_growth_rate', 'cap_ex_growth_rate', 'perpetual_growth_rate', 'wacc']
+
+def _norm_cdf(z):
+    """
+    Summary:
+    Standard normal CDF (Abramowitz & Stegun 7.1.26, absolute error < 1.5e-7).
+    """
+    x = np.abs(z)/np.sqrt(2)
+    t = 1/(1 + 0.3275911*x)
+    poly = t*(0.254829592 + t*(-0.284496736 + t*(1.421413741 + t*(-1.453152027 + t*1.061405429))))
+    erf = 1 - poly*np.exp(-x*x)
+    return 0.5*(1 + np.sign(z)*erf)
+
+def _transform(z, spec):
+    """
+    Summary:
+    Maps standard normal draws to the marginal distribution described by spec.
+    inputs:
+    z (ndarray): standard normal draws.
+    spec (float/tuple): a constant, or one of
+                        ('fixed', value)
+                        ('normal', mean, std)
+                        ('lognormal', mu, sigma) -- of the underlying normal
+                        ('uniform', low, high)
+                        ('triangular', low, mode, high)
+    """
+    if np.isscalar(spec):
+        return np.full(z.shape, float(spec))
+
+    kind, *args = spec
+    if kind == 'fixed':
+        return np.full(z.shape, float(args[0]))
+    if kind == 'normal':
+        return args[0] + args[1]*z
+    if kind == 'lognormal':
+        return np.exp(args[0] + args[1]*z)
+
+    u = _norm_cdf(z)
+    if kind == 'uniform':
+        return args[0] + (args[1] - args[0])*u
+    if kind == 'triangular':
+        low, mode, high = args
+        split = (mode - low)/(high - low)
+        return np.where(u < split,
+                        low + np.sqrt(u*(high - low)*(mode - low)),
+                        high - np.sqrt((1 - u)*(high - low)*(high - mode)))
+
+    raise ValueError(f"Unknown distribution: {kind}")
+
+def _correlation_matrix(correlation):
+    """
+    Summary:
+    Builds the correlation matrix of PARAMETERS from a matrix or a {(name, name): rho} dict and checks it.
+    """
+    if correlation is None:
+        return None
+    if isinstance(correlation, dict):
+        matrix = np.eye(len(PARAMETERS))
+        for (a, b), rho in correlation.items():
+            i, j = PARAMETERS.index(a), PARAMETERS.index(b)
+            matrix[i, j] = matrix[j, i] = rho
+    else:
+        matrix = np.asarray(correlation, dtype='float64')
+
+    if matrix.shape != (len(PARAMETERS), len(PARAMETERS)):
+        raise ValueError(f"The correlation matrix must be {len(PARAMETERS)}x{len(PARAMETERS)} (ordered as {PARAMETERS}), got {matrix.shape}")
+    if not np.allclose(matrix, matrix.T):
+        raise ValueError("The correlation matrix must be symmetric")
+    if not np.allclose(np.diag(matrix), 1):
+        raise ValueError(f"The correlation matrix must have a unit diagonal, got {np.diag(matrix).tolist()}")
+    return matrix
+
+def _cholesky(matrix):
+    try:
+        return np.linalg.cholesky(matrix)
+    except np.linalg.LinAlgError:
+        raise ValueError("The correlation matrix must be positive definite") from None
+
+def _draw(rng, size, cholesky, distributions):
+    """
+    Summary:
+    Draws one chunk of joint scenarios: correlated standard normals mapped to each marginal (Gaussian copula).
+    returns:
+    (list) = one array of size draws per name in PARAMETERS.
+    """
+    z = rng.standard_normal((size, len(PARAMETERS)))
+    if cholesky is not None:
+        z = z @ cholesky.T
+    return [_transform(z[:, i], distributions[p]) for i, p in enumerate(PARAMETERS)]
+
+def _share_prices(base, eg, cxg, g, wacc):
+    """
+    Summary:
+    Evaluates the enterprise-value -> equity-value -> share price chain for arrays of scenarios.
+    """
+    forecast = dcf_kernel.forecast(base['ebit'], base['non_cash_charges'], base['cwc'], base['cap_ex'],
+                                   base['tax_rate'], eg, cxg, g, wacc, base['forecasting_period'])
+    _, share_price = dcf_kernel.equity_value(forecast['enterprise_value'], base['debt'], base['cash'], base['number_of_shares'])
+    return share_price
+
+def simulate(base, distributions, n_scenarios=1000000, correlation=None, seed=None, memory_budget=64*1024**2, bins=1000, quantiles=(0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)):
+    """
+    Summary:
+    Monte Carlo valuation: draws joint scenarios of the growth rates, WACC and g and evaluates the
+    implied share price of each, in chunks sized to fit memory_budget, with streaming statistics.
+    inputs:
+    base (dict): base-year inputs {'ebit', 'non_cash_charges', 'cwc', 'cap_ex', 'tax_rate',
+                 'debt', 'cash', 'number_of_shares', 'forecasting_period'}.
+    distributions (dict): {parameter: spec} for every name in PARAMETERS (see _transform for the specs).
+    n_scenarios (int): number of scenarios to draw.
+    correlation (ndarray/dict): correlation of the parameters (Gaussian copula), ordered as PARAMETERS,
+                                or {(name, name): rho}. None means independent draws. A matrix that is not
+                                symmetric, has no unit diagonal or is not positive definite raises ValueError.
+    seed (int): seed of the random generator, the same seed and memory_budget reproduce the same results.
+    memory_budget (int): approximate number of bytes used by the arrays of one chunk.
+    bins (int): number of histogram bins used for the streaming quantiles.
+    quantiles (list): quantiles of the implied share price to report.
+    returns:
+    (dict) = {'scenarios', 'valid', 'mean', 'std', 'min', 'max', 'quantiles': {q: price},
+              'histogram': (counts, edges), 'seed'}
+    Scenarios where wacc <= g (or the price is not finite) are excluded from the statistics.
+    """
+    missing = [p for p in PARAMETERS if p not in distributions]
+    if missing:
+        raise ValueError(f"Missing distributions for: {missing}")
+
+    matrix = _correlation_matrix(correlation)
+    cholesky = None if matrix is None else _cholesky(matrix)
+
+    #draws, parameters and the (years x drivers) forecast temporaries, 8 bytes each
+    bytes_per_scenario = 8*(3*len(PARAMETERS) + 8*(base['forecasting_period'] + 1))
+    chunk_size = max(1, int(memory_budget // bytes_per_scenario))
+
+    rng = np.random.default_rng(seed)
+    histogram = StreamingHistogram(bins=bins)
+    valid = 0
+
+    remaining = n_scenarios
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        remaining -= size
+
+        eg, cxg, g, wacc = _draw(rng, size, cholesky, distributions)
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            prices = _share_prices(base, eg, cxg, g, wacc)
+        prices = prices[(wacc > g) & np.isfinite(prices)]
+
+        valid += len(prices)
+        histogram.update(prices)
+
+    results = histogram.summary(quantiles)
+    del results['count']
+    results['scenarios'] = n_scenarios
+    results['valid'] = valid
+    results['seed'] = seed
+
+    return results
@@ -0,0 +1,139 @@
+import time
+from collections import Counter, OrderedDict
+
+class Stage:
+
+    def __init__(self, name, function, inputs=(), kind='compute'):
+        """
+        Summary:
+        A step of a Pipeline.
+        inputs:
+        name (str): name of the output of the stage.
+        function (callable): pure function called with the values of inputs, in order.
+        inputs (list): names of the pipeline inputs and/or other stages the stage depends on.
+        kind (str): 'compute', or 'fetch' for stages waiting on an api (reported to the pipeline hook).
+        """
+        self.name = name
+        self.function = function
+        self.inputs = list(inputs)
+        self.kind = kind
+
+class _Identity:
+    """
+    Summary:
+    Key of an unhashable input (e.g. a RatingTable): equal only to the same object.
+    Holds a reference, so the id can't be reused by another object while the key is cached.
+    """
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return isinstance(other, _Identity) and other.value is self.value
+
+    def __hash__(self):
+        return id(self.value)
+
+def _token(value):
+    """
+    Summary:
+    Hashable token of an input value: the value itself if hashable, otherwise its identity.
+    """
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return _Identity(value)
+
+class Pipeline:
+
+    def __init__(self, stages, max_entries=256, hook=None):
+        """
+        Summary:
+        Graph of stages whose outputs are memoized by the values of everything upstream of them.
+        Changing an input only invalidates the stages that depend on it, every other output is reused.
+        inputs:
+        stages (list): Stage objects.
+        max_entries (int): maximum number of memoized outputs (least recently used are dropped first).
+        hook (callable): optional hook(stage, seconds, kind, cached) called for every stage requested,
+                         e.g. Instrumentation.record (see tools/instrumentation.py).
+        """
+        self.hook = hook
+        self.stages = {stage.name: stage for stage in stages}
+        self.inputs = {}
+        #pipeline inputs each stage depends on, directly or through other stages
+        self.upstream = {}
+        for name in self.stages:
+            self._upstream(name)
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+
+        #number of times each stage was computed / served from the cache
+        self.computed = Counter()
+        self.reused = Counter()
+
+    def set(self, **values):
+        """
+        Summary:
+        Sets pipeline input values (e.g. perpetual_growth_rate=0.02).
+        """
+        self.inputs.update(values)
+
+    def _upstream(self, name, visiting=()):
+        if name not in self.stages:
+            return (name,)
+        if name in visiting:
+            raise ValueError(f"Pipeline stage '{name}' depends on itself")
+        if name not in self.upstream:
+            inputs = set()
+            for dependency in self.stages[name].inputs:
+                inputs.update(self._upstream(dependency, visiting + (name,)))
+            self.upstream[name] = tuple(sorted(inputs))
+        return self.upstream[name]
+
+    def key(self, name):
+        """
+        Summary:
+        Key of a stage output: its name and the values of every pipeline input upstream of it.
+        """
+        try:
+            return (name,) + tuple([_token(self.inputs[i]) for i in self.upstream[name]])
+        except KeyError as e:
+            raise KeyError(f"Pipeline input {e} has not been set") from None
+
+    def get(self, name):
+        """
+        Summary:
+        Value of a stage (or input), computing only the stages whose inputs changed.
+        """
+        if name not in self.stages:
+            return self.inputs[name]
+
+        key = self.key(name)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.reused[name] += 1
+            if self.hook is not None:
+                self.hook(name, 0.0, self.stages[name].kind, True)
+            return self._cache[key]
+
+        stage = self.stages[name]
+        arguments = [self.get(dependency) for dependency in stage.inputs]
+        start = time.perf_counter()
+        value = stage.function(*arguments)
+        seconds = time.perf_counter() - start
+        self.computed[name] += 1
+        if self.hook is not None:
+            self.hook(name, seconds, stage.kind, False)
+
+        self._cache[key] = value
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+        return value
+
+    def clear(self):
+        """
+        Summary:
+        Drops every memoized output.
+        """
+        self._cache.clear()
@@ -0,0 +1,151 @@
+import atexit
+import os
+import queue
+import threading
+
+import numpy as np
+
+#in headless mode plots are written to files by a background thread and no GUI backend is ever loaded
+HEADLESS = os.environ.get('FUNDAMENTALS_HEADLESS', '') not in ('', '0')
+
+def set_headless(headless=True):
+    """
+    Summary:
+    Switches headless mode on/off (can also be set with the FUNDAMENTALS_HEADLESS environment variable).
+    """
+    global HEADLESS
+    HEADLESS = headless
+
+def _pyplot():
+    """
+    Summary:
+    Imports pyplot only when an interactive plot is needed.
+    """
+    import matplotlib
+    if HEADLESS:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+def distribution_stats(values, quantiles, bins=100):
+    """
+    Summary:
+    Precomputes what the distribution plots need, so the raw values never reach the renderer.
+    inputs:
+    values (array): implied share prices (NaN/inf are ignored).
+    quantiles (dict): {0.05: price, 0.25: price, 0.5: price, 0.75: price, 0.95: price}.
+    bins (int): number of histogram bins.
+    returns:
+    (dict) = {'counts', 'edges', 'box'}
+    """
+    values = np.ravel(values)
+    counts, edges = np.histogram(values[np.isfinite(values)], bins=bins)
+
+    return {'counts': counts,
+            'edges': edges,
+            'box': {'whislo': quantiles[0.05], 'q1': quantiles[0.25], 'med': quantiles[0.5],
+                    'q3': quantiles[0.75], 'whishi': quantiles[0.95], 'fliers': []}}
+
+def _draw(fig, stats, title):
+    """
+    Summary:
+    Draws a density histogram and a box plot (whiskers at the 5% and 95% quantiles) on a figure.
+    """
+    ax1, ax2 = fig.subplots(1, 2)
+
+    counts, edges = stats['counts'], stats['edges']
+    widths = np.diff(edges)
+    density = counts/(counts.sum()*widths) if counts.sum() else counts
+    ax1.bar(edges[:-1], density, width=widths, align='edge')
+    ax1.set_xlabel('Implied share price')
+    ax1.set_ylabel('Frequency')
+    ax1.set_title(title)
+    ax1.tick_params(axis='x', labelrotation=90)
+
+    ax2.bxp([stats['box']], showfliers=False, vert=False)
+    ax2.set_title('Implied share price range')
+    ax2.tick_params(axis='x', labelrotation=90)
+
+    fig.tight_layout()
+
+def show_distribution(stats, title='Implied share price with variation of WACC and g'):
+    """
+    Summary:
+    Interactive version of the distribution plots (blocks on plt.show()).
+    """
+    plt = _pyplot()
+    fig = plt.figure(figsize=(12, 5))
+    _draw(fig, stats, title)
+    plt.show()
+
+def save_distribution(stats, path, title='Implied share price with variation of WACC and g'):
+    """
+    Summary:
+    Writes the distribution plots to a file without opening a window.
+    """
+    import matplotlib
+    if HEADLESS:
+        #some artists import pyplot internally, make sure it can never pick a GUI backend
+        matplotlib.use('Agg')
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(12, 5))
+    _draw(fig, stats, title)
+    fig.savefig(path)
+
+class PlotRenderer:
+
+    def __init__(self):
+        """
+        Summary:
+        Background thread that writes plots to files, so valuations never wait for rendering.
+        """
+        self._queue = queue.Queue()
+        self.errors = []
+        self._thread = threading.Thread(target=self._run, name='plot-renderer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                function, args = job
+                function(*args)
+            except Exception as e:
+                self.errors.append(e)
+            finally:
+                self._queue.task_done()
+
+    def submit(self, stats, path, title='Implied share price with variation of WACC and g'):
+        """
+        Summary:
+        Queues the distribution plots of precomputed stats to be written to path.
+        """
+        self._queue.put((save_distribution, (stats, path, title)))
+
+    def wait(self):
+        """
+        Summary:
+        Blocks until every queued plot has been written.
+        """
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+_renderer = None
+
+def get_renderer():
+    """
+    Summary:
+    Shared background renderer, started on first use.
+    """
+    global _renderer
+    if _renderer is None:
+        _renderer = PlotRenderer()
+        #finish writing queued plots before the interpreter exits
+        atexit.register(_renderer.wait)
+    return _renderer
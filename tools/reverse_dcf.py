@@ -0,0 +1,244 @@
+import numpy as np
+import pandas as pd
+
+from tools import dcf_kernel
+from tools.credit_rating import LARGE_CAP
+
+#dcf() growth rates a reverse DCF can solve for, with their default bracket (lower, upper).
+#An upper bound of None is just below the wacc of each ticker (the terminal value diverges at g = wacc),
+#the earnings growth bound keeps every yearly factor (1 + yr*eg) positive for forecasts of up to 4 years.
+SOLVE_FOR = {'earnings_growth_rate': (-0.2, 1.0),
+             'perpetual_growth_rate': (-0.5, None)}
+
+#base-year inputs of the price function (see Fundamentals._base_inputs), plus the wacc
+INPUTS = ['ebit', 'non_cash_charges', 'cwc', 'cap_ex', 'tax_rate', 'debt', 'cash', 'number_of_shares', 'forecasting_period', 'wacc']
+
+def find_roots(function, lower, upper, xtol=1e-12, ftol=1e-10, max_iterations=100, method='illinois'):
+    """
+    Summary:
+    Vectorized bracketed root finder: solves function(x) = 0 for many independent problems at once.
+    Every iteration evaluates the function once, only for the problems not converged yet. The 'illinois'
+    method (regula falsi, halving the retained end's value when the same end is kept twice) converges
+    superlinearly and falls back to bisection when a step would leave the bracket, 'bisection' halves it.
+    inputs:
+    function (callable): function(x, index) -> values of the problems `index` (int array) at x (same shape).
+    lower, upper (float/array): bracket of every problem, f(lower) and f(upper) must have opposite signs.
+    xtol (float): converged when the bracket is narrower than xtol*(1 + |x|).
+    ftol (float): converged when |f(x)| <= ftol.
+    max_iterations (int): iterations before giving up.
+    method (str): 'illinois' or 'bisection'.
+    returns:
+    (dict) = {'root': last estimate (NaN if not bracketed),
+              'converged': bool,
+              'iterations': function evaluations after the bracket ends,
+              'residual': f(root),
+              'bracketed': False where f(lower) and f(upper) have the same sign or are not finite}
+              each an ndarray shaped like the broadcast bracket.
+    """
+    if method not in ('illinois', 'bisection'):
+        raise ValueError("method must be 'illinois' or 'bisection'")
+
+    lower, upper = np.broadcast_arrays(np.asarray(lower, dtype='float64'), np.asarray(upper, dtype='float64'))
+    shape = lower.shape
+    a, b = lower.ravel().copy(), upper.ravel().copy()
+    everything = np.arange(a.size)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        fa = np.asarray(function(a, everything), dtype='float64').ravel().copy()
+        fb = np.asarray(function(b, everything), dtype='float64').ravel().copy()
+
+    root = np.full(a.size, np.nan)
+    residual = np.full(a.size, np.nan)
+    iterations = np.zeros(a.size, dtype='int64')
+    converged = np.zeros(a.size, dtype=bool)
+    bracketed = np.isfinite(fa) & np.isfinite(fb) & (np.sign(fa)*np.sign(fb) <= 0)
+
+    #an end of the bracket that is already a root
+    for x, fx in ((b, fb), (a, fa)):
+        done = bracketed & (np.abs(fx) <= ftol)
+        root[done], residual[done], converged[done] = x[done], fx[done], True
+
+    active = np.flatnonzero(bracketed & ~converged)
+    for iteration in range(1, max_iterations + 1):
+        if not active.size:
+            break
+        A, B, FA, FB = a[active], b[active], fa[active], fb[active]
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            middle = 0.5*(A + B)
+            if method == 'bisection':
+                c = middle
+            else:
+                c = B - FB*(B - A)/(FB - FA)
+                c = np.where((c > np.minimum(A, B)) & (c < np.maximum(A, B)), c, middle)
+            fc = np.asarray(function(c, active), dtype='float64').ravel()
+
+        iterations[active] = iteration
+        root[active], residual[active] = c, fc
+
+        #keep the sign change between a and b, b is always the newest point (illinois: halve a kept f(a))
+        keep_a = np.sign(fc) == np.sign(FB)
+        A, FA = np.where(keep_a, A, B), np.where(keep_a, FA if method == 'bisection' else 0.5*FA, FB)
+        a[active], fa[active], b[active], fb[active] = A, FA, c, fc
+
+        done = (np.abs(fc) <= ftol) | (np.abs(c - A) <= xtol*(1 + np.abs(c)))
+        converged[active[done & np.isfinite(fc)]] = True
+        active = active[~done & np.isfinite(fc)]
+
+    return {'root': root.reshape(shape),
+            'converged': converged.reshape(shape),
+            'iterations': iterations.reshape(shape),
+            'residual': residual.reshape(shape),
+            'bracketed': bracketed.reshape(shape)}
+
+def _share_price(inputs, index, earnings_growth_rate, cap_ex_growth_rate, perpetual_growth_rate, pv_fcf=None):
+    #implied share price of the tickers `index` (the dcf() math of tools/dcf_kernel.py)
+    n = inputs['forecasting_period'][index]
+    wacc = inputs['wacc'][index]
+    if pv_fcf is None:
+        pv_fcf = dcf_kernel.project_free_cash_flows(inputs['ebit'][index],
+                                                    inputs['non_cash_charges'][index],
+                                                    inputs['cwc'][index],
+                                                    inputs['cap_ex'][index],
+                                                    tax_rate = inputs['tax_rate'][index],
+                                                    earnings_growth_rate = earnings_growth_rate,
+                                                    cap_ex_growth_rate = cap_ex_growth_rate,
+                                                    wacc = wacc,
+                                                    forecasting_period = n)
+    forecast = dcf_kernel.discount_terminal_value(pv_fcf, perpetual_growth_rate, wacc, n)
+    return dcf_kernel.equity_value(forecast['enterprise_value'],
+                                   inputs['debt'][index],
+                                   inputs['cash'][index],
+                                   inputs['number_of_shares'][index])[1]
+
+def implied_growth(inputs, market_price, solve_for='earnings_growth_rate', earnings_growth_rate=0.05, cap_ex_growth_rate=0.05, perpetual_growth_rate=0.02, bracket=None, xtol=1e-12, ftol=1e-10, max_iterations=100, method='illinois'):
+    """
+    Summary:
+    Reverse DCF: the growth rate at which the implied share price of dcf() equals the market price, solved
+    for every ticker at once with find_roots(). The residual is the relative price error implied/market - 1.
+    When solving for the perpetual growth rate the free-cash-flow projection does not depend on the unknown,
+    so it is computed once and only the terminal value is re-evaluated at each iteration.
+    inputs:
+    inputs (dict): {input: float/array} base-year inputs and wacc of every ticker (see INPUTS, store_inputs()).
+    market_price (float/array): market share price of every ticker.
+    solve_for (str): 'earnings_growth_rate' or 'perpetual_growth_rate' (see SOLVE_FOR).
+    earnings_growth_rate, cap_ex_growth_rate, perpetual_growth_rate (float/array): the other dcf() inputs
+                                                                                   (the one solved for is ignored).
+    bracket (tuple): (lower, upper) floats or arrays, defaults to SOLVE_FOR[solve_for].
+    xtol, ftol, max_iterations, method: see find_roots().
+    returns:
+    (dict) = {solve_for, 'converged', 'iterations', 'residual', 'bracketed'}, each an ndarray (ticker,)
+    """
+    if solve_for not in SOLVE_FOR:
+        raise ValueError(f"solve_for must be one of {list(SOLVE_FOR)}")
+
+    arrays = np.broadcast_arrays(*[np.asarray(inputs[name], dtype='float64') for name in INPUTS],
+                                 np.asarray(market_price, dtype='float64'),
+                                 np.asarray(earnings_growth_rate, dtype='float64'),
+                                 np.asarray(cap_ex_growth_rate, dtype='float64'),
+                                 np.asarray(perpetual_growth_rate, dtype='float64'))
+    arrays = [np.atleast_1d(array).ravel() for array in arrays]
+    inputs = dict(zip(INPUTS, arrays))
+    inputs['forecasting_period'] = inputs['forecasting_period'].astype('int64')
+    market_price, eg, cxg, g = arrays[len(INPUTS):]
+
+    lower, upper = SOLVE_FOR[solve_for] if bracket is None else bracket
+    if upper is None:
+        upper = inputs['wacc'] - 1e-6
+    lower, upper = np.broadcast_arrays(np.asarray(lower, dtype='float64'), np.asarray(upper, dtype='float64'), market_price)[:2]
+
+    if solve_for == 'perpetual_growth_rate':
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            pv_fcf = dcf_kernel.project_free_cash_flows(inputs['ebit'], inputs['non_cash_charges'], inputs['cwc'],
+                                                        inputs['cap_ex'], inputs['tax_rate'], eg, cxg,
+                                                        inputs['wacc'], inputs['forecasting_period'])
+
+        def price_error(x, index):
+            price = _share_price(inputs, index, None, None, x, pv_fcf = pv_fcf[index])
+            return price/market_price[index] - 1
+    else:
+        def price_error(x, index):
+            price = _share_price(inputs, index, x, cxg[index], g[index])
+            return price/market_price[index] - 1
+
+    solution = find_roots(price_error, lower, upper, xtol=xtol, ftol=ftol, max_iterations=max_iterations, method=method)
+    solution[solve_for] = solution.pop('root')
+    return solution
+
+def _betas(beta, tickers):
+    #one beta per ticker from a float, an array or a {ticker: beta} mapping (missing tickers are NaN)
+    if hasattr(beta, 'get'):
+        return np.array([np.nan if beta.get(ticker) is None else float(beta.get(ticker)) for ticker in tickers], dtype='float64')
+    return np.broadcast_to(np.asarray(beta, dtype='float64'), (len(tickers),))
+
+def store_inputs(store, market_data, beta, forecasting_period=4, rating_table=LARGE_CAP, period=0):
+    """
+    Summary:
+    Base-year inputs, wacc and market price of every ticker of a StatementStore, computed column-wise with
+    the same formulas as the dcf() stages (capital structure from the quarterly balance sheet).
+    inputs:
+    store (StatementStore): columnar statements.
+    market_data (MarketData): risk-free rate and index return.
+    beta (float/array/dict/Series): beta of every ticker, e.g. estimate_betas(prices)['beta'] (see tools/beta.py).
+    forecasting_period (int/array): years to forecast.
+    rating_table (RatingTable): interest coverage to credit spread table.
+    period (int): period of the statements (0 = latest).
+    returns:
+    (dict) = {input: ndarray (ticker,)} for INPUTS plus 'market_price', 'cost_of_debt' and 'capm'.
+    """
+    field = {name: np.asarray(store.column(name, period), dtype='float64') for name in
+             ['inc.ebitda', 'inc.depreciationAndAmortization', 'inc.interestExpense', 'fr.effectiveTaxRate',
+              'bsq.totalDebt', 'bsq.totalStockholdersEquity', 'cf.depreciationAndAmortization',
+              'cf.changeInWorkingCapital', 'cf.capitalExpenditure', 'ev.totalDebt', 'ev.cash',
+              'ev.numberOfShares', 'ev.stockPrice']}
+    risk_free_rate = market_data.risk_free_rate
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ebit = field['inc.ebitda'] - field['inc.depreciationAndAmortization']
+        credit_spread = rating_table.lookup(ebit / field['inc.interestExpense'])[1]
+        cost_of_debt = risk_free_rate + credit_spread
+        capm = risk_free_rate + (_betas(beta, store.tickers.tolist())*(market_data.index_return - risk_free_rate))
+
+        effective_tax_rate = field['fr.effectiveTaxRate']
+        total_debt = field['bsq.totalDebt']
+        equity = field['bsq.totalStockholdersEquity']
+        dp = total_debt / (total_debt + equity)
+        ep = equity / (total_debt + equity)
+        wacc = (cost_of_debt*(1-effective_tax_rate)*dp) + (capm*ep)
+
+    return {'ebit': ebit,
+            'non_cash_charges': field['cf.depreciationAndAmortization'],
+            'cwc': field['cf.changeInWorkingCapital'],
+            'cap_ex': field['cf.capitalExpenditure'],
+            'tax_rate': effective_tax_rate,
+            'debt': field['ev.totalDebt'],
+            'cash': field['ev.cash'],
+            'number_of_shares': field['ev.numberOfShares'],
+            'forecasting_period': np.broadcast_to(np.asarray(forecasting_period, dtype='int64'), ebit.shape),
+            'wacc': wacc,
+            'market_price': field['ev.stockPrice'],
+            'cost_of_debt': cost_of_debt,
+            'capm': capm}
+
+def implied_growth_screen(store, market_data, beta, solve_for='earnings_growth_rate', earnings_growth_rate=0.05, cap_ex_growth_rate=0.05, perpetual_growth_rate=0.02, forecasting_period=4, rating_table=LARGE_CAP, period=0, as_frame=True, **kwargs):
+    """
+    Summary:
+    Market-implied growth of every ticker of a StatementStore in one vectorized pass (store_inputs() then
+    implied_growth(), kwargs are passed to it), e.g. to screen a whole market for the growth priced in.
+    returns:
+    (DataFrame) = index ticker, columns [solve_for, 'converged', 'iterations', 'residual', 'bracketed', 'wacc',
+                  'market_price'] (a dict of arrays if as_frame is False).
+    """
+    inputs = store_inputs(store, market_data, beta, forecasting_period, rating_table, period)
+    results = implied_growth(inputs, inputs['market_price'], solve_for,
+                             earnings_growth_rate = earnings_growth_rate,
+                             cap_ex_growth_rate = cap_ex_growth_rate,
+                             perpetual_growth_rate = perpetual_growth_rate,
+                             **kwargs)
+    results = {solve_for: results.pop(solve_for), **results,
+               'wacc': inputs['wacc'],
+               'market_price': inputs['market_price']}
+
+    if as_frame:
+        return pd.DataFrame(results, index = pd.Index(store.tickers, name = 'ticker'))
+    return results
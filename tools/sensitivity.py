@@ -0,0 +1,89 @@
+import numpy as np
+
+def implied_share_price_grid(wacc_range, g_range, last_flow, npv_fcf_sum, n_flows, debt, cash, number_of_shares, out=None):
+    """
+    Summary:
+    Evaluates the implied share price for every (WACC, g) combination in one broadcast pass.
+    inputs:
+    wacc_range (array): discount rates, one per row of the grid.
+    g_range (array): perpetual growth rates, one per column of the grid.
+    last_flow (float): present value of the last forecast free-cash-flow.
+    npv_fcf_sum (float): sum of the present values of the forecast free-cash-flows.
+    n_flows (int): number of cash flows (forecasting period + 1), used to discount the terminal value.
+    debt (float), cash (float), number_of_shares (float): enterprise-value to share price adjustments.
+    out (ndarray): optional (len(wacc_range), len(g_range)) float64 buffer to write into.
+    returns:
+    grid (ndarray): implied share prices, shape (len(wacc_range), len(g_range)).
+    """
+    wacc = np.asarray(wacc_range, dtype='float64')[:, None]
+    g = np.asarray(g_range, dtype='float64')[None, :]
+
+    #terminal value: (last*(1+g))/(wacc-g) discounted by (1+wacc)**n, computed in place in a single buffer
+    with np.errstate(divide='ignore', invalid='ignore'):
+        grid = np.subtract(wacc, g, out=out)
+        np.divide(last_flow*(1 + g), grid, out=grid)
+        grid /= (1 + wacc)**n_flows
+
+    #enterprise value -> equity value -> share price
+    grid += npv_fcf_sum
+    grid -= debt
+    grid += cash
+    grid /= number_of_shares
+
+    return grid
+
+def _quantile_positions(n, quantiles):
+    """
+    Summary:
+    Lower/upper order statistics and weights for linearly interpolated quantiles (same as pandas/numpy 'linear').
+    """
+    position = np.asarray(quantiles, dtype='float64')*(n - 1)
+    lower = np.floor(position).astype('int64')
+    upper = np.minimum(lower + 1, n - 1)
+    return lower, upper, position - lower
+
+def summarize(values, confidence_intervals, quantiles=()):
+    """
+    Summary:
+    Computes summary statistics and every confidence band of a set of implied share prices
+    from a single partial sort (NaN values are ignored).
+    inputs:
+    values (array): implied share prices (any shape).
+    confidence_intervals (list/float): confidence levels, each 0 < i < 1.
+    quantiles (list): additional quantiles to compute in the same pass.
+    returns:
+    (dict) = {'min', 'max', 'mean', 'median': float,
+              'bands': {confidence level: (lower price, upper price)},
+              'quantiles': {quantile: price}}
+    """
+    confidence_intervals = np.atleast_1d(confidence_intervals).astype('float64')
+    if np.any((confidence_intervals <= 0) | (confidence_intervals >= 1)):
+        raise ValueError("Ensure that for i in confidence_intervals: 0 < i < 1")
+
+    values = np.ravel(values)
+    values = values[~np.isnan(values)]
+    n = len(values)
+    if n == 0:
+        raise ValueError("No valid implied share prices to summarize")
+
+    significance_level = (1 - confidence_intervals)/2
+    extra = np.asarray(quantiles, dtype='float64')
+    positions = np.concatenate([[0.5], np.round(significance_level, 4), np.round(1 - significance_level, 4), extra])
+    lower, upper, weight = _quantile_positions(n, positions)
+
+    #one selection pass places every order statistic we need (plus min and max) in its sorted position
+    kth = np.unique(np.concatenate([[0, n - 1], lower, upper]))
+    ordered = np.partition(values, kth)
+    with np.errstate(invalid='ignore'):
+        q = ordered[lower] + (ordered[upper] - ordered[lower])*weight
+    q = np.where(weight == 0, ordered[lower], q)
+
+    k = len(confidence_intervals)
+    bands = {float(ci): (float(q[1 + i]), float(q[1 + k + i])) for i, ci in enumerate(confidence_intervals)}
+
+    return {'min': float(ordered[0]),
+            'max': float(ordered[n - 1]),
+            'mean': float(values.mean()),
+            'median': float(q[0]),
+            'bands': bands,
+            'quantiles': {float(quantile): float(value) for quantile, value in zip(extra, q[1 + 2*k:])}}
@@ -0,0 +1,218 @@
+import json
+import os
+
+import numpy as np
+
+from tools.streaming_stats import StreamingHistogram
+
+#axes of the tensor, in storage order (the last axis varies fastest on disk)
+AXES = ['wacc', 'perpetual_growth_rate', 'earnings_growth_rate', 'cap_ex_growth_rate', 'forecasting_period']
+
+class _Marginal:
+
+    def __init__(self, size):
+        """
+        Summary:
+        Streaming count, mean, variance, min and max of the share prices at each value of one axis.
+        """
+        self.count = np.zeros(size, dtype='int64')
+        self.mean = np.zeros(size)
+        self._m2 = np.zeros(size)
+        self.min = np.full(size, np.inf)
+        self.max = np.full(size, -np.inf)
+
+    def update(self, positions, block, valid, axis):
+        """
+        Summary:
+        Merges the statistics of a block of prices, where positions are the axis values covered by the block.
+        """
+        others = tuple(a for a in range(block.ndim) if a != axis)
+        shape = [1]*block.ndim
+        shape[axis] = -1
+
+        count = valid.sum(axis=others)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(count > 0, np.where(valid, block, 0.0).sum(axis=others)/count, 0.0)
+        m2 = (np.where(valid, block - mean.reshape(shape), 0.0)**2).sum(axis=others)
+
+        #merge the block mean/variance of each value (Chan et al.)
+        n = self.count[positions]
+        total = n + count
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delta = mean - self.mean[positions]
+            self.mean[positions] = np.where(total > 0, self.mean[positions] + delta*count/total, 0.0)
+            self._m2[positions] = np.where(total > 0, self._m2[positions] + m2 + delta**2*n*count/total, 0.0)
+        self.count[positions] = total
+
+        self.min[positions] = np.minimum(self.min[positions], np.where(valid, block, np.inf).min(axis=others))
+        self.max[positions] = np.maximum(self.max[positions], np.where(valid, block, -np.inf).max(axis=others))
+
+    def summary(self, values):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std = np.where(self.count > 1, np.sqrt(self._m2/(self.count - 1)), 0.0)
+        empty = self.count == 0
+        return {'value': np.asarray(values).tolist(),
+                'count': self.count.tolist(),
+                'mean': np.where(empty, np.nan, self.mean).tolist(),
+                'std': np.where(empty, np.nan, std).tolist(),
+                'min': np.where(empty, np.nan, self.min).tolist(),
+                'max': np.where(empty, np.nan, self.max).tolist()}
+
+def _evaluate_block(base, wacc, g, eg, cxg, n):
+    """
+    Summary:
+    Implied share prices of the cartesian product of the given axis values, shape (wacc, g, eg, cxg, n).
+    The free-cash-flows are projected once per (wacc, eg, cxg) for the longest forecasting period and
+    reused for every g and every shorter forecasting period (same model as tools/dcf_kernel.py).
+    """
+    years = np.arange(1, int(n.max()) + 1)
+
+    #cumulative growth factors [1, (1+eg), (1+eg)(1+2eg), ...] of each growth rate, shape (rate, year)
+    def growth(rates):
+        return np.cumprod(np.concatenate([np.ones((len(rates), 1)), 1 + rates[:, None]*years], axis=1), axis=1)
+
+    #ebit*(1-tax) + non-cash-charges grow with eg, cap-ex with cxg and the change in working capital decays by 0.7
+    earnings = (base['ebit']*(1 - base['tax_rate']) + base['non_cash_charges'])*growth(eg)
+    cap_ex = base['cap_ex']*growth(cxg)
+    cwc = base['cwc']*np.concatenate([[1.0], np.cumprod(np.full(len(years), 0.7))])
+    discount = np.concatenate([np.ones((len(wacc), 1)), (1 + wacc[:, None])**years], axis=1)
+
+    #present value of every flow, shape (wacc, eg, cxg, year), and the running sum for every forecasting period
+    pv_fcf = (earnings[None, :, None, :] + cap_ex[None, None, :, :] + cwc)/discount[:, None, None, :]
+    npv_fcf_sum = np.cumsum(pv_fcf, axis=-1)[..., n]
+    last_flow = pv_fcf[..., n]
+    del pv_fcf
+
+    #terminal value for every g, shape (wacc, g, eg, cxg, n)
+    w = wacc[:, None, None, None, None]
+    gg = g[None, :, None, None, None]
+    terminal = (last_flow[:, None]*(1 + gg))/(w - gg)/(1 + w)**(1 + n)
+    return (terminal + npv_fcf_sum[:, None] - base['debt'] + base['cash'])/base['number_of_shares']
+
+def _bytes_per_cell(n_max, itemsize):
+    #price block, validity mask and reduction temporaries, plus the per-year flows (bounded by the cells)
+    return 8*(6 + 3*(n_max + 1)) + itemsize
+
+def _blocks(shape, max_cells):
+    """
+    Summary:
+    Splits the tensor into blocks that are contiguous on disk: fixed indices on the leading axes, a range on
+    one axis and every index of the trailing axes, with at most max_cells cells (unless one trailing slab is larger).
+    yields:
+    (tuple) = one index or slice per axis
+    """
+    split = len(shape) - 1
+    for axis in range(len(shape)):
+        if int(np.prod(shape[axis + 1:])) <= max_cells:
+            split = axis
+            break
+    step = max(1, max_cells // int(np.prod(shape[split + 1:])))
+
+    for outer in np.ndindex(*shape[:split]):
+        for start in range(0, shape[split], step):
+            yield outer + (slice(start, min(start + step, shape[split])),) + (slice(None),)*(len(shape) - split - 1)
+
+def sensitivity_tensor(base, axes, path=None, memory_budget=64*1024**2, confidence_intervals=(0.9,), quantiles=(0.05, 0.25, 0.5, 0.75, 0.95), bins=1000, dtype='float32'):
+    """
+    Summary:
+    Evaluates the implied share price over the cartesian product of WACC, g, earnings growth, cap-ex growth
+    and forecasting period values, in chunks that fit memory_budget. Results are optionally written to a
+    memory-mapped .npy file on disk (so the tensor can be larger than RAM) and summarized on the fly:
+    overall statistics, confidence bands and the marginal statistics of every axis value.
+    inputs:
+    base (dict): base-year inputs {'ebit', 'non_cash_charges', 'cwc', 'cap_ex', 'tax_rate', 'debt', 'cash', 'number_of_shares'}.
+    axes (dict): {axis: 1-d values} for every name in AXES (a single value keeps an axis fixed).
+    path (str): optional directory for 'prices.npy' (shape = one dimension per axis) and 'axes.json'
+                (axis values and the summary). Only the summary is computed if None.
+    memory_budget (int): approximate number of bytes used to evaluate one chunk.
+    confidence_intervals (list): confidence levels of the share price bands.
+    quantiles (list): quantiles of the share price to report.
+    bins (int): number of histogram bins used for the streaming quantiles.
+    dtype (str): dtype of the prices written to disk (statistics are always computed in float64).
+    returns:
+    (dict) = {'shape', 'axes', 'cells', 'valid', 'mean', 'std', 'min', 'max', 'quantiles', 'bands',
+              'marginals': {axis: {'value', 'count', 'mean', 'std', 'min', 'max'}}, 'prices': memmap or None}
+    Cells where wacc <= g (or the price is not finite) are NaN and excluded from the statistics.
+    """
+    missing = [axis for axis in AXES if axis not in axes]
+    if missing:
+        raise ValueError(f"Missing axes: {missing}")
+
+    confidence_intervals = np.atleast_1d(confidence_intervals).astype('float64')
+    if np.any((confidence_intervals <= 0) | (confidence_intervals >= 1)):
+        raise ValueError("Ensure that for i in confidence_intervals: 0 < i < 1")
+
+    values = {axis: np.atleast_1d(np.asarray(axes[axis], dtype='int64' if axis == 'forecasting_period' else 'float64'))
+              for axis in AXES}
+    shape = tuple(len(values[axis]) for axis in AXES)
+    cells = int(np.prod(shape))
+
+    prices = None
+    if path is not None:
+        os.makedirs(path, exist_ok=True)
+        prices = np.lib.format.open_memmap(os.path.join(path, 'prices.npy'), mode='w+', dtype=dtype, shape=shape)
+    flat = None if prices is None else prices.reshape(-1)
+
+    n_max = int(values['forecasting_period'].max())
+    max_cells = max(1, int(memory_budget // _bytes_per_cell(n_max, np.dtype(dtype).itemsize)))
+
+    histogram = StreamingHistogram(bins=bins)
+    marginals = {axis: _Marginal(len(values[axis])) for axis in AXES}
+    valid = 0
+    offset = 0
+
+    for block_index in _blocks(shape, max_cells):
+        block_values = [np.atleast_1d(values[axis][i]) for axis, i in zip(AXES, block_index)]
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            block = _evaluate_block(base, *block_values)
+
+        ok = (block_values[0][:, None, None, None, None] > block_values[1][None, :, None, None, None]) & np.isfinite(block)
+        block[~ok] = np.nan
+        if flat is not None:
+            flat[offset:offset + block.size] = block.ravel()
+        offset += block.size
+
+        valid += int(ok.sum())
+        histogram.update(block[ok])
+        for axis_number, (axis, i) in enumerate(zip(AXES, block_index)):
+            positions = np.arange(len(values[axis]))[i] if isinstance(i, slice) else np.array([i])
+            marginals[axis].update(positions, block, ok, axis_number)
+
+    significance_level = (1 - confidence_intervals)/2
+    band_values = histogram.quantile(np.concatenate([significance_level, 1 - significance_level]))
+    k = len(confidence_intervals)
+
+    summary = histogram.summary(quantiles)
+    results = {'shape': list(shape),
+               'axes': {axis: values[axis].tolist() for axis in AXES},
+               'cells': cells,
+               'valid': valid,
+               'mean': summary['mean'] if valid else np.nan,
+               'std': summary['std'] if valid else np.nan,
+               'min': summary['min'] if valid else np.nan,
+               'max': summary['max'] if valid else np.nan,
+               'quantiles': summary['quantiles'],
+               'bands': {float(ci): (float(band_values[i]), float(band_values[k + i])) for i, ci in enumerate(confidence_intervals)},
+               'marginals': {axis: marginals[axis].summary(values[axis]) for axis in AXES}}
+
+    if prices is not None:
+        prices.flush()
+        metadata = dict(results, dtype=np.dtype(dtype).name, axis_order=AXES,
+                        bands={str(ci): band for ci, band in results['bands'].items()},
+                        quantiles={str(q): value for q, value in results['quantiles'].items()})
+        with open(os.path.join(path, 'axes.json'), 'w') as f:
+            json.dump(metadata, f)
+
+    results['prices'] = prices
+    return results
+
+def load_tensor(path, mmap_mode='r'):
+    """
+    Summary:
+    Opens a tensor written by sensitivity_tensor() without reading it into memory.
+    returns:
+    (tuple) = (prices memmap, metadata dict with the axis values and the summary)
+    """
+    with open(os.path.join(path, 'axes.json')) as f:
+        metadata = json.load(f)
+    return np.load(os.path.join(path, 'prices.npy'), mmap_mode=mmap_mode), metadata
@@ -0,0 +1,375 @@
+import argparse
+import asyncio
+import collections
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from data.batch_fetch import BatchFetcher, fetch_betas
+from data.market_data import get_market_data
+from data.request_scheduler import INTERACTIVE
+from data.synthetic_statements import SYNTHETIC_MARKET_DATA, synthetic_statements
+from tools.universe import value_ticker
+
+#query parameters of /valuation/<ticker>: {name: (type, default)}, None for required parameters
+PARAMETERS = {'earnings_growth_rate': (float, None),
+              'cap_ex_growth_rate': (float, None),
+              'perpetual_growth_rate': (float, None),
+              'forecasting_period': (int, 4),
+              'confidence_interval': (float, 0.9),
+              'bound': (float, 0.4)}
+
+#beta of the stubbed companies (no company profile request)
+STUB_BETA = 1.1
+
+class HTTPError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def parse_parameters(query):
+    """
+    Summary:
+    Valuation parameters of a query string, e.g. 'earnings_growth_rate=0.1&cap_ex_growth_rate=0.05&perpetual_growth_rate=0.02'.
+    returns:
+    (tuple) = ((name, value), ...) in the order of PARAMETERS, usable as part of a cache key.
+    """
+    values = {name: value[-1] for name, value in parse_qs(query).items()}
+    unknown = set(values) - set(PARAMETERS)
+    if unknown:
+        raise HTTPError(400, f"Unknown parameters: {sorted(unknown)}")
+
+    parameters = []
+    for name, (kind, default) in PARAMETERS.items():
+        if name not in values:
+            if default is None:
+                raise HTTPError(400, f"Missing parameter: {name}")
+            parameters.append((name, default))
+            continue
+        try:
+            parameters.append((name, kind(values[name])))
+        except ValueError:
+            raise HTTPError(400, f"Invalid {name}: {values[name]}")
+    return tuple(parameters)
+
+class ValuationService:
+
+    def __init__(self, api_key=None, stub=False, market_data=None, cache=None, cache_size=1024, ttl=300, fetch_workers=8, executor=None, clock=time.monotonic):
+        """
+        Summary:
+        Valuations served over asyncio: concurrent requests for the same ticker and parameters share one
+        computation, computed valuations are kept in an LRU with a time-to-live, statements and betas are fetched
+        in a thread pool and the CPU-bound dcf/sensitivity/f-score work runs in an executor, so the event loop only
+        parses requests and writes responses.
+        inputs:
+        api_key (str): 'financialmodelingprep' secret api key.
+        stub (bool): serve synthetic statements and market data (see data/synthetic_statements.py), no network.
+        market_data (MarketData): market data of every valuation, loaded once with get_market_data() if None.
+        cache (StatementCache): optional statement cache used when fetching.
+        cache_size (int): valuations kept in the LRU (the statements of as many tickers are kept too).
+        ttl (float): seconds a computed valuation (and its statements) is served from the LRU.
+        fetch_workers (int): statement requests in flight.
+        executor (Executor): executor of the valuations, a thread pool if None (pass a ProcessPoolExecutor
+                             to use every CPU).
+        clock (callable): monotonic time in seconds (replaced in tests).
+        """
+        self.api_key = api_key
+        self.stub = stub
+        self.market_data = SYNTHETIC_MARKET_DATA if (stub and market_data is None) else market_data
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.clock = clock
+
+        self.fetcher = None if stub else BatchFetcher(api_key, max_workers=fetch_workers, cache=cache, priority=INTERACTIVE)
+        self._fetch_executor = ThreadPoolExecutor(max_workers=fetch_workers)
+        self.executor = ThreadPoolExecutor() if executor is None else executor
+
+        #{key: (expiry, value)} least recently used first, and the computations in flight {(counter, key): Task}
+        self._results = collections.OrderedDict()
+        self._statements = collections.OrderedDict()
+        self._betas = collections.OrderedDict()
+        self._market_data = collections.OrderedDict()
+        self._in_flight = {}
+
+        #statistics
+        self.counters = collections.Counter()
+        self.latencies = collections.defaultdict(lambda: collections.deque(maxlen=10000))
+        self.loop_lag = collections.deque(maxlen=1000)
+
+    def _lookup(self, cache, key):
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= self.clock():
+            del cache[key]
+            return None
+        cache.move_to_end(key)
+        return entry[1]
+
+    def _store(self, cache, key, value):
+        cache[key] = (self.clock() + self.ttl, value)
+        cache.move_to_end(key)
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    async def _cached(self, cache, key, compute, counter):
+        """
+        Summary:
+        Value of a key from the LRU, from a computation already in flight, or computed once by compute().
+        The computation runs in its own task: cancelling the request that started it (or any other waiter)
+        only cancels that request, the others still get the value.
+        """
+        value = self._lookup(cache, key)
+        if value is not None:
+            self.counters[f'{counter}_hits'] += 1
+            return value
+
+        task = self._in_flight.get((counter, key))
+        if task is not None:
+            self.counters[f'{counter}_coalesced'] += 1
+        else:
+            self.counters[f'{counter}_computed'] += 1
+            task = asyncio.ensure_future(self._compute(cache, key, compute, counter))
+            #retrieved here so an error nobody waited for is not reported as never retrieved
+            task.add_done_callback(lambda task: task.cancelled() or task.exception())
+            self._in_flight[(counter, key)] = task
+        return await asyncio.shield(task)
+
+    async def _compute(self, cache, key, compute, counter):
+        try:
+            value = await compute()
+            self._store(cache, key, value)
+            return value
+        finally:
+            del self._in_flight[(counter, key)]
+
+    async def _get_market_data(self):
+        """
+        Summary:
+        Market data of every valuation, loaded once (concurrent first requests share the load).
+        """
+        if self.market_data is None:
+            loop = asyncio.get_running_loop()
+            self.market_data = await self._cached(self._market_data, 'market_data',
+                                                  lambda: loop.run_in_executor(self._fetch_executor, get_market_data),
+                                                  'market_data')
+        return self.market_data
+
+    def _fetch(self, ticker):
+        if self.stub:
+            return synthetic_statements(ticker)
+        #the fetcher is shared by the fetch threads, the errors of this call are its own
+        statements, errors = self.fetcher.fetch_with_errors([ticker])
+        if ticker not in statements:
+            raise HTTPError(502, f"Statements of {ticker} could not be fetched: {errors.get(ticker)}")
+        return statements[ticker]
+
+    async def statements(self, ticker):
+        """
+        Summary:
+        Statements of a ticker (shared by every valuation of the ticker while they are in the LRU).
+        """
+        loop = asyncio.get_running_loop()
+        return await self._cached(self._statements, ticker,
+                                  lambda: loop.run_in_executor(self._fetch_executor, self._fetch, ticker),
+                                  'statements')
+
+    def _fetch_beta(self, ticker):
+        betas, errors = fetch_betas([ticker], self.api_key, fetcher=self.fetcher)
+        if ticker not in betas:
+            raise HTTPError(502, f"Beta of {ticker} could not be fetched: {errors.get(ticker)}")
+        return betas[ticker]
+
+    async def beta(self, ticker):
+        """
+        Summary:
+        Beta of a ticker from its company profile, fetched through the scheduler of this process (so the
+        valuations in the executor make no api calls) and shared like the statements.
+        """
+        if self.stub:
+            return STUB_BETA
+        loop = asyncio.get_running_loop()
+        return await self._cached(self._betas, ticker,
+                                  lambda: loop.run_in_executor(self._fetch_executor, self._fetch_beta, ticker),
+                                  'betas')
+
+    async def valuation(self, ticker, parameters):
+        """
+        Summary:
+        Valuation of a ticker (see tools.universe.value_ticker) for parameters returned by parse_parameters().
+        returns:
+        (dict) = {column: value}
+        """
+        ticker = ticker.upper()
+        loop = asyncio.get_running_loop()
+
+        async def compute():
+            market_data = await self._get_market_data()
+            #both fetched at once, the first error is raised once both are done
+            statements, beta = await asyncio.gather(self.statements(ticker), self.beta(ticker), return_exceptions=True)
+            for result in (statements, beta):
+                if isinstance(result, BaseException):
+                    raise result
+            values = dict(parameters)
+            return await loop.run_in_executor(self.executor, _value,
+                                              ticker, statements, self.api_key, market_data, values, beta)
+
+        return await self._cached(self._results, (ticker,) + parameters, compute, 'valuations')
+
+    def metrics(self):
+        """
+        Summary:
+        Counters, cache sizes, latency percentiles (ms) per endpoint and event loop lag (ms).
+        """
+        metrics = {'counters': dict(self.counters),
+                   'cached_valuations': len(self._results),
+                   'cached_statements': len(self._statements),
+                   'cached_betas': len(self._betas),
+                   'in_flight': len(self._in_flight),
+                   'latency_ms': {}}
+        for endpoint, latencies in self.latencies.items():
+            values = 1000*np.array(latencies)
+            metrics['latency_ms'][endpoint] = {'count': len(values),
+                                               'p50': float(np.percentile(values, 50)),
+                                               'p90': float(np.percentile(values, 90)),
+                                               'p99': float(np.percentile(values, 99)),
+                                               'max': float(values.max())}
+        if self.loop_lag:
+            lag = 1000*np.array(self.loop_lag)
+            metrics['loop_lag_ms'] = {'p50': float(np.percentile(lag, 50)), 'max': float(lag.max())}
+        return metrics
+
+    async def handle(self, method, target):
+        """
+        Summary:
+        Routes one request.
+        returns:
+        (tuple) = (status, json serializable body)
+        """
+        if method != 'GET':
+            raise HTTPError(405, f"Method not allowed: {method}")
+        url = urlparse(target)
+        parts = [part for part in url.path.split('/') if part]
+
+        if parts == ['health']:
+            return 200, {'status': 'ok'}
+        if parts == ['metrics']:
+            return 200, self.metrics()
+        if len(parts) == 2 and parts[0] == 'valuation':
+            parameters = parse_parameters(url.query)
+            return 200, await self.valuation(parts[1], parameters)
+        raise HTTPError(404, f"Not found: {url.path}")
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            #headers are not used, read them to the blank line
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+
+            start = time.perf_counter()
+            endpoint = 'invalid'
+            try:
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                endpoint = target.split('?')[0].strip('/').split('/')[0] or 'root'
+                status, body = await self.handle(method, target)
+            except HTTPError as e:
+                status, body = e.status, {'error': str(e)}
+            except ValueError as e:
+                status, body = 400, {'error': str(e) or 'Bad request'}
+            except Exception as e:
+                status, body = 500, {'error': f'{type(e).__name__}: {e}'}
+
+            self.counters[f'status_{status}'] += 1
+            self.latencies[endpoint].append(time.perf_counter() - start)
+
+            payload = json.dumps(body, default=float).encode()
+            writer.write(f'HTTP/1.1 {status} {_REASONS.get(status, "")}\r\n'
+                         f'Content-Type: application/json\r\n'
+                         f'Content-Length: {len(payload)}\r\n'
+                         f'Connection: close\r\n\r\n'.encode('latin-1') + payload)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _monitor_loop(self, interval=0.1):
+        #how late the event loop wakes up, a blocked loop shows up as lag
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.loop_lag.append(max(0.0, time.perf_counter() - start - interval))
+
+    async def start(self, host='127.0.0.1', port=8080):
+        """
+        Summary:
+        Starts listening (port 0 picks a free port, see server.sockets[0].getsockname()).
+        returns:
+        (asyncio.Server)
+        """
+        self._monitor = asyncio.ensure_future(self._monitor_loop())
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    def close(self):
+        if getattr(self, '_monitor', None) is not None:
+            self._monitor.cancel()
+        self._fetch_executor.shutdown(wait=False)
+        self.executor.shutdown(wait=False)
+        if self.fetcher is not None:
+            self.fetcher.close()
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error', 502: 'Bad Gateway'}
+
+def _value(ticker, statements, api_key, market_data, parameters, beta):
+    """
+    Summary:
+    One valuation in the executor (a module level function so it can be sent to a process pool).
+    """
+    return value_ticker(ticker, statements, api_key, market_data,
+                        earnings_growth_rate = parameters['earnings_growth_rate'],
+                        cap_ex_growth_rate = parameters['cap_ex_growth_rate'],
+                        perpetual_growth_rate = parameters['perpetual_growth_rate'],
+                        forecasting_period = parameters['forecasting_period'],
+                        confidence_intervals = (parameters['confidence_interval'],),
+                        bound = parameters['bound'],
+                        beta = beta)
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description='Serve valuations over http: GET /valuation/<ticker>?earnings_growth_rate=..&cap_ex_growth_rate=..&perpetual_growth_rate=.., /metrics, /health.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--api-key', default=os.environ.get('FMP_API_KEY'), help="financialmodelingprep api key (default: $FMP_API_KEY)")
+    parser.add_argument('--stub', action='store_true', help='serve synthetic statements and market data (no network)')
+    parser.add_argument('--cache-size', type=int, default=1024)
+    parser.add_argument('--ttl', type=float, default=300, help='seconds a valuation is served from the cache')
+    parser.add_argument('--processes', type=int, help='value in a pool of processes instead of threads')
+    args = parser.parse_args(argv)
+
+    async def serve():
+        service = ValuationService(api_key = args.api_key,
+                                   stub = args.stub,
+                                   cache_size = args.cache_size,
+                                   ttl = args.ttl,
+                                   executor = ProcessPoolExecutor(args.processes) if args.processes else None)
+        server = await service.start(args.host, args.port)
+        print(f"Serving valuations on http://{args.host}:{server.sockets[0].getsockname()[1]}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            service.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+import numpy as np
+
+class StreamingHistogram:
+
+    def __init__(self, bins=1000, range=None, tail_capacity=1000000):
+        """
+        Summary:
+        Fixed-memory summary of a stream of values: count, mean, variance, min, max,
+        a histogram and approximate quantiles, updated one chunk at a time.
+        inputs:
+        bins (int): number of histogram bins.
+        range (tuple): (low, high) of the histogram. If None it is set from the first chunk.
+        tail_capacity (int): values outside the range are kept exactly (for accurate tail quantiles)
+                             until there are more than tail_capacity of them, after which the
+                             tails are interpolated between the range and the min/max.
+        """
+        self.bins = bins
+        self.edges = None if range is None else np.linspace(range[0], range[1], bins + 1)
+        self.counts = np.zeros(bins, dtype='int64')
+        self.below = 0
+        self.above = 0
+        self.tail_capacity = tail_capacity
+        self._tails = []
+
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        """
+        Summary:
+        Adds a chunk of values (non-finite values are ignored).
+        """
+        values = np.ravel(values)
+        values = values[np.isfinite(values)]
+        n = len(values)
+        if n == 0:
+            return
+
+        if self.edges is None:
+            #cover the bulk of the first chunk, leaving room for later chunks
+            low, high = np.percentile(values, [0.5, 99.5])
+            pad = 0.1*(high - low) if high > low else max(abs(low), 1.0)*0.1
+            self.edges = np.linspace(low - pad, high + pad, self.bins + 1)
+
+        self.counts += np.histogram(values, self.edges)[0]
+        outside = values[(values < self.edges[0]) | (values > self.edges[-1])]
+        below = int(np.count_nonzero(outside < self.edges[0]))
+        self.below += below
+        self.above += len(outside) - below
+
+        if self._tails is not None:
+            self._tails.append(outside)
+            if self.below + self.above > self.tail_capacity:
+                self._tails = None
+
+        #merge the chunk mean/variance (Chan et al.)
+        chunk_mean = float(values.mean())
+        chunk_m2 = float(((values - chunk_mean)**2).sum())
+        delta = chunk_mean - self.mean
+        total = self.n + n
+        self.mean += delta*n/total
+        self._m2 += chunk_m2 + delta**2*self.n*n/total
+        self.n = total
+
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    @property
+    def std(self):
+        return (self._m2/(self.n - 1))**0.5 if self.n > 1 else 0.0
+
+    def quantile(self, q):
+        """
+        Summary:
+        Approximate quantiles, interpolated linearly inside each histogram bin.
+        inputs:
+        q (float/list): quantiles, 0 <= q <= 1.
+        returns:
+        (ndarray) quantile values.
+        """
+        q = np.atleast_1d(np.asarray(q, dtype='float64'))
+        if self.n == 0:
+            return np.full(len(q), np.nan)
+
+        #the under/overflow bins span [min, low edge] and [high edge, max]
+        edges = np.concatenate([[min(self.min, self.edges[0])], self.edges, [max(self.max, self.edges[-1])]])
+        counts = np.concatenate([[self.below], self.counts, [self.above]])
+        cumulative = np.concatenate([[0], np.cumsum(counts)])
+
+        target = q*self.n
+        i = np.clip(np.searchsorted(cumulative, target, side='left') - 1, 0, len(counts) - 1)
+        in_bin = np.where(counts[i] > 0, (target - cumulative[i])/np.maximum(counts[i], 1), 0.0)
+        values = edges[i] + (edges[i + 1] - edges[i])*np.clip(in_bin, 0, 1)
+
+        #quantiles falling outside the histogram range are read from the exact tail values
+        if self._tails is not None and (self.below + self.above) > 0:
+            tails = np.sort(np.concatenate(self._tails))
+            rank = np.clip(np.ceil(target).astype('int64') - 1, 0, self.n - 1)
+            low_tail = rank < self.below
+            high_tail = rank >= self.n - self.above
+            values = np.where(low_tail, tails[np.minimum(rank, len(tails) - 1)], values)
+            values = np.where(high_tail, tails[np.clip(rank - (self.n - len(tails)), 0, len(tails) - 1)], values)
+
+        return np.clip(values, self.min, self.max)
+
+    def summary(self, quantiles=(0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)):
+        """
+        Summary:
+        returns:
+        (dict) = {'count', 'mean', 'std', 'min', 'max', 'quantiles': {q: value}, 'histogram': (counts, edges)}
+        """
+        return {'count': self.n,
+                'mean': self.mean,
+                'std': self.std,
+                'min': self.min,
+                'max': self.max,
+                'quantiles': dict(zip([float(q) for q in quantiles], self.quantile(quantiles).tolist())),
+                'histogram': (self.counts.copy(), None if self.edges is None else self.edges.copy())}
@@ -0,0 +1,362 @@
+import argparse
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from data.batch_fetch import BatchFetcher, fetch_betas
+from data.checkpoint import Checkpoint, input_hash
+from data.market_data import MarketData, get_market_data
+from data.prices import INDEX_SYMBOL, load_prices
+from data.request_scheduler import BATCH
+from data.result_store import ResultStore
+from tools import plotting
+from tools.beta import FREQUENCIES, estimate_betas
+from tools.fundamentals_class import Fundamentals
+
+#numeric result columns (sensitivity band columns are added per confidence interval)
+METRICS = ['wacc', 'cost_of_debt', 'capm', 'enterprise_value', 'equity_value', 'share_price',
+           'sensitivity_min', 'sensitivity_median', 'sensitivity_max',
+           'f_score', 'profitability_score', 'leverage_liquidity_score', 'operating_efficiency_score',
+           'fetch_seconds', 'compute_seconds']
+
+def _band_columns(confidence_intervals):
+    return [f'band_{ci}_{side}' for ci in confidence_intervals for side in ('lower', 'upper')]
+
+def value_ticker(ticker, statements, api_key, market_data, earnings_growth_rate, cap_ex_growth_rate, perpetual_growth_rate, forecasting_period=4, confidence_intervals=(0.9,), bound=0.4, beta=None):
+    """
+    Summary:
+    Runs the DCF, sensitivity analysis and f-score of one company in quiet mode.
+    inputs:
+    statements (dict): {Fundamentals argument: json}, e.g. one entry of fetch_statements().
+    beta (float/dict): company's beta or betas by ticker (see tools/beta.py), fetched from the company profile if None.
+    returns:
+    (dict) = {column: value} for every column in METRICS and the sensitivity bands.
+    """
+    company = Fundamentals(**statements,
+                           company_ticker = ticker,
+                           forecasting_period = forecasting_period,
+                           api_key = api_key,
+                           market_data = market_data,
+                           beta = beta,
+                           quiet = True,
+                           priority = BATCH)
+
+    company.dcf(earnings_growth_rate, cap_ex_growth_rate, perpetual_growth_rate)
+    company.sensitivity(confidence_intervals = list(confidence_intervals), bound = bound, plot = False)
+    f_score = company.f_score()
+    totals = company.instrumentation.totals()
+
+    summary = company.sensitivity_summary
+    row = {'wacc': company.wacc,
+           'cost_of_debt': company.cost_of_debt,
+           'capm': company.capm,
+           'enterprise_value': company.enterprise_value,
+           'equity_value': company.equity_value,
+           'share_price': company.share_price,
+           'sensitivity_min': summary['min'],
+           'sensitivity_median': summary['median'],
+           'sensitivity_max': summary['max'],
+           'f_score': f_score['F1-Score'],
+           'profitability_score': f_score['Profitability-score'],
+           'leverage_liquidity_score': f_score['leverage-liquidity-score'],
+           'operating_efficiency_score': f_score['operating-efficiency-score'],
+           'fetch_seconds': totals['fetch'],
+           'compute_seconds': totals['compute']}
+
+    for ci, (lower, upper) in summary['bands'].items():
+        row[f'band_{ci}_lower'] = lower
+        row[f'band_{ci}_upper'] = upper
+
+    return row
+
+#seconds between the creation of the pool and this worker being ready
+_worker_startup = None
+
+def _ticker_params(params, betas, beta_sources, ticker):
+    #parameters of one ticker's valuation, with its beta and where the beta comes from
+    return dict(params, beta = betas.get(ticker), beta_source = beta_sources.get(ticker))
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()[:16]
+
+def _init_worker(pool_created):
+    """
+    Summary:
+    Worker process initializer: headless mode (no GUI backend) and startup time measurement.
+    """
+    global _worker_startup
+    plotting.set_headless(True)
+    _worker_startup = time.time() - pool_created
+
+def _value_shard(jobs, **kwargs):
+    """
+    Summary:
+    Values a shard of (ticker, statements) jobs in a worker process, isolating per-ticker failures.
+    returns:
+    (tuple) = (worker pid, worker startup seconds, list of (ticker, row or None, error message or None))
+    """
+    results = []
+    for ticker, statements in jobs:
+        try:
+            results.append((ticker, value_ticker(ticker, statements, **kwargs), None))
+        except Exception as e:
+            results.append((ticker, None, f'{type(e).__name__}: {e}'))
+    return os.getpid(), _worker_startup, results
+
+def _progress(done, total, failed, start):
+    elapsed = time.time() - start
+    rate = done/elapsed if elapsed > 0 else 0
+    sys.stderr.write(f"\r{done}/{total} tickers valued, {failed} failed ({rate:.1f} tickers/s)")
+    if done == total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+def value_universe(tickers, api_key, earnings_growth_rate, cap_ex_growth_rate, perpetual_growth_rate, forecasting_period=4, confidence_intervals=(0.9,), bound=0.4, statements=None, market_data=None, cache=None, processes=None, shard_size=16, output=None, progress=True, stats=None, store=None, betas=None, checkpoint=None, beta_source='betas'):
+    """
+    Summary:
+    Values a universe of tickers: statements are fetched concurrently, market data is loaded once and the
+    CPU-bound valuations are sharded across a process pool. A failing ticker never stops the run.
+    inputs:
+    tickers (list): company tickers.
+    api_key (str): 'financialmodelingprep' secret api key.
+    earnings_growth_rate, cap_ex_growth_rate, perpetual_growth_rate (float): dcf() inputs used for every ticker.
+    forecasting_period (int): number of years to forecast.
+    confidence_intervals (list): confidence levels of the sensitivity bands.
+    bound (float): sensitivity() range of WACC and g values.
+    statements (dict): {ticker: {Fundamentals argument: json}}, fetched with BatchFetcher if None.
+    market_data (MarketData): shared market data, loaded once with get_market_data() if None.
+    cache (StatementCache): optional statement cache used when fetching.
+    processes (int): number of worker processes (defaults to the number of CPUs).
+    shard_size (int): number of tickers sent to a worker at a time.
+    output (str): optional '.npz' or '.parquet' file to write the results to.
+    progress (bool): report progress on stderr.
+    stats (dict): optional dict filled with run statistics: {'elapsed': seconds, 'worker_startup': {pid: seconds},
+                  'revalued': tickers valued, 'unchanged': tickers reused from the checkpoint}.
+    betas (dict): {ticker: beta} used instead of one company profile call per ticker, e.g.
+                  tools.beta.estimate_betas(prices)['beta']. The betas of the other tickers are fetched from
+                  their company profiles before the valuations start (see data.batch_fetch.fetch_betas).
+    beta_source (str): where the betas come from, e.g. the price file and regression settings. It is kept with
+                       each ticker's beta in the parameters of the store and checkpoint ('profile' for the
+                       tickers whose beta is fetched), so valuations from different betas are told apart.
+    store (ResultStore): optional result store every valuation is appended to, keyed by the market data date
+                         and the parameters of the run (only the columns in store.metrics are kept).
+                         With a checkpoint, only the tickers valued by this run are appended.
+    checkpoint (Checkpoint/str): optional checkpoint (or its file, see data/checkpoint.py). Every valuation is
+                                 recorded with the hash of its inputs (statements, market data, parameters and
+                                 beta) as soon as its shard completes, and tickers whose inputs have the recorded
+                                 hash are not valued again: an interrupted run resumes where it stopped and a
+                                 nightly run only re-values the tickers whose statements or inputs changed.
+    returns:
+    (dict) = {column: ndarray}, with a 'ticker' and an 'error' column ('' when the valuation succeeded).
+    """
+    confidence_intervals = [float(ci) for ci in np.atleast_1d(confidence_intervals)]
+    columns = METRICS + _band_columns(confidence_intervals)
+
+    if market_data is None:
+        market_data = get_market_data()
+
+    errors = {}
+    if statements is None:
+        with BatchFetcher(api_key, cache=cache) as fetcher:
+            statements = fetcher.fetch(tickers)
+            errors.update({ticker: f'fetch failed: {e}' for ticker, e in fetcher.errors.items()})
+
+    for ticker in tickers:
+        if ticker not in statements and ticker not in errors:
+            errors[ticker] = 'no statements'
+
+    #the betas not given are fetched here, through the scheduler of this process, before sharding: the workers
+    #make no api calls, so the daily budget holds for the whole run
+    given = {} if betas is None else {ticker: float(beta) for ticker, beta in dict(betas).items() if beta is not None and not np.isnan(float(beta))}
+    beta_sources = {ticker: beta_source for ticker in given}
+    missing = [ticker for ticker in tickers if ticker in statements and ticker not in given]
+    fetched = {}
+    if missing:
+        fetched, beta_errors = fetch_betas(missing, api_key, cache=cache)
+        errors.update({ticker: f'beta fetch failed: {e}' for ticker, e in beta_errors.items()})
+        beta_sources.update({ticker: 'profile' for ticker in fetched})
+
+    kwargs = dict(api_key = api_key,
+                  market_data = market_data,
+                  earnings_growth_rate = earnings_growth_rate,
+                  cap_ex_growth_rate = cap_ex_growth_rate,
+                  perpetual_growth_rate = perpetual_growth_rate,
+                  forecasting_period = forecasting_period,
+                  confidence_intervals = confidence_intervals,
+                  bound = bound,
+                  beta = dict(given, **fetched))
+
+    #inputs of the valuation other than the statements and the beta (the api key does not change results)
+    params = dict(kwargs, market_data = market_data.to_dict())
+    del params['api_key'], params['beta']
+
+    #tickers whose inputs hash to the checkpointed hash reuse the checkpointed row (the market data date
+    #is left out of the hash, only the rates are read by the valuation)
+    rows = {}
+    hashes = {}
+    if checkpoint is not None:
+        if not isinstance(checkpoint, Checkpoint):
+            checkpoint = Checkpoint(checkpoint)
+        context = dict(params, market_data = [market_data.risk_free_rate, market_data.index_return])
+        for ticker in tickers:
+            if ticker in statements and ticker not in errors:
+                hashes[ticker] = input_hash(statements[ticker], _ticker_params(context, kwargs['beta'], beta_sources, ticker))
+                row = checkpoint.get(ticker, hashes[ticker])
+                if row is not None:
+                    rows[ticker] = row
+    unchanged = len(rows)
+
+    jobs = [(ticker, statements[ticker]) for ticker in tickers if ticker in statements and ticker not in rows and ticker not in errors]
+    shards = [jobs[i:i + shard_size] for i in range(0, len(jobs), shard_size)]
+
+    revalued = set()
+    worker_startup = {}
+    start = time.time()
+    done = len(errors) + unchanged
+    if shards:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(start,)) as pool:
+            futures = {pool.submit(_value_shard, shard, **kwargs): shard for shard in shards}
+            for future in as_completed(futures):
+                try:
+                    pid, startup, results = future.result()
+                    worker_startup[pid] = startup
+                except BrokenProcessPool as e:
+                    results = [(ticker, None, f'worker crashed: {e}') for ticker, _ in futures[future]]
+
+                for ticker, row, error in results:
+                    if error is None:
+                        rows[ticker] = row
+                        revalued.add(ticker)
+                    else:
+                        errors[ticker] = error
+
+                #one synced append per shard: a crash loses at most the shards in flight
+                if checkpoint is not None:
+                    checkpoint.add([(ticker, hashes[ticker], row) for ticker, row, error in results if error is None])
+
+                done += len(results)
+                if progress:
+                    _progress(done, len(tickers), len(errors), start)
+
+    if progress and worker_startup:
+        sys.stderr.write(f"{len(worker_startup)} workers, startup {1000*min(worker_startup.values()):.0f}-{1000*max(worker_startup.values()):.0f} ms\n")
+    if stats is not None:
+        stats['elapsed'] = time.time() - start
+        stats['worker_startup'] = worker_startup
+        stats['revalued'] = len(revalued)
+        stats['unchanged'] = unchanged
+
+    results = {'ticker': np.array(tickers, dtype=str),
+               'error': np.array([errors.get(ticker, '') for ticker in tickers], dtype=str)}
+    for column in columns:
+        results[column] = np.array([rows[ticker][column] if ticker in rows else np.nan for ticker in tickers], dtype='float64')
+
+    if output is not None:
+        write_results(results, output)
+
+    #unchanged tickers keep the entry of the run that valued them
+    if store is not None:
+        for ticker in [ticker for ticker in tickers if ticker in revalued]:
+            store.add(ticker, market_data.as_of, _ticker_params(params, kwargs['beta'], beta_sources, ticker),
+                      {column: value for column, value in rows[ticker].items() if column in store.metrics})
+
+    if checkpoint is not None:
+        checkpoint.compact()
+
+    return results
+
+def write_results(results, path):
+    """
+    Summary:
+    Writes columnar results to a compressed '.npz' file or (if pyarrow is installed) a '.parquet' file.
+    """
+    if path.endswith('.parquet'):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Writing parquet files requires pyarrow, use a '.npz' output instead")
+        pq.write_table(pa.table({name: column for name, column in results.items()}), path)
+    else:
+        np.savez_compressed(path, **results)
+
+def read_results(path):
+    """
+    Summary:
+    Reads results written by write_results().
+    returns:
+    (dict) = {column: ndarray}
+    """
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+        return {name: table.column(name).to_numpy() for name in table.column_names}
+
+    with np.load(path) as f:
+        return {name: f[name] for name in f.files}
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description='Value a universe of tickers (DCF, sensitivity bands and f-score).')
+    parser.add_argument('tickers', nargs='*', help='company tickers')
+    parser.add_argument('--tickers-file', help='file with one ticker per line')
+    parser.add_argument('--api-key', default=os.environ.get('FMP_API_KEY'), help="financialmodelingprep api key (default: $FMP_API_KEY)")
+    parser.add_argument('--earnings-growth-rate', type=float, required=True)
+    parser.add_argument('--cap-ex-growth-rate', type=float, required=True)
+    parser.add_argument('--perpetual-growth-rate', type=float, required=True)
+    parser.add_argument('--forecasting-period', type=int, default=4)
+    parser.add_argument('--confidence-intervals', type=float, nargs='+', default=[0.9])
+    parser.add_argument('--bound', type=float, default=0.4)
+    parser.add_argument('--market-data', help='json file written by MarketData.to_file() (default: fetch from FRED)')
+    parser.add_argument('--prices', help='csv file of daily closing prices of the tickers and the index (see data/prices.py), betas are estimated from it instead of fetched')
+    parser.add_argument('--index', default=INDEX_SYMBOL, help='index column of the prices file')
+    parser.add_argument('--beta-frequency', choices=list(FREQUENCIES), default='weekly')
+    parser.add_argument('--beta-window', type=int, help='number of returns of the beta regression (default: two years)')
+    parser.add_argument('--processes', type=int)
+    parser.add_argument('--output', required=True, help="'.npz' or '.parquet' results file")
+    parser.add_argument('--store', help='result store directory the valuations are also appended to (see data/result_store.py)')
+    parser.add_argument('--checkpoint', help='checkpoint file (see data/checkpoint.py): resumes an interrupted run and only re-values tickers whose inputs changed')
+    args = parser.parse_args(argv)
+
+    tickers = list(args.tickers)
+    if args.tickers_file:
+        with open(args.tickers_file) as f:
+            tickers += [line.strip() for line in f if line.strip()]
+    if not tickers:
+        parser.error('no tickers given')
+
+    betas = None
+    beta_source = 'betas'
+    if args.prices:
+        betas = estimate_betas(load_prices(args.prices), index = args.index, tickers = tickers,
+                               frequency = args.beta_frequency, window = args.beta_window)['beta']
+        beta_source = f'prices {_file_hash(args.prices)} {args.index} {args.beta_frequency} {args.beta_window}'
+
+    stats = {}
+    results = value_universe(tickers, args.api_key,
+                             earnings_growth_rate = args.earnings_growth_rate,
+                             cap_ex_growth_rate = args.cap_ex_growth_rate,
+                             perpetual_growth_rate = args.perpetual_growth_rate,
+                             forecasting_period = args.forecasting_period,
+                             confidence_intervals = args.confidence_intervals,
+                             bound = args.bound,
+                             market_data = MarketData.from_file(args.market_data) if args.market_data else None,
+                             processes = args.processes,
+                             betas = betas,
+                             beta_source = beta_source,
+                             output = args.output,
+                             checkpoint = args.checkpoint,
+                             stats = stats,
+                             store = ResultStore(args.store, metrics = METRICS + _band_columns(args.confidence_intervals)) if args.store else None)
+
+    failed = int((results['error'] != '').sum())
+    print(f"Valued {len(tickers) - failed} of {len(tickers)} tickers ({stats['unchanged']} unchanged since the checkpoint), results written to {args.output}")
+
+if __name__ == '__main__':
+    main()